@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark ANN hybrid search against the brute-force path: recall@k and latency.
+
+Uses the embedding store if it exists, otherwise a synthetic clustered corpus.
+Queries are corpus rows plus noise, so they behave like real sketches/texts
+that land near existing images.
+
+Run from the backend directory:
+    python benchmark_ann.py
+    python benchmark_ann.py --synthetic 200000 --nprobe 1 4 16 64
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from search.ann import HybridANNSearcher, build_ann_indexes, load_ann_indexes, resolve_backend
+from search.scoring import HybridScorer
+from search.store import MANIFEST_NAME, file_content_hash, load_embedding_store
+
+
+def synthetic_corpus(n: int, dim: int = 512, n_clusters: int = 256, seed: int = 0):
+    """Clustered random embeddings, closer to real CLIP/pose data than iid noise."""
+    rng = np.random.default_rng(seed)
+    pose_centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    clip_centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, n)
+    pose = pose_centers[labels] + 0.7 * rng.normal(size=(n, dim)).astype(np.float32)
+    clip = clip_centers[rng.permutation(n_clusters)[labels]] + \
+        0.7 * rng.normal(size=(n, dim)).astype(np.float32)
+    return pose, clip
+
+
+def main():
+    backend_dir = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="ANN recall/latency benchmark")
+    parser.add_argument("--store", type=Path, default=backend_dir / "data" / "embedding_store")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Use a synthetic corpus of this size instead of the store")
+    parser.add_argument("--backend", default="auto")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lambda", dest="lambda_param", type=float, default=0.5)
+    parser.add_argument("--candidates", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    indexes = None
+    if args.synthetic or not (args.store / MANIFEST_NAME).exists():
+        n = args.synthetic or 100_000
+        print(f"Using synthetic corpus: {n} images")
+        pose, clip = synthetic_corpus(n)
+    else:
+        print(f"Using embedding store: {args.store}")
+        store = load_embedding_store(args.store)
+        pose, clip = store.pose, store.clip
+        indexes = load_ann_indexes(args.store, file_content_hash(args.store / MANIFEST_NAME))
+
+    scorer = HybridScorer(pose, clip)
+    if indexes is None:
+        backend = resolve_backend(args.backend)
+        print(f"Building {backend} IVF indexes...")
+        start_time = time.perf_counter()
+        indexes = build_ann_indexes(scorer, backend)
+        print(f"  Build time: {time.perf_counter() - start_time:.2f} s")
+    print(f"  Lists per modality: {indexes['pose'].n_lists}")
+    print()
+
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(scorer), args.queries, replace=False)
+    pose_queries = scorer.pose[rows] + 0.5 * rng.normal(size=(args.queries, scorer.pose_dim)) / np.sqrt(scorer.pose_dim)
+    clip_queries = scorer.clip[rng.permutation(rows)] + 0.5 * rng.normal(size=(args.queries, scorer.clip_dim)) / np.sqrt(scorer.clip_dim)
+
+    start_time = time.perf_counter()
+    truth = [
+        set(scorer.search(p, c, args.lambda_param, args.k)[0].tolist())
+        for p, c in zip(pose_queries, clip_queries)
+    ]
+    exact_ms = (time.perf_counter() - start_time) * 1000 / args.queries
+    print(f"Brute force: {exact_ms:.2f} ms/query (k={args.k}, lambda={args.lambda_param})")
+    print()
+
+    searcher = HybridANNSearcher(scorer, indexes, candidates=args.candidates)
+    print(f"{'nprobe':>8} {'recall@' + str(args.k):>10} {'ms/query':>10} {'speedup':>8}")
+    for nprobe in args.nprobe:
+        hits = 0
+        start_time = time.perf_counter()
+        for p, c, expected in zip(pose_queries, clip_queries, truth):
+            ids, _ = searcher.search(p, c, args.lambda_param, args.k, nprobe=nprobe)
+            hits += len(expected & set(ids.tolist()))
+        ann_ms = (time.perf_counter() - start_time) * 1000 / args.queries
+        recall = hits / (args.k * args.queries)
+        print(f"{nprobe:>8} {recall:>10.3f} {ann_ms:>10.2f} {exact_ms / ann_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
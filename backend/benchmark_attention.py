@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+CPU benchmark of the SAM 3D Body attention backends: latency and peak memory of
+a ViT-H attention layer (1280 dims, 16 heads) per input image size.
+
+"math" materializes the N x N attention matrix per head; "sdpa" dispatches to
+the fused kernels of torch.nn.functional.scaled_dot_product_attention. Each
+(backend, size) runs in a fresh process so its peak RSS can be measured.
+
+Run from the backend directory:
+    python benchmark_attention.py
+    python benchmark_attention.py --sizes 256x192 512x384 1024x768 --batch 4 --threads 8
+"""
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+from pathlib import Path
+
+PATCH_SIZE = 16
+
+
+def run_config(backend, height, width, batch, repeats, threads, queue):
+    import torch
+
+    sys.path.insert(0, str(Path(__file__).parent / "pose"))
+    from sam_3d_body.models.backbones.vit import Attention
+    from sam_3d_body.models.modules.transformer import set_attention_backend
+
+    if threads:
+        torch.set_num_threads(threads)
+    set_attention_backend(backend)
+    layer = Attention(dim=1280, num_heads=16, qkv_bias=True).eval()
+    x = torch.randn(batch, (height // PATCH_SIZE) * (width // PATCH_SIZE), 1280)
+
+    # ru_maxrss is a high-water mark (KiB on Linux): measure above the baseline
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with torch.no_grad():
+        layer(x)  # warm up
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            layer(x)
+        latency = (time.perf_counter() - start_time) / repeats
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    queue.put((latency, peak / 1024))
+
+
+def measure(backend, size, args):
+    height, width = size
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=run_config, args=(
+        backend, height, width, args.batch, args.repeats, args.threads, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def parse_size(text):
+    height, width = text.lower().split("x")
+    return int(height), int(width)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attention backend benchmark (CPU)")
+    parser.add_argument("--sizes", type=parse_size, nargs="+",
+                        default=[(256, 192), (512, 384), (1024, 768)])
+    parser.add_argument("--backends", nargs="+", default=["math", "sdpa"])
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    args = parser.parse_args()
+
+    print(f"ViT-H attention layer, batch {args.batch}")
+    print(f"{'image':>10} {'tokens':>7} {'backend':>8} {'ms':>9} {'peak MiB':>9}")
+    for height, width in args.sizes:
+        tokens = (height // PATCH_SIZE) * (width // PATCH_SIZE)
+        for backend in args.backends:
+            latency, peak = measure(backend, (height, width), args)
+            print(f"{f'{height}x{width}':>10} {tokens:>7} {backend:>8} "
+                  f"{latency * 1000:>9.1f} {peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
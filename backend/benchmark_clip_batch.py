@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+CPU benchmark of batched CLIP encoding: items/sec against micro-batch size.
+
+Compares one call per item (encode_image, and encode_texts_batch with a single
+text, as ingestion and the portrait-keyword table used to do) with
+encode_images_batch / encode_texts_batch at several batch sizes. Runs the Clip class locally via .local() on the CPU.
+
+Run from the backend directory:
+    python benchmark_clip_batch.py
+    python benchmark_clip_batch.py --items 256 --batch-sizes 1 8 32 128 --threads 8
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+# Force the local CPU path before the model is set up
+os.environ.setdefault("CLIP_DEVICE", "cpu")
+
+from clip.clipModel import Clip  # noqa: E402
+
+
+def synthetic_images(n: int, seed: int = 0):
+    """Random RGB images of mixed sizes, like downloaded pins."""
+    rng = np.random.default_rng(seed)
+    sizes = [(736, 552), (1024, 768), (600, 600), (1200, 800)]
+    return [rng.integers(0, 255, (*sizes[i % len(sizes)], 3), dtype=np.uint8) for i in range(n)]
+
+
+def synthetic_texts(n: int, seed: int = 0):
+    words = ["a", "person", "dancing", "standing", "sitting", "full", "body", "pose",
+             "portrait", "dynamic", "running", "jumping", "reference", "figure"]
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(words, rng.integers(2, 12))) for _ in range(n)]
+
+
+def items_per_second(fn, n_items: int) -> float:
+    start_time = time.perf_counter()
+    fn()
+    return n_items / (time.perf_counter() - start_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLIP batch encoding benchmark (CPU)")
+    parser.add_argument("--items", type=int, default=128)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16, 32, 64])
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    clip_model = Clip()
+    images = synthetic_images(args.items)
+    texts = synthetic_texts(args.items)
+
+    # Warm up (model load, first-call allocations)
+    clip_model.encode_images_batch.local(images[:2])
+    clip_model.encode_texts_batch.local(texts[:2])
+
+    print(f"Items: {args.items}")
+    print(f"{'mode':>18} {'images/s':>10} {'texts/s':>10}")
+
+    image_rate = items_per_second(
+        lambda: [clip_model.encode_image.local(image=image) for image in images], args.items)
+    text_rate = items_per_second(
+        lambda: [clip_model.encode_texts_batch.local([text]) for text in texts], args.items)
+    print(f"{'per item':>18} {image_rate:>10.1f} {text_rate:>10.1f}")
+
+    for batch_size in args.batch_sizes:
+        image_rate = items_per_second(
+            lambda: clip_model.encode_images_batch.local(images, batch_size=batch_size), args.items)
+        text_rate = items_per_second(
+            lambda: clip_model.encode_texts_batch.local(texts, batch_size=batch_size), args.items)
+        print(f"{'batch ' + str(batch_size):>18} {image_rate:>10.1f} {text_rate:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Load test of CLIP text micro-batching (clip.text_batcher.TextBatcher, used by
+Clip.encode_text): throughput and latency under synthetic concurrent load.
+
+Concurrent clients send one query each at a time, drawn with repeats from a
+pool of short and long synthetic queries, to a stand-in text encoder. The
+stand-in's forward pass costs a fixed overhead plus a time per padded token,
+and it serves one batch at a time like a single GPU. Compares one forward
+pass per request with the TextBatcher with a single length bucket (padding
+to the longest text) and with token-length buckets.
+
+Run from the backend directory:
+    python benchmark_clip_text_queue.py
+    python benchmark_clip_text_queue.py --clients 128 --window-ms 10 --overhead-ms 8
+"""
+import argparse
+import asyncio
+import hashlib
+import time
+
+import numpy as np
+
+from clip.text_batcher import TextBatcher
+
+CONTEXT_LENGTH = 77  # CLIP's text context, in tokens
+WORDS = ["a", "person", "dancing", "standing", "sitting", "full", "body", "pose",
+         "portrait", "dynamic", "running", "jumping", "reference", "figure"]
+
+
+class StandInTextEncoder:
+    """Tokenizer and batched encoder with CLIP-like cost and shapes."""
+
+    def __init__(self, overhead: float, per_token: float, tokenize_cost: float):
+        self.overhead = overhead
+        self.per_token = per_token
+        self.tokenize_cost = tokenize_cost
+
+    def tokenize(self, text: str):
+        time.sleep(self.tokenize_cost)
+        ids = [int(hashlib.md5(word.encode()).hexdigest()[:4], 16) for word in text.split()]
+        # Start / end tokens, truncated to the context
+        return [49406, *ids[:CONTEXT_LENGTH - 2], 49407]
+
+    def encode(self, token_ids):
+        padded_length = max(len(ids) for ids in token_ids)
+        time.sleep(self.overhead + self.per_token * len(token_ids) * padded_length)
+        return np.stack([
+            np.random.default_rng(abs(hash(ids)) % 2**32).normal(size=512).astype(np.float32)
+            for ids in token_ids
+        ])
+
+
+def synthetic_queries(n: int, long_fraction: float, seed: int = 0):
+    """Mostly short search queries, some long descriptions."""
+    rng = np.random.default_rng(seed)
+    lengths = np.where(rng.random(n) < long_fraction,
+                       rng.integers(20, 70, n), rng.integers(2, 10, n))
+    return [" ".join(rng.choice(WORDS, length)) for length in lengths]
+
+
+async def run_clients(encode, queries, num_clients: int, requests_per_client: int, seed: int = 0):
+    """Closed loop: each client sends its next query when the last one returns."""
+    rng = np.random.default_rng(seed)
+    # Zipf-like popularity: some queries repeat a lot
+    weights = 1 / np.arange(1, len(queries) + 1)
+    picks = rng.choice(len(queries), (num_clients, requests_per_client), p=weights / weights.sum())
+    latencies = []
+
+    async def client(idx):
+        for pick in picks[idx]:
+            start_time = time.perf_counter()
+            await encode(queries[pick])
+            latencies.append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(client(idx) for idx in range(num_clients)))
+    return time.perf_counter() - start_time, np.array(latencies)
+
+
+def report(label, elapsed, latencies, extra=""):
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(f"{label:>18} {len(latencies) / elapsed:>9.1f} {p50:>8.1f} {p99:>8.1f} {extra}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="CLIP text micro-batching load test")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--queries", type=int, default=500, help="distinct queries")
+    parser.add_argument("--long-fraction", type=float, default=0.2)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--bucket-size", type=int, default=16)
+    parser.add_argument("--overhead-ms", type=float, default=5.0,
+                        help="stand-in cost per forward pass")
+    parser.add_argument("--per-token-us", type=float, default=5.0,
+                        help="stand-in cost per padded token in a forward pass")
+    parser.add_argument("--tokenize-us", type=float, default=100.0)
+    args = parser.parse_args()
+
+    queries = synthetic_queries(args.queries, args.long_fraction)
+    print(f"Clients: {args.clients} x {args.requests} requests over {args.queries} queries, "
+          f"stand-in cost: {args.overhead_ms:g} ms + {args.per_token_us:g} us/token")
+    print(f"{'mode':>18} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+
+    # One request per forward pass, one forward pass at a time
+    encoder = StandInTextEncoder(args.overhead_ms / 1000, args.per_token_us / 1e6,
+                                 args.tokenize_us / 1e6)
+    device_lock = asyncio.Lock()
+
+    async def encode_unbatched(text):
+        token_ids = tuple(encoder.tokenize(text))
+        async with device_lock:
+            return (await asyncio.to_thread(encoder.encode, [token_ids]))[0]
+
+    report("unbatched", *await run_clients(encode_unbatched, queries, args.clients, args.requests))
+
+    for label, bucket_size in (("one bucket", CONTEXT_LENGTH), ("token buckets", args.bucket_size)):
+        encoder = StandInTextEncoder(args.overhead_ms / 1000, args.per_token_us / 1e6,
+                                     args.tokenize_us / 1e6)
+        batcher = TextBatcher(encoder.tokenize, encoder.encode,
+                              max_batch_size=args.max_batch_size,
+                              max_wait=args.window_ms / 1000, bucket_size=bucket_size)
+        elapsed, latencies = await run_clients(batcher.encode, queries, args.clients, args.requests)
+        stats = batcher.stats()
+        report(label, elapsed, latencies,
+               f" mean batch {stats['mean_batch_size']:.1f}, "
+               f"padding {stats['padding_overhead']:.0%}, "
+               f"tokenizer cache hits {stats['tokenizer_cache_hit_rate']:.0%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Report memory saved and ranking agreement of compressed first-pass scoring.
+
+For each codec configuration this prints the in-memory size of the codes, the
+recall@k of the compressed scores alone, and the recall@k / latency after the
+exact rerank, all against brute-force full-precision search.
+
+Run from the backend directory:
+    python benchmark_compression.py
+    python benchmark_compression.py --synthetic 100000 --rerank 128
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmark_ann import synthetic_corpus
+from search.quantize import CompressedModality, CompressedSearcher
+from search.scoring import HybridScorer, top_k
+from search.store import MANIFEST_NAME, EmbeddingStore, load_embedding_store
+
+# (label, codec, pca_dims, pq sub-spaces)
+CONFIGS = [
+    ("int8", "int8", None, None),
+    ("pca256+int8", "int8", 256, None),
+    ("pca128+int8", "int8", 128, None),
+    ("pq32", "pq", None, 32),
+    ("pq16", "pq", None, 16),
+    ("pca128+pq16", "pq", 128, 16),
+]
+
+
+def main():
+    backend_dir = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Compressed embedding benchmark")
+    parser.add_argument("--store", type=Path, default=backend_dir / "data" / "embedding_store")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Use a synthetic corpus of this size instead of the store")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lambda", dest="lambda_param", type=float, default=0.5)
+    parser.add_argument("--rerank", type=int, default=256)
+    args = parser.parse_args()
+
+    if args.synthetic or not (args.store / MANIFEST_NAME).exists():
+        n = args.synthetic or 50_000
+        print(f"Using synthetic corpus: {n} images")
+        pose, clip = synthetic_corpus(n)
+        store = EmbeddingStore([str(i) for i in range(n)], pose, clip)
+    else:
+        print(f"Using embedding store: {args.store}")
+        store = load_embedding_store(args.store)
+
+    scorer = HybridScorer.from_store(store)
+    full_bytes = scorer.matrix.nbytes
+    print(f"Full precision (normalized, in memory): {full_bytes / (1024 * 1024):.2f} MB")
+
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(scorer), args.queries, replace=False)
+    pose_queries = scorer.pose[rows] + 0.5 * rng.normal(size=(args.queries, scorer.pose_dim)) / np.sqrt(scorer.pose_dim)
+    clip_queries = scorer.clip[rng.permutation(rows)] + 0.5 * rng.normal(size=(args.queries, scorer.clip_dim)) / np.sqrt(scorer.clip_dim)
+
+    start_time = time.perf_counter()
+    truth = [
+        set(scorer.search(p, c, args.lambda_param, args.k)[0].tolist())
+        for p, c in zip(pose_queries, clip_queries)
+    ]
+    exact_ms = (time.perf_counter() - start_time) * 1000 / args.queries
+    print(f"Brute force: {exact_ms:.2f} ms/query (k={args.k}, lambda={args.lambda_param}, "
+          f"rerank={args.rerank})")
+    print()
+
+    print(f"{'config':>14} {'MB':>8} {'saved':>7} {'build s':>8} "
+          f"{'1st-pass R@' + str(args.k):>14} {'rerank R@' + str(args.k):>12} {'ms/query':>9}")
+    for label, codec, pca_dims, n_subspaces in CONFIGS:
+        start_time = time.perf_counter()
+        compressed = [
+            CompressedModality.build(matrix, codec, pca_dims, n_subspaces or 16)
+            for matrix in (scorer.pose, scorer.clip)
+        ]
+        build_s = time.perf_counter() - start_time
+        searcher = CompressedSearcher(store, *compressed, rerank=args.rerank)
+
+        first_hits = rerank_hits = 0
+        start_time = time.perf_counter()
+        for p, c, expected in zip(pose_queries, clip_queries, truth):
+            ids, _ = searcher.search(p, c, args.lambda_param, args.k)
+            rerank_hits += len(expected & set(ids.tolist()))
+        search_ms = (time.perf_counter() - start_time) * 1000 / args.queries
+
+        for p, c, expected in zip(pose_queries, clip_queries, truth):
+            approx_ids, _ = top_k(searcher.approximate_scores(p, c, args.lambda_param), args.k)
+            first_hits += len(expected & set(approx_ids.tolist()))
+
+        total = args.k * args.queries
+        print(f"{label:>14} {searcher.nbytes / (1024 * 1024):>8.2f} "
+              f"{full_bytes / searcher.nbytes:>6.1f}x {build_s:>8.1f} "
+              f"{first_hits / total:>14.3f} {rerank_hits / total:>12.3f} {search_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
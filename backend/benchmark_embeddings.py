@@ -1,47 +1,132 @@
 #!/usr/bin/env python3
-"""Benchmark script to measure how long it takes to load embeddings.json"""
+"""
+Benchmark loading the corpus embeddings: legacy embeddings.json vs the binary store.
 
+Each format is loaded in a fresh subprocess so the reported RSS reflects only that
+format. For the store, RSS is reported right after opening (mmap, nothing paged in)
+and after a full scan of both matrices (what a brute-force search touches).
+
+Run from the backend directory:
+    python benchmark_embeddings.py
+    python benchmark_embeddings.py --json data/embeddings.json --store data/embedding_store
+"""
+
+import argparse
 import json
+import multiprocessing as mp
+import resource
+import sys
+import tempfile
 import time
 from pathlib import Path
 
+import numpy as np
+
+from search.store import convert_embeddings_json, load_embedding_store
+
+
+def _rss_mb() -> float:
+    """Current resident set size in MB (falls back to peak RSS off Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, kilobytes on Linux
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _bench_json(path: Path, queue: mp.Queue) -> None:
+    rss_before = _rss_mb()
+    start_time = time.perf_counter()
+    with open(path, "r") as f:
+        embeddings_data = json.load(f)
+    load_time = time.perf_counter() - start_time
+
+    queue.put({
+        "load_s": load_time,
+        "rss_load_mb": _rss_mb() - rss_before,
+        "num_images": len(embeddings_data.get("embeddings", {})),
+    })
+
+
+def _bench_store(root: Path, queue: mp.Queue) -> None:
+    rss_before = _rss_mb()
+    start_time = time.perf_counter()
+    store = load_embedding_store(root)
+    load_time = time.perf_counter() - start_time
+    rss_load = _rss_mb() - rss_before
+
+    # Touch every row, like a brute-force search does
+    start_time = time.perf_counter()
+    checksum = float(np.asarray(store.pose).sum() + np.asarray(store.clip).sum())
+    scan_time = time.perf_counter() - start_time
+
+    queue.put({
+        "load_s": load_time,
+        "rss_load_mb": rss_load,
+        "scan_s": scan_time,
+        "rss_scan_mb": _rss_mb() - rss_before,
+        "num_images": len(store),
+        "checksum": checksum,
+    })
+
+
+def _run_isolated(target, path: Path) -> dict:
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=target, args=(path, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def _dir_size_mb(root: Path) -> float:
+    return sum(p.stat().st_size for p in root.iterdir() if p.is_file()) / (1024 * 1024)
+
 
 def main():
-    # Path to embeddings.json
-    embeddings_path = Path(__file__).parent / "data" / "embeddings.json"
+    backend_dir = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Benchmark embedding load formats")
+    parser.add_argument("--json", type=Path, default=backend_dir / "data" / "embeddings.json")
+    parser.add_argument("--store", type=Path, default=backend_dir / "data" / "embedding_store")
+    args = parser.parse_args()
 
+    embeddings_path = args.json
     print(f"Loading embeddings from: {embeddings_path}")
     print(f"File size: {embeddings_path.stat().st_size / (1024 * 1024):.2f} MB")
     print()
 
-    # Measure loading time
-    start_time = time.time()
-
-    with open(embeddings_path, "r") as f:
-        embeddings_data = json.load(f)
+    json_result = _run_isolated(_bench_json, embeddings_path)
+    print("embeddings.json (json.load)")
+    print(f"  Time taken: {json_result['load_s']:.3f} seconds ({json_result['load_s'] * 1000:.1f} ms)")
+    print(f"  RSS after load: +{json_result['rss_load_mb']:.1f} MB")
+    print(f"  Number of images: {json_result['num_images']}")
+    print()
 
-    end_time = time.time()
-    load_time = end_time - start_time
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store_dir = args.store
+        if not (store_dir / "manifest.json").exists():
+            store_dir = Path(tmp_dir) / "embedding_store"
+            print(f"No store at {args.store}, converting into {store_dir}...")
+            start_time = time.perf_counter()
+            convert_embeddings_json(embeddings_path, store_dir)
+            print(f"  Conversion took {time.perf_counter() - start_time:.3f} seconds")
+            print()
 
-    # Print results
-    print(f"✓ Loaded successfully!")
-    print(f"  Time taken: {load_time:.3f} seconds ({load_time * 1000:.1f} ms)")
-    print()
+        store_result = _run_isolated(_bench_store, store_dir)
+        print(f"embedding store (mmap, {_dir_size_mb(store_dir):.2f} MB on disk)")
+        print(f"  Time taken: {store_result['load_s']:.3f} seconds ({store_result['load_s'] * 1000:.1f} ms)")
+        print(f"  RSS after load: +{store_result['rss_load_mb']:.1f} MB")
+        print(f"  Full scan: {store_result['scan_s'] * 1000:.1f} ms, "
+              f"RSS after scan: +{store_result['rss_scan_mb']:.1f} MB")
+        print(f"  Number of images: {store_result['num_images']}")
+        print()
 
-    # Print some stats about the loaded data
-    if "embeddings" in embeddings_data:
-        num_images = len(embeddings_data["embeddings"])
-        print(f"  Number of images: {num_images}")
-
-        # Check first entry structure
-        if num_images > 0:
-            first_key = list(embeddings_data["embeddings"].keys())[0]
-            first_entry = embeddings_data["embeddings"][first_key]
-            print(f"  Sample entry key: {first_key}")
-            if "pose_embedding" in first_entry:
-                print(f"  Pose embedding dimension: {len(first_entry['pose_embedding'])}")
-            if "clip_embedding" in first_entry:
-                print(f"  CLIP embedding dimension: {len(first_entry['clip_embedding'])}")
+    if store_result["load_s"] > 0:
+        print(f"Load speedup: {json_result['load_s'] / store_result['load_s']:.1f}x")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark of batched SAM 3D Body 2D pose estimation: images/sec by batch size.
+
+Runs the keypoints_2d path of SAM3DBodyInference on the test images, once
+image by image (process_one_image, as predict_2d_pose) and then through
+process_images (as predict_2d_poses) with several person-crop batch sizes,
+and checks that the batched keypoints match the per-image ones.
+
+Run from the backend directory, with the checkpoints in backend/checkpoints
+(python pose/download.py):
+    python benchmark_pose_batch.py
+    python benchmark_pose_batch.py --device cpu --batch-sizes 1 2 4 8 --images 16
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent / "pose"))
+
+from sam_3d_body import SAM3DBodyEstimator, load_sam_3d_body  # noqa: E402
+
+CHECKPOINT_DIR = Path(__file__).parent / "checkpoints" / "sam-3d-body-dinov3"
+TEST_IMAGES = sorted((Path(__file__).parent / "data" / "test").glob("*.png"))
+
+
+def load_images(paths, num_images: int):
+    images = [np.array(Image.open(path).convert("RGB")) for path in paths]
+    # Cycle the test images up to the requested count
+    return [images[idx % len(images)] for idx in range(num_images)]
+
+
+def synchronize(device: str) -> None:
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+
+
+def time_call(fn, device: str, repeats: int):
+    fn()  # warm up (allocations, kernel selection for this batch shape)
+    synchronize(device)
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    synchronize(device)
+    return (time.perf_counter() - start_time) / repeats, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SAM 3D Body batched inference benchmark")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--images", type=int, default=32, help="images per run")
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--checkpoint-dir", type=Path, default=CHECKPOINT_DIR)
+    args = parser.parse_args()
+
+    model, model_cfg = load_sam_3d_body(
+        checkpoint_path=str(args.checkpoint_dir / "model.ckpt"),
+        mhr_path=str(args.checkpoint_dir / "assets" / "mhr_model.pt"),
+        device=args.device,
+    )
+    estimator = SAM3DBodyEstimator(sam_3d_body_model=model, model_cfg=model_cfg)
+    images = load_images(TEST_IMAGES, args.images)
+
+    print(f"Device: {args.device}, images: {len(images)} x {args.repeats}")
+    print(f"Memory-based batch size limit: {estimator.batch_size_limit()}")
+    print(f"{'batch size':>12} {'images/s':>10} {'ms/image':>9} {'max |diff|':>11}")
+
+    seconds, reference = time_call(
+        lambda: [estimator.process_one_image(image, inference_type="keypoints_2d")
+                 for image in images],
+        args.device, args.repeats)
+    print(f"{'per image':>12} {len(images) / seconds:>10.2f} "
+          f"{1000 * seconds / len(images):>9.1f} {'-':>11}")
+
+    for batch_size in args.batch_sizes:
+        seconds, keypoints = time_call(
+            lambda: estimator.process_images(images, max_batch_size=batch_size),
+            args.device, args.repeats)
+        max_diff = max((float(np.abs(a - b).max()) for a, b in zip(keypoints, reference)
+                        if len(a)), default=0.0)
+        print(f"{batch_size:>12} {len(images) / seconds:>10.2f} "
+              f"{1000 * seconds / len(images):>9.1f} {max_diff:>11.2e}")
+
+
+if __name__ == "__main__":
+    main()
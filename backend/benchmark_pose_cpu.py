@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+CPU benchmark of SAM 3D Body 2D pose estimation: images/sec by thread count.
+
+Loads the model on the CPU and runs the keypoints_2d path used by
+SAM3DBodyInference.predict_2d_pose (full-image box, body decoder only) on the
+test images, for several intra-op thread counts.
+
+Run from the backend directory, with the checkpoints in backend/checkpoints
+(python pose/download.py):
+    python benchmark_pose_cpu.py
+    python benchmark_pose_cpu.py --threads 1 2 4 8 16 --repeats 3 --interop-threads 2
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent / "pose"))
+
+from sam_3d_body import SAM3DBodyEstimator, configure_cpu_threads, load_sam_3d_body  # noqa: E402
+
+CHECKPOINT_DIR = Path(__file__).parent / "checkpoints" / "sam-3d-body-dinov3"
+TEST_IMAGES = sorted((Path(__file__).parent / "data" / "test").glob("*.png"))
+
+
+def load_images(paths):
+    return [np.array(Image.open(path).convert("RGB")) for path in paths]
+
+
+def images_per_second(estimator, images, repeats: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for image in images:
+            estimator.process_one_image(image, inference_type="keypoints_2d")
+    return repeats * len(images) / (time.perf_counter() - start_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SAM 3D Body CPU benchmark")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--interop-threads", type=int, default=0,
+                        help="torch inter-op threads (0 = default)")
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--checkpoint-dir", type=Path, default=CHECKPOINT_DIR)
+    args = parser.parse_args()
+
+    configure_cpu_threads(inter_op_threads=args.interop_threads or None)
+    model, model_cfg = load_sam_3d_body(
+        checkpoint_path=str(args.checkpoint_dir / "model.ckpt"),
+        mhr_path=str(args.checkpoint_dir / "assets" / "mhr_model.pt"),
+        device="cpu",
+    )
+    estimator = SAM3DBodyEstimator(sam_3d_body_model=model, model_cfg=model_cfg)
+    images = load_images(TEST_IMAGES)
+
+    # Warm up (first-call allocations, lazy init)
+    estimator.process_one_image(images[0], inference_type="keypoints_2d")
+
+    print(f"Images: {len(images)} x {args.repeats}, "
+          f"inter-op threads: {torch.get_num_interop_threads()}")
+    print(f"{'threads':>8} {'images/s':>10} {'s/image':>9}")
+    for num_threads in args.threads:
+        configure_cpu_threads(intra_op_threads=num_threads)
+        rate = images_per_second(estimator, images, args.repeats)
+        print(f"{num_threads:>8} {rate:>10.2f} {1 / rate:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+CPU microbenchmark of PoseC3D heatmap rendering (GeneratePoseTarget).
+
+Renders the PoseEmbedding input case (48 frames, 17 COCO keypoints, 64x64
+heatmaps, one person) with each heatmap backend, reports ms and clips/sec and
+checks the vectorized output against the reference loop. --limb renders the
+17 limb heatmaps of the limb-stream configs instead of the keypoints.
+
+Run from the backend directory (needs the PoseEmbedding dependencies: mmcv,
+mmengine, torch):
+    python benchmark_pose_heatmaps.py
+    python benchmark_pose_heatmaps.py --frames 48 --persons 2 --size 64 --repeats 50
+    python benchmark_pose_heatmaps.py --limb
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent / "pose_embed"))
+
+from mmaction.datasets.transforms.pose_transforms import GeneratePoseTarget  # noqa: E402
+
+
+def synthetic_results(num_person: int, num_frame: int, num_kp: int, size: int, seed: int = 0):
+    """Random poses spread over the crop, as produced by PoseCompact + Resize."""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0.4 * size, 0.6 * size, (num_person, num_frame, 1, 2))
+    keypoints = centers + rng.normal(0, size / 8, (num_person, num_frame, num_kp, 2))
+    return dict(
+        keypoint=np.clip(keypoints, 0, size - 1).astype(np.float32),
+        keypoint_score=rng.uniform(0.3, 1, (num_person, num_frame, num_kp)).astype(np.float32),
+        img_shape=(size, size),
+    )
+
+
+def ms_per_call(fn, repeats: int) -> float:
+    fn()  # warm up
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start_time) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GeneratePoseTarget heatmap benchmark (CPU)")
+    parser.add_argument("--frames", type=int, default=48)
+    parser.add_argument("--keypoints", type=int, default=17)
+    parser.add_argument("--persons", type=int, default=1)
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--limb", action="store_true", help="render limb instead of keypoint heatmaps")
+    args = parser.parse_args()
+
+    results = synthetic_results(args.persons, args.frames, args.keypoints, args.size)
+    target = dict(with_kp=False, with_limb=True) if args.limb else dict(with_kp=True, with_limb=False)
+    print(f"{args.persons} person(s) x {args.frames} frames x {args.keypoints} keypoints, "
+          f"{args.size}x{args.size} {'limb' if args.limb else 'keypoint'} heatmaps\n")
+
+    reference = GeneratePoseTarget(backend="loop", **target).gen_an_aug(dict(results))
+    baseline = None
+    print(f"{'backend':>8} {'ms/clip':>10} {'clips/s':>9} {'speedup':>8} {'max |diff|':>11}")
+    for backend in GeneratePoseTarget.BACKENDS:
+        transform = GeneratePoseTarget(backend=backend, **target)
+        elapsed = ms_per_call(lambda: transform.gen_an_aug(dict(results)), args.repeats)
+        heatmaps = np.asarray(transform.gen_an_aug(dict(results)))
+        baseline = baseline or elapsed
+        max_diff = float(np.abs(heatmaps - reference).max())
+        print(f"{backend:>8} {elapsed:>10.2f} {1000 / elapsed:>9.1f} {baseline / elapsed:>7.1f}x "
+              f"{max_diff:>11.2e}")
+
+
+if __name__ == "__main__":
+    main()
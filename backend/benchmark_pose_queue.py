@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Load test of the predict_2d_pose request queue (cross-request micro-batching).
+
+Concurrent clients call a CPU stand-in of SAM3DBodyInference (see
+search.local_models.LocalSAM3DBody) whose forward pass costs a fixed overhead
+plus a per-image time, served one call at a time like a single GPU. Compares
+unbatched calls with the MicroBatcher used by SAM3DBodyInference at several
+batching windows, and reports throughput, latency percentiles and the
+batch-size / queue-depth histograms.
+
+Run from the backend directory:
+    python benchmark_pose_queue.py
+    python benchmark_pose_queue.py --clients 64 --windows 0 5 10 20 --overhead-ms 30
+"""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent / "pose"))
+
+from search.local_models import LocalSAM3DBody  # noqa: E402
+from tools.micro_batcher import MicroBatcher  # noqa: E402
+
+
+def run_clients(predict, images, num_clients: int, requests_per_client: int):
+    """Closed loop: each client sends its next request when the last one returns."""
+    latencies = [[] for _ in range(num_clients)]
+
+    def client(idx):
+        for request in range(requests_per_client):
+            image = images[(idx + request) % len(images)]
+            start_time = time.perf_counter()
+            predict(image)
+            latencies[idx].append(time.perf_counter() - start_time)
+
+    threads = [threading.Thread(target=client, args=(idx,)) for idx in range(num_clients)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    return elapsed, np.concatenate(latencies)
+
+
+def report(label, elapsed, latencies):
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(f"{label:>14} {len(latencies) / elapsed:>10.1f} {p50:>9.1f} {p99:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="predict_2d_pose micro-batching load test")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 5, 10, 20],
+                        help="batching windows in ms")
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--overhead-ms", type=float, default=20.0,
+                        help="stand-in cost per forward pass")
+    parser.add_argument("--per-image-ms", type=float, default=2.0,
+                        help="stand-in cost per image in a forward pass")
+    args = parser.parse_args()
+
+    model = LocalSAM3DBody(latency=args.overhead_ms / 1000,
+                           per_image_latency=args.per_image_ms / 1000)
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 255, (64, 48, 3), dtype=np.uint8) for _ in range(8)]
+
+    print(f"Clients: {args.clients} x {args.requests} requests, stand-in cost: "
+          f"{args.overhead_ms:g} ms + {args.per_image_ms:g} ms/image")
+    print(f"{'mode':>14} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+
+    # One device: unbatched calls are served one at a time
+    device_lock = threading.Lock()
+
+    def predict_unbatched(image):
+        with device_lock:
+            return model.predict_2d_pose.remote(image)
+
+    report("unbatched", *run_clients(predict_unbatched, images, args.clients, args.requests))
+
+    all_stats = {}
+    for window_ms in args.windows:
+        batcher = MicroBatcher(model.predict_2d_poses.remote,
+                               max_batch_size=args.max_batch_size,
+                               max_wait=window_ms / 1000)
+        label = f"window {window_ms:g} ms"
+        report(label, *run_clients(batcher, images, args.clients, args.requests))
+        batcher.close()
+        all_stats[label] = batcher.stats()
+
+    for label, stats in all_stats.items():
+        print(f"\n{label}: {stats['batches']} batches, "
+              f"mean batch size {stats['mean_batch_size']:.1f}")
+        print(f"  batch sizes:  {stats['batch_size_histogram']}")
+        print(f"  queue depths: {stats['queue_depth_histogram']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,41 @@
 """
 Modal wrapper for CLIP model for text and image embeddings.
 """
-from typing import Union, List
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Iterator, List, Union
 import numpy as np
 
 from modal_app import image, app
 import modal
 
+from clip.text_batcher import TextBatcher
+from search.store import CLIP_MODEL
+
 # Container-only imports
 with image.imports():
     import torch
     from transformers import CLIPProcessor, CLIPModel
     from PIL import Image
 
+# Default micro-batch sizes for the batch methods (ViT-B/32 fits these easily on an A10G)
+IMAGE_BATCH_SIZE = 64
+TEXT_BATCH_SIZE = 256
+# Threads decoding/resizing images while the model runs the previous micro-batch
+PREPROCESS_WORKERS = 4
+# Concurrent encode_text calls are coalesced (see TextBatcher): a text waits up
+# to TEXT_BATCH_WINDOW_MS for others of similar token length (buckets of
+# TEXT_TOKEN_BUCKET tokens), up to TEXT_QUEUE_BATCH_SIZE texts per forward pass
+TEXT_BATCH_WINDOW_MS = 5.0
+TEXT_TOKEN_BUCKET = 16
+TEXT_QUEUE_BATCH_SIZE = 64
+# Inputs served concurrently by one container, i.e. the calls that can be batched
+MAX_CONCURRENT_INPUTS = 64
+
 
 @app.cls(gpu="A10G", image=image, container_idle_timeout=300, keep_warm=1)
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
 class Clip:
     """Modal model class for CLIP text and image embeddings."""
 
@@ -22,15 +43,26 @@ class Clip:
     def setup(self):
         """Initialize the CLIP model."""
         print("Loading CLIP model...")
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-        self.processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+        # CLIP_DEVICE overrides the device, e.g. CLIP_DEVICE=cpu for local benchmarks
+        self.device = os.environ.get("CLIP_DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.model = CLIPModel.from_pretrained(CLIP_MODEL)
+        self.processor = CLIPProcessor.from_pretrained(CLIP_MODEL)
         self.model.to(self.device)
         self.model.eval()
+        # One thread prepares the next micro-batch, which decodes its images on the pool
+        self.prefetch_pool = ThreadPoolExecutor(max_workers=1)
+        self.preprocess_pool = ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS)
+        self.text_batcher = TextBatcher(
+            self._tokenize_text,
+            self._encode_token_ids,
+            max_batch_size=TEXT_QUEUE_BATCH_SIZE,
+            max_wait=TEXT_BATCH_WINDOW_MS / 1000,
+            bucket_size=TEXT_TOKEN_BUCKET,
+        )
         print("CLIP model loaded successfully!")
 
     @modal.method()
-    def encode_text(
+    async def encode_text(
         self,
         texts: Union[str, List[str]],
         normalize: bool = False,
@@ -38,6 +70,9 @@ class Clip:
         """
         Encode text(s) into CLIP embeddings.
 
+        Each text is batched with the concurrent encode_text calls of similar
+        token length (see TextBatcher).
+
         Args:
             texts: Single text string or list of text strings
             normalize: If True, normalize the embeddings to unit vectors
@@ -48,27 +83,19 @@ class Clip:
         # Ensure texts is a list
         if isinstance(texts, str):
             texts = [texts]
+        if not texts:
+            return self._stack([])
 
-        inputs = self.processor(
-            text=texts, return_tensors="pt", padding=True, truncation=True
-        ).to(self.device)
-
-        with torch.no_grad():
-            outputs = self.model.get_text_features(**inputs)
-
-            # get_text_features returns BaseModelOutputWithPooling
-            # Use pooler_output (pooled features) or fallback to last_hidden_state[:, 0]
-            if outputs.pooler_output is not None:
-                features = outputs.pooler_output
-            else:
-                # Fallback to last_hidden_state - take the [CLS] token (first token)
-                features = outputs.last_hidden_state[:, 0]
-
+        features = await self.text_batcher.encode_many(texts)
         if normalize:
-            features = torch.nn.functional.normalize(features, dim=-1)
+            features = features / np.maximum(
+                np.linalg.norm(features, axis=-1, keepdims=True), 1e-12)
+        return features.astype(np.float32)
 
-        # Convert to numpy and return
-        return features.cpu().numpy().astype(np.float32)
+    @modal.method()
+    def text_batching_stats(self) -> dict:
+        """Batch sizes, padding overhead and tokenizer cache hit rate of encode_text."""
+        return self.text_batcher.stats()
 
     @modal.method()
     def encode_image(
@@ -117,3 +144,119 @@ class Clip:
 
         # Convert to numpy and return
         return features.cpu().numpy().astype(np.float32)
+
+    @modal.method()
+    def encode_texts_batch(
+        self,
+        texts: List[str],
+        normalize: bool = False,
+        batch_size: int = TEXT_BATCH_SIZE,
+    ) -> np.ndarray:
+        """
+        Encode many texts in size-bounded micro-batches.
+
+        Args:
+            texts: List of text strings
+            normalize: If True, normalize the embeddings to unit vectors
+            batch_size: Maximum texts per forward pass
+
+        Returns:
+            Numpy array of embeddings. Shape: (len(texts), embedding_dim)
+        """
+        features = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.processor(
+                text=texts[start:start + batch_size], return_tensors="pt",
+                padding=True, truncation=True,
+            ).to(self.device)
+            with torch.no_grad():
+                features.append(self._pooled(self.model.get_text_features(**inputs), normalize))
+        return self._stack(features)
+
+    @modal.method()
+    def encode_images_batch(
+        self,
+        images: List[Union[np.ndarray, "Image.Image", bytes]],
+        normalize: bool = False,
+        batch_size: int = IMAGE_BATCH_SIZE,
+    ) -> np.ndarray:
+        """
+        Encode many images in size-bounded micro-batches.
+
+        Preprocessing (decode, resize, normalize) of the next micro-batch runs on
+        a thread pool while the model executes the current one.
+
+        Args:
+            images: RGB numpy arrays (H, W, 3), PIL Images, or encoded image bytes
+            normalize: If True, normalize the embeddings to unit vectors
+            batch_size: Maximum images per forward pass
+
+        Returns:
+            Numpy array of embeddings. Shape: (len(images), embedding_dim)
+        """
+        features = []
+        for pixel_values in self._prefetch_image_batches(images, batch_size):
+            with torch.no_grad():
+                outputs = self.model.get_image_features(pixel_values=pixel_values.to(self.device))
+                features.append(self._pooled(outputs, normalize))
+        return self._stack(features)
+
+    def _tokenize_text(self, text: str) -> List[int]:
+        return self.processor.tokenizer(text, truncation=True)["input_ids"]
+
+    def _encode_token_ids(self, token_ids) -> np.ndarray:
+        """Unnormalized features of tokenized texts, padded to the longest one."""
+        inputs = self.processor.tokenizer.pad(
+            {"input_ids": [list(ids) for ids in token_ids]}, return_tensors="pt"
+        ).to(self.device)
+        with torch.no_grad():
+            return self._pooled(self.model.get_text_features(**inputs), normalize=False)
+
+    def _prefetch_image_batches(self, images, batch_size: int) -> Iterator["torch.Tensor"]:
+        """Yield preprocessed micro-batches, preparing the next one in the background."""
+        batches = [images[start:start + batch_size] for start in range(0, len(images), batch_size)]
+        pending = None
+        for i in range(len(batches)):
+            if pending is None:
+                pending = self.prefetch_pool.submit(self._preprocess_images, batches[i])
+            current = pending
+            pending = (self.prefetch_pool.submit(self._preprocess_images, batches[i + 1])
+                       if i + 1 < len(batches) else None)
+            yield current.result()
+
+    def _preprocess_images(self, images) -> "torch.Tensor":
+        pil_images = list(self.preprocess_pool.map(self._to_pil, images))
+        return self.processor(images=pil_images, return_tensors="pt")["pixel_values"]
+
+    @staticmethod
+    def _to_pil(image) -> "Image.Image":
+        if isinstance(image, (bytes, bytearray)):
+            image = Image.open(BytesIO(image))
+        elif isinstance(image, np.ndarray):
+            if len(image.shape) != 3 or image.shape[2] != 3:
+                raise ValueError(
+                    f"Expected RGB image array with shape (H, W, 3), got {image.shape}"
+                )
+            image = Image.fromarray(image.astype(np.uint8))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return image
+
+    @staticmethod
+    def _pooled(outputs, normalize: bool) -> np.ndarray:
+        # Same pooling as encode_text/encode_image: pooler_output, else the [CLS] token
+        if isinstance(outputs, torch.Tensor):
+            features = outputs
+        elif outputs.pooler_output is not None:
+            features = outputs.pooler_output
+        else:
+            features = outputs.last_hidden_state[:, 0]
+        if normalize:
+            features = torch.nn.functional.normalize(features, dim=-1)
+        return features.cpu().numpy().astype(np.float32)
+
+    def _stack(self, features: List[np.ndarray]) -> np.ndarray:
+        if not features:
+            dim = self.model.config.projection_dim
+            return np.zeros((0, dim), dtype=np.float32)
+        return np.concatenate(features, axis=0)
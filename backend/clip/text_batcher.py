@@ -0,0 +1,143 @@
+"""
+Cross-request micro-batching of CLIP text encoding.
+
+Search queries encode one short text each. A TextBatcher coalesces concurrent
+``await batcher.encode(text)`` calls on the event loop into batched forward
+passes:
+
+- Texts are tokenized once and the token ids are kept in an LRU cache, so
+  repeated queries skip the tokenizer.
+- Requests are grouped into buckets of ``bucket_size`` token lengths. A batch
+  only holds texts from one bucket, so it pads to at most ``bucket_size - 1``
+  extra tokens per text.
+- A bucket is dispatched when it holds ``max_batch_size`` requests or its
+  oldest request has waited ``max_wait`` seconds. Batches run one at a time
+  in a worker thread, which keeps the event loop free to queue more requests.
+
+``stats()`` reports the batch sizes, the padding overhead and the tokenizer
+cache hit rate.
+"""
+import asyncio
+from collections import Counter, deque
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# (arrival time, token ids, caller's future)
+_Request = Tuple[float, Tuple[int, ...], "asyncio.Future"]
+
+
+class TextBatcher:
+    def __init__(
+        self,
+        tokenize: Callable[[str], Sequence[int]],
+        encode: Callable[[List[Tuple[int, ...]]], np.ndarray],
+        max_batch_size: int = 64,
+        max_wait: float = 0.005,
+        bucket_size: int = 16,
+        cache_size: int = 4096,
+    ):
+        """
+        Args:
+            tokenize: Text -> token ids (truncated to the model's context)
+            encode: Token ids of a batch -> (batch, dim) features; pads itself
+            max_batch_size: Maximum texts per forward pass
+            max_wait: Seconds a request waits for others to join its batch
+            bucket_size: Token lengths per bucket
+            cache_size: Texts kept in the tokenizer cache
+        """
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}")
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.bucket_size = bucket_size
+        self._tokenize = lru_cache(maxsize=cache_size)(lambda text: tuple(tokenize(text)))
+        self._encode = encode
+        self._buckets: Dict[int, Deque[_Request]] = {}
+        self._wakeup = None
+        self._worker = None
+        self._batch_sizes = Counter()
+        self._tokens = 0
+        self._padded_tokens = 0
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Features of one text, computed in a batch with concurrent requests."""
+        token_ids = self._tokenize(text)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        bucket = max(len(token_ids) - 1, 0) // self.bucket_size
+        self._buckets.setdefault(bucket, deque()).append((loop.time(), token_ids, future))
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = loop.create_task(self._run())
+        self._wakeup.set()
+        return await future
+
+    async def encode_many(self, texts: Sequence[str]) -> np.ndarray:
+        """Features of several texts, each batched with concurrent requests."""
+        return np.stack(await asyncio.gather(*(self.encode(text) for text in texts)))
+
+    def stats(self) -> Dict[str, Any]:
+        batch_sizes = dict(sorted(self._batch_sizes.items()))
+        batches = sum(batch_sizes.values())
+        requests = sum(size * count for size, count in batch_sizes.items())
+        cache = self._tokenize.cache_info()
+        lookups = cache.hits + cache.misses
+        return {
+            "requests": requests,
+            "batches": batches,
+            "mean_batch_size": requests / batches if batches else 0.0,
+            "pending": sum(len(bucket) for bucket in self._buckets.values()),
+            "batch_size_histogram": batch_sizes,
+            "padding_overhead": self._padded_tokens / self._tokens if self._tokens else 0.0,
+            "tokenizer_cache_hit_rate": cache.hits / lookups if lookups else 0.0,
+        }
+
+    def _next_bucket(self, now: float):
+        """The bucket to dispatch now, or the time to wait until one is due."""
+        pending = {bucket: queue for bucket, queue in self._buckets.items() if queue}
+        if not pending:
+            return None, None
+        for bucket, queue in pending.items():
+            if len(queue) >= self.max_batch_size:
+                return bucket, 0.0
+        bucket = min(pending, key=lambda b: pending[b][0][0])
+        return bucket, pending[bucket][0][0] + self.max_wait - now
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            bucket, delay = self._next_bucket(loop.time())
+            if bucket is None or delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            queue = self._buckets[bucket]
+            batch = [queue.popleft() for _ in range(min(len(queue), self.max_batch_size))]
+            # Callers may have been cancelled while queued
+            batch = [request for request in batch if not request[2].done()]
+            if not batch:
+                continue
+            token_ids = [ids for _, ids, _ in batch]
+            self._batch_sizes[len(batch)] += 1
+            self._tokens += sum(len(ids) for ids in token_ids)
+            self._padded_tokens += sum(max(map(len, token_ids)) - len(ids) for ids in token_ids)
+
+            try:
+                features = await asyncio.to_thread(self._encode, token_ids)
+                if len(features) != len(batch):
+                    raise RuntimeError(
+                        f"encode returned {len(features)} features for {len(batch)} texts")
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, _, future), feature in zip(batch, features):
+                if not future.done():
+                    future.set_result(feature)
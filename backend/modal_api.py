@@ -2,105 +2,100 @@ from modal_app import app, image, volume
 from pose.inference import SAM3DBodyInference
 from pose_embed.inference import PoseEmbedding
 from clip.clipModel import Clip
+from search.index import get_search_index
+from search.ingest import extract_image_embeddings
+from search.query import QueryEmbeddingError, extract_query_embeddings
+from search.query_cache import get_query_cache
+from search.thumbnails import (
+    ORIGINAL,
+    THUMBNAIL_SIZES,
+    content_hash,
+    etag_matches,
+    mime_type,
+    resolve_image_path,
+    resolve_served_image,
+)
 import modal
 import numpy as np
 import base64
 from io import BytesIO
 from PIL import Image
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Optional, Tuple
 from pathlib import Path
-import json
-
-# --- HELPER (CPU) ---
 
+with image.imports():
+    from fastapi import Request
+    from fastapi.responses import FileResponse, Response
 
-def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
-    """
-    Compute cosine similarity between two vectors.
-
-    Args:
-        a: First vector as numpy array
-        b: Second vector as numpy array
+# Seconds between checks of the volume for a changed embedding index
+INDEX_CHECK_INTERVAL_S = 30.0
 
-    Returns:
-        Cosine similarity score between -1 and 1
-    """
-    # Convert to numpy arrays if needed
-    if not isinstance(a, np.ndarray):
-        a = np.array(a, dtype=np.float32)
-    if not isinstance(b, np.ndarray):
-        b = np.array(b, dtype=np.float32)
-
-    # Ensure they are 1D vectors
-    a = a.flatten()
-    b = b.flatten()
-
-    # Check dimensions match
-    if a.shape != b.shape:
-        raise ValueError(
-            f"Vector dimensions must match: a.shape={a.shape}, b.shape={b.shape}"
-        )
+# Query-embedding cache (C_A / P_A): in-memory LRU per container, shared across
+# containers through one .npy per entry on the volume (None disables persistence)
+QUERY_CACHE_MAX_ENTRIES = 4096
+QUERY_CACHE_TTL_S = 7 * 24 * 3600.0
+QUERY_CACHE_DIR = Path(__file__).parent / "data" / "query_cache"
 
-    # Handle zero vectors
-    norm_a = np.linalg.norm(a)
-    norm_b = np.linalg.norm(b)
+# Thumbnail tier inlined in search results unless the request asks otherwise
+DEFAULT_IMAGE_SIZE = "medium"
 
-    if norm_a == 0 or norm_b == 0:
-        return 0.0
+# Cache lifetimes for serve_image: a year when the URL pins the content hash
+# (the bytes can never change under it), otherwise revalidate via ETag hourly
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=3600"
 
-    # Compute cosine similarity
-    return float(np.dot(a, b) / (norm_a * norm_b))
+# --- HELPER (CPU) ---
 
 
-def load_embeddings_json(json_path: Path) -> Dict[str, Dict[str, List[float]]]:
+def parse_optional_count(data: Dict[str, Any], name: str) -> Optional[int]:
     """
-    Load embeddings JSON file.
-
-    Args:
-        json_path: Path to the embeddings JSON file
+    Read an optional positive integer request parameter.
 
     Returns:
-        Dictionary mapping relative paths to embeddings:
-        {relative_path: {"pose_embedding": [...], "clip_embedding": [...]}}
+        The value as an int, or None if it is missing
 
     Raises:
-        FileNotFoundError: If JSON file doesn't exist
-        ValueError: If JSON structure is invalid
+        ValueError: If the value is not an integer or is less than 1
     """
-    if not json_path.exists():
-        raise FileNotFoundError(f"Embeddings file not found: {json_path}")
-
-    print("Loading embedding json...")
-    with open(json_path, "r") as f:
-        data = json.load(f)
-    print("Done loading embeddings json!")
-    if "embeddings" not in data:
-        raise ValueError(
-            "Invalid embeddings JSON structure: missing 'embeddings' key")
-
-    return data["embeddings"]
+    value = data.get(name)
+    if value is None:
+        return None
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name} {value!r}, expected a positive integer") from None
+    if count < 1:
+        raise ValueError(f"Invalid {name} {value!r}, expected a positive integer")
+    return count
 
 
-def load_image_from_path(relative_path: str, base_dir: Path) -> bytes:
+def load_image_from_path(relative_path: str, base_dir: Path, size: str = ORIGINAL) -> Tuple[bytes, str]:
     """
-    Load image file from relative path and return as bytes.
+    Load an image file (original or thumbnail tier) from its relative path.
+
+    Falls back to the original if the requested thumbnail has not been built yet.
 
     Args:
         relative_path: Relative path from downloaded_pins directory (e.g., "pose-reference/image.jpg")
         base_dir: Base directory (backend directory)
+        size: "original" or a thumbnail tier ("small", "medium", "large")
 
     Returns:
-        Image file as bytes
+        (image file bytes, MIME type)
 
     Raises:
         FileNotFoundError: If image file doesn't exist
+        ValueError: If the size is unknown or the path leaves the image directory
     """
-    image_path = base_dir / "data" / "downloaded_pins" / relative_path
+    data_dir = base_dir / "data"
+    image_path = resolve_image_path(data_dir, relative_path, size)
+    if size != ORIGINAL and not image_path.exists():
+        image_path = resolve_image_path(data_dir, relative_path)
 
     if not image_path.exists():
         raise FileNotFoundError(f"Image file not found: {image_path}")
 
-    return image_path.read_bytes()
+    return image_path.read_bytes(), mime_type(image_path)
 
 
 def parse_image(image_data: str | bytes | np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
@@ -124,93 +119,6 @@ def parse_image(image_data: str | bytes | np.ndarray) -> Tuple[np.ndarray, Tuple
     return img_array, img_array.shape[:2]
 
 
-def load_clip_text_embeddings(json_path: Path) -> Dict[str, np.ndarray]:
-    """
-    Load CLIP text embeddings from JSON file and convert to numpy arrays.
-
-    Args:
-        json_path: Path to the clip_text_embeddings.json file
-
-    Returns:
-        Dictionary mapping text strings to numpy arrays of embeddings
-
-    Raises:
-        FileNotFoundError: If JSON file doesn't exist
-        ValueError: If JSON structure is invalid
-    """
-    if not json_path.exists():
-        raise FileNotFoundError(f"CLIP text embeddings file not found: {json_path}")
-
-    with open(json_path, "r") as f:
-        data = json.load(f)
-
-    # Convert nested list structure to numpy arrays
-    # Each word has format: "word": [[embedding_values...]]
-    embeddings_dict = {}
-    for word, embedding_list in data.items():
-        if isinstance(embedding_list, list) and len(embedding_list) > 0:
-            # Handle nested list structure: [[...]] -> [...]
-            if isinstance(embedding_list[0], list):
-                embeddings_dict[word] = np.array(embedding_list[0], dtype=np.float32)
-            else:
-                embeddings_dict[word] = np.array(embedding_list, dtype=np.float32)
-
-    return embeddings_dict
-
-
-def is_portrait_embedding(
-    image_embedding: np.ndarray,
-    text_embeddings: Dict[str, np.ndarray],
-    threshold: float = 0.0
-) -> bool:
-    """
-    Check if an image embedding is likely a portrait using CLIP text embeddings.
-    This uses pre-computed embeddings, so it's fast and doesn't require CLIP inference.
-
-    Args:
-        image_embedding: Pre-computed CLIP image embedding as numpy array
-        text_embeddings: Dictionary of text embeddings from load_clip_text_embeddings()
-        threshold: Threshold for classification (default: 0.25)
-
-    Returns:
-        True if image is classified as a portrait, False otherwise
-    """
-    # Portrait-related keywords
-    portrait_keywords = ["a portrait", "headshot", "face only", "close-up portrait"]
-    # Full-body keywords
-    full_body_keywords = ["full body", "full body pose", "person standing", "full figure"]
-
-    # Ensure embedding is numpy array
-    if not isinstance(image_embedding, np.ndarray):
-        image_embedding = np.array(image_embedding, dtype=np.float32)
-    else:
-        image_embedding = image_embedding.astype(np.float32)
-
-    # Compute similarities to portrait keywords
-    portrait_similarities = []
-    for keyword in portrait_keywords:
-        if keyword in text_embeddings:
-            similarity = cosine_similarity(image_embedding, text_embeddings[keyword])
-            portrait_similarities.append(similarity)
-
-    # Compute similarities to full-body keywords
-    full_body_similarities = []
-    for keyword in full_body_keywords:
-        if keyword in text_embeddings:
-            similarity = cosine_similarity(image_embedding, text_embeddings[keyword])
-            full_body_similarities.append(similarity)
-
-    # If no embeddings found, default to not a portrait
-    if not portrait_similarities or not full_body_similarities:
-        return False
-
-    # Classify as portrait if max portrait similarity > max full-body similarity + threshold
-    max_portrait_sim = max(portrait_similarities)
-    max_full_body_sim = max(full_body_similarities)
-
-    return max_portrait_sim > max_full_body_sim + threshold
-
-
 # --- 1. THE ORCHESTRATOR (CPU ONLY) ---
 # REMOVED: gpu="T4". This function just routes traffic, so keep it cheap (CPU).
 @app.function(image=image, keep_warm=1)
@@ -316,7 +224,11 @@ def text_to_clip_embedding(data: Dict[str, Any]) -> Dict[str, Any]:
 
     try:
         clip_model = Clip()
-        embedding = clip_model.encode_text.remote(texts=text, normalize=normalize)
+        if isinstance(text, list):
+            # Many texts (e.g. the portrait-keyword table): one RPC, micro-batched on the GPU
+            embedding = clip_model.encode_texts_batch.remote(texts=text, normalize=normalize)
+        else:
+            embedding = clip_model.encode_text.remote(texts=text, normalize=normalize)
 
         # Convert to list for JSON serialization
         if embedding.ndim == 1:
@@ -386,6 +298,71 @@ def image_to_clip_embedding(data: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
+# --- 4b. BATCHED POSE + CLIP IMAGE EMBEDDINGS (INGESTION) ---
+@app.function(image=image, keep_warm=1)
+@modal.web_endpoint(method="POST")
+def images_to_embeddings(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Public API Endpoint for batched corpus ingestion.
+
+    The decoded images go through SAM3DBodyInference.predict_2d_poses,
+    PoseEmbedding.extract_embeddings_batch and Clip.encode_images_batch, one
+    call each per request (see search.ingest).
+
+    Args:
+        data: Dictionary containing:
+            - "images": List of base64 encoded image strings
+            - "use_bbox_detector": Optional bool (default True)
+
+    Returns:
+        Dictionary with:
+            - "results": One {"success", "pose_embedding", "clip_embedding",
+              "error"} per image, in order
+            - "success": Boolean indicating the batch ran
+            - "error": Optional error message
+    """
+    images_data = data.get("images")
+    if not isinstance(images_data, list) or not images_data:
+        return {"success": False, "error": "No images provided", "results": []}
+
+    use_bbox_detector = data.get("use_bbox_detector", True)
+
+    results = [None] * len(images_data)
+    images, positions = [], []
+    for idx, image_data in enumerate(images_data):
+        try:
+            img_array, _ = parse_image(image_data)
+        except Exception as e:
+            results[idx] = {"success": False, "pose_embedding": None, "clip_embedding": None,
+                            "error": f"Image decode failed: {e}"}
+            continue
+        images.append(img_array)
+        positions.append(idx)
+
+    try:
+        embeddings = extract_image_embeddings(
+            images,
+            SAM3DBodyInference(),
+            PoseEmbedding(),
+            Clip(),
+            use_bbox_detector=use_bbox_detector,
+        )
+    except Exception as e:
+        return {"success": False, "error": f"Batch embedding failed: {e}", "results": []}
+
+    # JSON Serialization: Convert numpy arrays to lists
+    for idx, result in zip(positions, embeddings):
+        found = result["error"] is None
+        results[idx] = {
+            "success": found,
+            "pose_embedding": result["pose_embedding"].tolist() if found else None,
+            "clip_embedding": result["clip_embedding"].tolist() if found else None,
+            "error": result["error"],
+        }
+
+    return {"success": True, "results": results, "error": None}
+
+
 # --- 5. THE SEARCH LOGIC (Can be called via .remote) ---
 @app.function(image=image, volumes={"/root/data": volume}, container_idle_timeout=300, keep_warm=1)
 def run_search_pipeline(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -400,11 +377,21 @@ def run_search_pipeline(data: Dict[str, Any]) -> Dict[str, Any]:
             - "k": Number of top results to return (default: 10)
             - "lambda": Smoothing factor for hybrid score (default: 0.5, range: 0-1)
             - "filter_portraits": Boolean to filter out portrait images (default: False)
+            - "portrait_threshold": Margin above which an image counts as a portrait (default: 0.0)
+            - "exact": Boolean to force brute-force search even if an ANN index exists (default: False)
+            - "nprobe": ANN inverted lists scanned per modality; higher = better recall, slower
+            - "rerank": Compressed-score candidates reranked at full precision; higher = better recall, slower
+            - "image_size": Thumbnail tier inlined per result: "small", "medium", "large" or "original"
+              (default: "medium"; fetch originals separately with fetch_image)
+            - "lazy": Boolean to return no image bytes, only paths, scores and content hashes;
+              images are then loaded from serve_image (default: False)
 
     Returns:
         Dictionary with:
             - "success": Boolean indicating success
-            - "results": List of dicts with {"path": relative_path, "image": base64_string, "score": closeness_score}
+            - "results": List of dicts with {"path": relative_path, "image": base64_string,
+              "mime_type": image_mime_type, "score": closeness_score}, or with
+              {"path": relative_path, "hash": content_hash, "score": closeness_score} if lazy
             - "error": Optional error message
     """
     # Extract and validate inputs
@@ -413,6 +400,7 @@ def run_search_pipeline(data: Dict[str, Any]) -> Dict[str, Any]:
     k = data.get("k", 10)
     lambda_param = data.get("lambda", 0.5)
     filter_portraits = data.get("filter_portraits", False)
+    lazy = bool(data.get("lazy", False))
 
     if sketch_data is None:
         return {
@@ -431,75 +419,76 @@ def run_search_pipeline(data: Dict[str, Any]) -> Dict[str, Any]:
     # Clamp lambda to [0, 1]
     lambda_param = max(0.0, min(1.0, float(lambda_param)))
 
-    # Load text embeddings for portrait filtering if needed
-    text_embeddings = None
-    if filter_portraits:
-        try:
-            backend_dir = Path(__file__).parent
-            text_embeddings_path = backend_dir / "clip_text_embeddings.json"
-            text_embeddings = load_clip_text_embeddings(text_embeddings_path)
-            print(f"Loaded {len(text_embeddings)} text embeddings for portrait filtering")
-        except Exception as e:
-            print(f"Warning: Failed to load text embeddings for portrait filtering: {e}")
-            print("Continuing without portrait filtering...")
-            filter_portraits = False
+    portrait_threshold = float(data.get("portrait_threshold", 0.0))
+
+    image_size = data.get("image_size", DEFAULT_IMAGE_SIZE)
+    if image_size != ORIGINAL and image_size not in THUMBNAIL_SIZES:
+        return {
+            "success": False,
+            "error": f"Invalid image_size {image_size!r}, expected one of "
+                     f"{[*THUMBNAIL_SIZES, ORIGINAL]}",
+            "results": []
+        }
+
+    try:
+        nprobe = parse_optional_count(data, "nprobe")
+        rerank = parse_optional_count(data, "rerank")
+    except ValueError as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "results": []
+        }
+
+    query_cache = get_query_cache(
+        "query_embeddings",
+        max_entries=QUERY_CACHE_MAX_ENTRIES,
+        ttl=QUERY_CACHE_TTL_S,
+        persist_dir=QUERY_CACHE_DIR,
+    )
 
     try:
-        # Step 1: Extract query embeddings
+        # Step 1: Extract query embeddings. The CLIP text call is spawned alongside
+        # the pose chain (SAM 3D Body -> PoseC3D), and both are cached by decoded
+        # sketch / normalized text, so re-submitting while moving the lambda slider
+        # skips the GPU calls
         # Parse sketch image
         sketch_array, sketch_shape = parse_image(sketch_data)
 
-        # Get pose embedding (P_A)
         try:
-            pose_model = SAM3DBodyInference()
-            pose_dict = pose_model.predict_2d_pose.remote(
-                image=sketch_array,
-                use_bbox_detector=True,
+            P_A, C_A = extract_query_embeddings(
+                sketch_array,
+                sketch_shape,
+                text,
+                pose_model=SAM3DBodyInference(),
+                pose_embedder=PoseEmbedding(),
+                clip_model=Clip(),
+                cache=query_cache,
             )
-
-            if not pose_dict:
-                return {
-                    "success": False,
-                    "error": "No person detected in sketch image",
-                    "results": [],
-                }
-
-            pose_embedder = PoseEmbedding()
-            P_A = pose_embedder.extract_embedding.remote(
-                pose_dict=pose_dict,
-                img_shape=sketch_shape,
-            )
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"Failed to extract pose embedding: {str(e)}",
-                "results": [],
-            }
-
-        # Get CLIP text embedding (C_A)
-        try:
-            clip_model = Clip()
-            C_A = clip_model.encode_text.remote(texts=text, normalize=False)
-            # If multiple texts, take first
-            if len(C_A.shape) > 1:
-                C_A = C_A[0]
-        except Exception as e:
+        except QueryEmbeddingError as e:
             return {
                 "success": False,
-                "error": f"Failed to extract CLIP text embedding: {str(e)}",
+                "error": str(e),
                 "results": [],
             }
+        print(f"Query embedding cache: {query_cache.stats()}")
 
-        # Step 2: Load Pinterest embeddings
+        # Step 2: Get the warm Pinterest embedding index (built once per container,
+        # rebuilt only when the embeddings on the volume change)
         backend_dir = Path(__file__).parent
-        embeddings_json_path = backend_dir / "data" / "embeddings.json"
+        data_dir = backend_dir / "data"
 
         try:
-            embeddings_map = load_embeddings_json(embeddings_json_path)
-        except FileNotFoundError:
+            index = get_search_index(
+                data_dir,
+                check_interval=INDEX_CHECK_INTERVAL_S,
+                before_check=volume.reload,
+                text_embeddings_path=backend_dir / "clip_text_embeddings.json",
+            )
+        except FileNotFoundError as e:
             return {
                 "success": False,
-                "error": f"Embeddings file not found: {embeddings_json_path}",
+                "error": str(e),
                 "results": [],
             }
         except Exception as e:
@@ -509,7 +498,7 @@ def run_search_pipeline(data: Dict[str, Any]) -> Dict[str, Any]:
                 "results": [],
             }
 
-        if not embeddings_map:
+        if len(index) == 0:
             return {
                 "success": False,
                 "error": "Embeddings file is empty",
@@ -517,85 +506,69 @@ def run_search_pipeline(data: Dict[str, Any]) -> Dict[str, Any]:
             }
 
         # Step 3: Compute similarity scores and filter portraits if requested
-        scores = []
-        P_A_np = np.array(P_A, dtype=np.float32)
-        C_A_np = np.array(C_A, dtype=np.float32)
+        # (portrait margins are precomputed per image, only the threshold is per query)
+        mask = None
+        if filter_portraits:
+            mask = index.portrait_mask(portrait_threshold)
+            if mask is None:
+                print("Warning: No portrait margins in index, continuing without portrait filtering...")
 
         # Clamp k to reasonable range
-        k = max(1, min(int(k), len(embeddings_map)))
-        for relative_path, embeddings in embeddings_map.items():
-            try:
-                # Extract P_B and C_B
-                if "pose_embedding" not in embeddings or "clip_embedding" not in embeddings:
-                    continue
-
-                P_B = np.array(embeddings["pose_embedding"], dtype=np.float32)
-                C_B = np.array(embeddings["clip_embedding"], dtype=np.float32)
-
-                # Filter out portraits if requested (using pre-computed C_B embedding)
-                if filter_portraits and text_embeddings:
-                    if is_portrait_embedding(C_B, text_embeddings):
-                        print(f"Filtering out portrait: {relative_path}")
-                        continue
-
-                # Compute cosine similarities
-                pose_sim = cosine_similarity(P_A_np, P_B)
-                clip_sim = cosine_similarity(C_A_np, C_B)
-
-                # Compute closeness score
-                closeness_score = lambda_param * pose_sim + (
-                    1 - lambda_param) * clip_sim
-
-                scores.append((relative_path, closeness_score))
-            except Exception as e:
-                # Print detailed error information
-                import traceback
-                print(f"ERROR in score loop for {relative_path}:")
-                print(f"  Exception type: {type(e).__name__}")
-                print(f"  Exception message: {str(e)}")
-                print(
-                    f"  P_A_np shape: {P_A_np.shape if P_A_np is not None else 'None'}"
-                )
-                print(
-                    f"  C_A_np shape: {C_A_np.shape if C_A_np is not None else 'None'}"
-                )
-                if "pose_embedding" in embeddings:
-                    pose_emb = embeddings["pose_embedding"]
-                    print(
-                        f"  pose_embedding type: {type(pose_emb)}, length: {len(pose_emb) if hasattr(pose_emb, '__len__') else 'N/A'}"
-                    )
-                if "clip_embedding" in embeddings:
-                    clip_emb = embeddings["clip_embedding"]
-                    print(
-                        f"  clip_embedding type: {type(clip_emb)}, length: {len(clip_emb) if hasattr(clip_emb, '__len__') else 'N/A'}"
-                    )
-                print("  Full traceback:")
-                traceback.print_exc()
-                print("-" * 60)
-                # Skip this image if there's an error
-                continue
+        k = max(1, min(int(k), len(index)))
+        try:
+            # Step 4: Rank scores (argpartition top-k, no full sort)
+            top_indices, top_scores = index.search(
+                P_A, C_A, lambda_param, k, mask=mask,
+                exact=bool(data.get("exact", False)),
+                nprobe=nprobe,
+                rerank=rerank,
+            )
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": f"Failed to score embeddings: {str(e)}",
+                "results": [],
+            }
 
-        if not scores:
+        if len(top_indices) == 0:
             return {
                 "success": False,
                 "error": "No valid embeddings found in database",
                 "results": [],
             }
 
-        # Step 4: Rank scores
-        scores.sort(key=lambda x: x[1], reverse=True)
-        top_k = scores[:k]
+        top_k = [(index.paths[i], score) for i, score in zip(top_indices, top_scores)]
+
+        # Step 5 (lazy): Return IDs only, the client loads cached images from serve_image
+        if lazy:
+            results = []
+            for relative_path, score in top_k:
+                try:
+                    results.append({
+                        "path": relative_path,
+                        "hash": content_hash(resolve_image_path(data_dir, relative_path)),
+                        "score": float(score),
+                    })
+                except FileNotFoundError:
+                    # Skip if image file is missing
+                    continue
+            return {
+                "success": bool(results),
+                "results": results,
+                "error": None if results else "Failed to find any image files for top results",
+            }
 
-        # Step 5: Load and encode images
+        # Step 5: Load and encode images (pre-built thumbnail tier, original only on request)
         results = []
         for relative_path, score in top_k:
             try:
-                image_bytes = load_image_from_path(relative_path, backend_dir)
+                image_bytes, image_mime_type = load_image_from_path(relative_path, backend_dir, image_size)
                 image_base64 = base64.b64encode(image_bytes).decode("utf-8")
 
                 results.append({
                     "path": relative_path,
                     "image": image_base64,
+                    "mime_type": image_mime_type,
                     "score": float(score),
                 })
             except FileNotFoundError:
@@ -643,17 +616,104 @@ def search_similar_images(data: Dict[str, Any]) -> Dict[str, Any]:
             - "k": Number of top results to return (default: 10)
             - "lambda": Smoothing factor for hybrid score (default: 0.5, range: 0-1)
             - "filter_portraits": Boolean to filter out portrait images (default: False)
+            - "portrait_threshold": Margin above which an image counts as a portrait (default: 0.0)
+            - "exact": Boolean to force brute-force search even if an ANN index exists (default: False)
+            - "nprobe": ANN inverted lists scanned per modality; higher = better recall, slower
+            - "rerank": Compressed-score candidates reranked at full precision; higher = better recall, slower
+            - "image_size": Thumbnail tier inlined per result: "small", "medium", "large" or "original"
+              (default: "medium"; fetch originals separately with fetch_image)
+            - "lazy": Boolean to return no image bytes, only paths, scores and content hashes;
+              images are then loaded from serve_image (default: False)
 
     Returns:
         Dictionary with:
             - "success": Boolean indicating success
-            - "results": List of dicts with {"path": relative_path, "image": base64_string, "score": closeness_score}
+            - "results": List of dicts with {"path": relative_path, "image": base64_string,
+              "mime_type": image_mime_type, "score": closeness_score}, or with
+              {"path": relative_path, "hash": content_hash, "score": closeness_score} if lazy
             - "error": Optional error message
     """
     # Call the logic function locally (saves cold boot)
     return run_search_pipeline.local(data)
 
 
+@app.function(image=image, volumes={"/root/data": volume}, keep_warm=1)
+@modal.web_endpoint(method="POST")
+def fetch_image(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Public API Endpoint for fetching one image at full resolution (or a chosen tier),
+    e.g. when the user opens a search result.
+
+    Args:
+        data: Dictionary containing:
+            - "path": Relative path returned by search_similar_images
+            - "size": "original" (default) or a thumbnail tier ("small", "medium", "large")
+
+    Returns:
+        Dictionary with:
+            - "success": Boolean indicating success
+            - "image": Base64 encoded image string
+            - "mime_type": Image MIME type
+            - "error": Optional error message
+    """
+    relative_path = data.get("path")
+    if not relative_path or not isinstance(relative_path, str):
+        return {"success": False, "error": "No image path provided", "image": None, "mime_type": None}
+
+    try:
+        image_bytes, image_mime_type = load_image_from_path(
+            relative_path, Path(__file__).parent, data.get("size", ORIGINAL)
+        )
+    except (FileNotFoundError, ValueError) as e:
+        return {"success": False, "error": str(e), "image": None, "mime_type": None}
+
+    return {
+        "success": True,
+        "image": base64.b64encode(image_bytes).decode("utf-8"),
+        "mime_type": image_mime_type,
+        "error": None,
+    }
+
+
+@app.function(image=image, volumes={"/root/data": volume}, keep_warm=1)
+@modal.web_endpoint(method="GET")
+def serve_image(request: "Request", path: str, size: str = DEFAULT_IMAGE_SIZE, v: str = ""):
+    """
+    Public API Endpoint streaming raw image bytes for lazy search results.
+
+    Responses carry a strong ETag (content hash of the served file) and answer
+    If-None-Match with 304. When "v" matches the content hash of the original
+    (as returned by a lazy search), the URL is content-addressed and is cached
+    as immutable by browsers and CDNs, unless the requested thumbnail has not
+    been built yet and the original is served in its place.
+
+    Query parameters:
+        - "path": Relative path returned by search_similar_images
+        - "size": Thumbnail tier ("small", "medium", "large") or "original" (default: "medium")
+        - "v": Content hash of the original image returned by the lazy search
+
+    Returns:
+        Image bytes (200), Not Modified (304), or an error status (400/404)
+    """
+    data_dir = Path(__file__).parent / "data"
+    try:
+        image_path, immutable = resolve_served_image(data_dir, path, size, v)
+    except ValueError as e:
+        return Response(content=str(e), status_code=400)
+    except FileNotFoundError as e:
+        return Response(content=str(e), status_code=404)
+
+    headers = {
+        "ETag": f'"{content_hash(image_path)}"',
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        "Access-Control-Allow-Origin": "*",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(image_path, media_type=mime_type(image_path), headers=headers)
+
+
 # --- 6. INTERNAL TEST SUITE ---
 @app.local_entrypoint()
 def main():
@@ -41,4 +41,6 @@ image = (
                            backend_dir / "pinterest",
                            remote_path="/root/pinterest").add_local_dir(
                                backend_dir / "pose_embed",
-                               remote_path="/root/pose_embed"))
+                               remote_path="/root/pose_embed").add_local_dir(
+                                   backend_dir / "search",
+                                   remote_path="/root/search"))
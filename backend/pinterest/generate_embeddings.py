@@ -1,14 +1,55 @@
 """
 Modal client script to generate pose and CLIP embeddings for all images in data/downloaded_pins/.
 This script runs locally and calls the Modal API endpoints to process images.
+Results are written to the binary embedding store in data/embedding_store/.
+
+Images are downscaled and sent in batches to the images_to_embeddings endpoint,
+which runs the pose estimator, pose embedder and CLIP once per batch. A pool of
+worker threads keeps several batches in flight over one pooled HTTP session,
+retrying with backoff on transient errors. Every result is appended to a
+checkpoint file, so an interrupted run loses at most the in-flight batches and
+a rerun only processes images that are not embedded yet (neither in the
+checkpoint nor in the existing store).
+
+Usage (from the backend directory):
+    python pinterest/generate_embeddings.py
+    python pinterest/generate_embeddings.py --workers 8 --batch-size 16 --max-side 768
 """
+import argparse
 import base64
 import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import closing
+from io import BytesIO
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import modal
+import numpy as np
 import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Make the backend packages importable when run as `python pinterest/generate_embeddings.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from search.portrait import load_clip_text_embeddings  # noqa: E402
+from search.store import (  # noqa: E402
+    MANIFEST_NAME,
+    POSE_PIPELINE,
+    EmbeddingStore,
+    load_embedding_store,
+)
+from search.thumbnails import build_thumbnails  # noqa: E402
+
+# Result statuses recorded in the checkpoint; "ok" and "no_person" are final,
+# "failed" images are retried on the next run
+STATUS_OK = "ok"
+STATUS_NO_PERSON = "no_person"
+STATUS_FAILED = "failed"
 
 
 def find_image_files(data_dir: Path) -> List[Path]:
@@ -47,87 +88,288 @@ def get_relative_path(file_path: Path, base_dir: Path) -> str:
     return str(file_path.relative_to(base_dir))
 
 
-def process_image_embeddings(
-    image_path: Path,
-    pose_endpoint_url: str,
-    clip_endpoint_url: str,
-    use_bbox_detector: bool = True,
-) -> Optional[Dict[str, List[float]]]:
+def make_session(pool_size: int, retries: int = 4, backoff: float = 1.0) -> requests.Session:
+    """
+    HTTP session with a connection pool sized for the worker threads and
+    retries with exponential backoff on connection errors and 429/5xx responses.
+
+    Args:
+        pool_size: Connections kept open per endpoint (one per worker thread)
+        retries: Retries per request
+        backoff: Backoff factor; waits are backoff * 2^(retry - 1) seconds
     """
-    Process a single image through both pose and CLIP Modal API endpoints.
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def encode_image_for_upload(image_path: Path, max_side: int = 1024) -> str:
+    """
+    Read an image and return it base64 encoded, downscaled so its longest side
+    is at most max_side (CLIP resizes to 224 anyway, and the pose model works on
+    a person crop). Small images are sent unchanged; max_side=0 disables resizing.
 
     Args:
         image_path: Path to the image file
-        pose_endpoint_url: URL of the pose embedding endpoint
-        clip_endpoint_url: URL of the CLIP image embedding endpoint
+        max_side: Longest side in pixels of the uploaded image
+
+    Returns:
+        Base64 encoded image bytes
+    """
+    image_bytes = image_path.read_bytes()
+    if max_side:
+        with Image.open(BytesIO(image_bytes)) as img:
+            if max(img.size) > max_side:
+                img.draft("RGB", (max_side, max_side))
+                img = img.convert("RGB")
+                img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+                buffer = BytesIO()
+                img.save(buffer, "JPEG", quality=92)
+                image_bytes = buffer.getvalue()
+    return base64.b64encode(image_bytes).decode("utf-8")
+
+
+def post_embedding(
+    session: requests.Session,
+    endpoint_url: str,
+    payload: Dict[str, Any],
+    timeout: float = 300,
+) -> Dict[str, Any]:
+    """POST to an embedding endpoint (transient errors are retried by the session)."""
+    response = session.post(endpoint_url, json=payload, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def process_batch_embeddings(
+    image_paths: List[Path],
+    endpoint_url: str,
+    session: requests.Session,
+    max_side: int = 1024,
+    use_bbox_detector: bool = True,
+) -> List[Tuple[str, Optional[Dict[str, List[float]]], Optional[str]]]:
+    """
+    Process a batch of images through the batched pose + CLIP Modal API endpoint.
+
+    One request carries the whole batch, so the pose estimator, pose embedder
+    and CLIP run one batched forward pass per batch instead of one per image.
+
+    Args:
+        image_paths: Paths to the image files
+        endpoint_url: URL of the batched embedding endpoint (images_to_embeddings)
+        session: Shared HTTP session (see make_session)
+        max_side: Longest side of the uploaded images (0 = original)
         use_bbox_detector: Whether to use bounding box detector for pose
 
     Returns:
-        Dictionary with 'pose_embedding' and 'clip_embedding' keys, or None if failed
+        One (status, {"pose_embedding": [...], "clip_embedding": [...]} or None,
+        error message or None) per image, in order
     """
+    outcomes: List[Optional[Tuple[str, Optional[Dict[str, List[float]]], Optional[str]]]] = []
+    images, positions = [], []
+    for image_path in image_paths:
+        try:
+            images.append(encode_image_for_upload(image_path, max_side))
+        except Exception as e:
+            outcomes.append((STATUS_FAILED, None, f"Error reading {image_path.name}: {str(e)}"))
+            continue
+        positions.append(len(outcomes))
+        outcomes.append(None)
+
+    if not images:
+        return outcomes
+
     try:
-        # Read image file as bytes
-        image_bytes = image_path.read_bytes()
+        response = post_embedding(session, endpoint_url, {
+            "images": images,
+            "use_bbox_detector": use_bbox_detector,
+        })
+    except (requests.exceptions.RequestException, ValueError) as e:
+        response = {"success": False, "error": f"HTTP error: {str(e)}"}
+
+    results = response.get("results") or []
+    if not response.get("success") or len(results) != len(images):
+        error = f"Batch embedding failed: {response.get('error') or 'Unknown error'}"
+        for position in positions:
+            outcomes[position] = (STATUS_FAILED, None, error)
+        return outcomes
+
+    for position, result in zip(positions, results):
+        if result.get("success") and result.get("pose_embedding") and result.get("clip_embedding"):
+            outcomes[position] = (STATUS_OK, {
+                "pose_embedding": result["pose_embedding"],
+                "clip_embedding": result["clip_embedding"],
+            }, None)
+        else:
+            error = result.get("error") or "Unknown error"
+            status = STATUS_NO_PERSON if "No person detected" in error else STATUS_FAILED
+            outcomes[position] = (status, None, f"Embedding failed: {error}")
+    return outcomes
+
+
+class Checkpoint:
+    """
+    Append-only JSONL log of per-image results.
 
-        # Encode as base64 string
-        image_base64 = base64.b64encode(image_bytes).decode("utf-8")
+    Each line is {"path", "status"[, "pose_embedding", "clip_embedding"]}. Lines
+    are flushed as they are written and fsynced every `sync_every` results; a
+    torn last line from a crash is ignored on load.
+    """
 
-        results = {}
+    def __init__(self, path: Path, sync_every: int = 50):
+        self.path = path
+        self.sync_every = sync_every
+        self._unsynced = 0
+        self._file = None
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Latest record per relative path."""
+        records: Dict[str, Dict[str, Any]] = {}
+        if not self.path.exists():
+            return records
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["path"]] = record
+        return records
+
+    def append(self, record: Dict[str, Any]) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            torn = False
+            if self.path.exists() and self.path.stat().st_size > 0:
+                with open(self.path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    torn = f.read(1) != b"\n"
+            self._file = open(self.path, "a", encoding="utf-8")
+            # Terminate a torn last line so it doesn't swallow the next record
+            if torn:
+                self._file.write("\n")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+def load_existing_embeddings(output_dir: Path) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Embeddings already in the store, so reruns only process new images.
 
-        # Get pose embedding
-        pose_payload = {
-            "image": image_base64,
-            "use_bbox_detector": use_bbox_detector,
-        }
-        try:
-            pose_response = requests.post(
-                pose_endpoint_url, json=pose_payload, timeout=300)
-            pose_response.raise_for_status()
-            pose_result = pose_response.json()
-
-            if pose_result.get("success") and pose_result.get("embedding"):
-                results["pose_embedding"] = pose_result["embedding"]
-            else:
-                print(
-                    f"  Pose embedding failed: {pose_result.get('error', 'Unknown error')}")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"  HTTP error getting pose embedding: {str(e)}")
-            return None
+    Rows are views into the memory-mapped store matrices (no per-float Python
+    objects); they are only copied when the new store is assembled.
 
-        # Get CLIP embedding
-        clip_payload = {
-            "image": image_base64,
-            "normalize": False,
-        }
-        try:
-            clip_response = requests.post(
-                clip_endpoint_url, json=clip_payload, timeout=300)
-            clip_response.raise_for_status()
-            clip_result = clip_response.json()
-
-            if clip_result.get("success") and clip_result.get("embedding"):
-                results["clip_embedding"] = clip_result["embedding"]
-            else:
-                print(
-                    f"  CLIP embedding failed: {clip_result.get('error', 'Unknown error')}")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"  HTTP error getting CLIP embedding: {str(e)}")
+    A store built by another pose pipeline (see POSE_PIPELINE) is not reused:
+    its pose embeddings don't match the query's, so every image is re-embedded.
+    """
+    if not (output_dir / MANIFEST_NAME).exists():
+        return {}
+    store = load_embedding_store(output_dir)
+    pose_pipeline = store.metadata.get("pose_pipeline")
+    if pose_pipeline != POSE_PIPELINE:
+        print(f"Existing store was built with pose pipeline {pose_pipeline or 'unknown'}, "
+              f"re-embedding all images with {POSE_PIPELINE}")
+        return {}
+    return {
+        relative_path: {"pose_embedding": store.pose[i], "clip_embedding": store.clip[i]}
+        for i, relative_path in enumerate(store.paths)
+    }
+
+
+def bounded_as_completed(
+    executor: ThreadPoolExecutor,
+    fn: Callable[..., Any],
+    items: Iterable[Tuple[Any, ...]],
+    max_in_flight: int,
+) -> Iterator[Tuple[Tuple[Any, ...], Future]]:
+    """
+    Submit fn(*item) for each item, keeping at most max_in_flight submitted,
+    and yield (item, future) as they finish.
+
+    Futures not started yet are cancelled when the caller stops early (an
+    exception or Ctrl-C), so shutting the executor down only waits for the
+    in-flight calls instead of the whole remaining queue.
+    """
+    items = iter(items)
+    pending: Dict[Future, Tuple[Any, ...]] = {}
+    try:
+        while True:
+            while len(pending) < max_in_flight:
+                item = next(items, None)
+                if item is None:
+                    break
+                pending[executor.submit(fn, *item)] = item
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def connect_endpoint() -> Optional[str]:
+    """Resolve the deployed batched pose + CLIP embedding endpoint URL."""
+    print("Connecting to Modal functions...")
+    try:
+        function = modal.Function.from_name("backend", "images_to_embeddings")
+        endpoint_url = function.get_web_url()
+
+        if endpoint_url is None:
+            print("Error: Could not get the endpoint URL from the Modal function.")
+            print("Make sure the Modal app is deployed: modal deploy backend/modal_api.py")
             return None
 
-        return results
+        print(f"Embedding endpoint: {endpoint_url}")
+        return endpoint_url
     except Exception as e:
-        print(f"  Error processing {image_path.name}: {str(e)}")
+        print(f"Error connecting to Modal functions: {str(e)}")
+        print("Make sure the Modal app is deployed: modal deploy backend/modal_api.py")
         return None
 
 
 def main():
     """Main function to process all images and generate pose and CLIP embeddings."""
-    # Get paths
     backend_dir = Path(__file__).parent.parent
+    parser = argparse.ArgumentParser(description="Generate pose + CLIP embeddings for downloaded pins")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent batches in flight")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per endpoint request")
+    parser.add_argument("--max-side", type=int, default=1024,
+                        help="Downscale uploads to this longest side (0 = send originals)")
+    parser.add_argument("--retries", type=int, default=4, help="HTTP retries per request")
+    parser.add_argument("--checkpoint", type=Path,
+                        default=backend_dir / "data" / "embedding_checkpoint.jsonl")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-embed every image, ignoring the checkpoint and existing store")
+    args = parser.parse_args()
+
+    # Get paths
     data_dir = backend_dir / "data" / "downloaded_pins"
-    output_file = backend_dir / "data" / "embeddings.json"
+    output_dir = backend_dir / "data" / "embedding_store"
 
     if not data_dir.exists():
         print(f"Error: Data directory not found: {data_dir}")
@@ -142,87 +384,124 @@ def main():
         print("No image files found. Exiting.")
         return
 
-    # Get Modal function references and endpoint URLs
-    print("Connecting to Modal functions...")
-    try:
-        pose_function = modal.Function.from_name("backend", "image_to_pose_embedding")
-        clip_function = modal.Function.from_name("backend", "image_to_clip_embedding")
-
-        pose_endpoint_url = pose_function.get_web_url()
-        clip_endpoint_url = clip_function.get_web_url()
-
-        if pose_endpoint_url is None or clip_endpoint_url is None:
-            print("Error: Could not get endpoint URLs from Modal functions.")
-            print("Make sure the Modal app is deployed: modal deploy backend/modal_api.py")
+    # Resume: embeddings from the existing store, then the checkpoint (newer)
+    # Structure: {relative_path: {"pose_embedding": array, "clip_embedding": array}}
+    checkpoint = Checkpoint(args.checkpoint)
+    if args.force:
+        args.checkpoint.unlink(missing_ok=True)
+        embeddings_map: Dict[str, Dict[str, np.ndarray]] = {}
+        no_person_paths = set()
+    else:
+        embeddings_map = load_existing_embeddings(output_dir)
+        no_person_paths = set()
+        for relative_path, record in checkpoint.load().items():
+            # Records from another pose pipeline are re-embedded
+            if record.get("pose_pipeline") != POSE_PIPELINE:
+                continue
+            if record["status"] == STATUS_OK:
+                embeddings_map[relative_path] = {
+                    "pose_embedding": np.asarray(record["pose_embedding"], dtype=np.float32),
+                    "clip_embedding": np.asarray(record["clip_embedding"], dtype=np.float32),
+                }
+            elif record["status"] == STATUS_NO_PERSON:
+                no_person_paths.add(relative_path)
+
+    relative_paths = [get_relative_path(image_path, data_dir) for image_path in image_files]
+    todo = [
+        (image_path, relative_path)
+        for image_path, relative_path in zip(image_files, relative_paths)
+        if relative_path not in embeddings_map and relative_path not in no_person_paths
+    ]
+    print(f"Already embedded: {len(image_files) - len(todo)}, to process: {len(todo)}")
+
+    successful = failed = 0
+    if todo:
+        endpoint_url = connect_endpoint()
+        if endpoint_url is None:
             return
 
-        print(f"Pose endpoint: {pose_endpoint_url}")
-        print(f"CLIP endpoint: {clip_endpoint_url}")
-    except Exception as e:
-        print(f"Error connecting to Modal functions: {str(e)}")
-        print("Make sure the Modal app is deployed: modal deploy backend/modal_api.py")
-        return
-
-    # Process images and build mapping
-    # Structure: {relative_path: {"pose_embedding": [...], "clip_embedding": [...]}}
-    embeddings_map: Dict[str, Dict[str, List[float]]] = {}
-    successful = 0
-    failed = 0
-    no_person = 0
-
-    print(f"\nProcessing {len(image_files)} images...")
-    for i, image_path in enumerate(image_files, 1):
-        # Get relative path from downloaded_pins directory (includes board subdirectory)
-        relative_path = get_relative_path(image_path, data_dir)
-        print(f"[{i}/{len(image_files)}] Processing: {relative_path}")
-
-        result = process_image_embeddings(
-            image_path, pose_endpoint_url, clip_endpoint_url
-        )
-
-        if result is None:
-            failed += 1
-            continue
-
-        # Check if we got both embeddings
-        if "pose_embedding" not in result or "clip_embedding" not in result:
-            failed += 1
-            print("  Failed: Missing one or both embeddings")
-            continue
-
-        # Store both embeddings with relative path as key
-        embeddings_map[relative_path] = {
-            "pose_embedding": result["pose_embedding"],
-            "clip_embedding": result["clip_embedding"],
-        }
-        successful += 1
-        print(
-            f"  Success! Pose: {len(result['pose_embedding'])} dims, "
-            f"CLIP: {len(result['clip_embedding'])} dims"
-        )
-
-    # Save results to JSON
-    print(f"\nSaving results to {output_file}...")
-    output_data = {
-        "embeddings": embeddings_map,
-        "metadata": {
-            "total_images": len(image_files),
-            "successful": successful,
-            "failed": failed,
-            "no_person_detected": no_person,
-        },
+        batch_size = max(1, args.batch_size)
+        batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+        session = make_session(pool_size=args.workers, retries=args.retries)
+        print(f"\nProcessing {len(todo)} images in {len(batches)} batches of {batch_size} "
+              f"with {args.workers} workers...")
+        start_time = time.perf_counter()
+        try:
+            # A bounded queue: on Ctrl-C or an error only the in-flight batches
+            # are waited for, and every finished result is already checkpointed
+            calls = (
+                ([image_path for image_path, _ in batch], endpoint_url, session, args.max_side)
+                for batch in batches
+            )
+            relative_path_of = {image_path: relative_path for image_path, relative_path in todo}
+            i = 0
+            with ThreadPoolExecutor(max_workers=args.workers) as executor, closing(
+                bounded_as_completed(executor, process_batch_embeddings, calls,
+                                     max_in_flight=2 * args.workers)
+            ) as completed:
+                for call, future in completed:
+                    for image_path, (status, result, error) in zip(call[0], future.result()):
+                        i += 1
+                        relative_path = relative_path_of[image_path]
+                        record = {"path": relative_path, "status": status,
+                                  "pose_pipeline": POSE_PIPELINE}
+
+                        if status == STATUS_OK:
+                            embeddings_map[relative_path] = {
+                                key: np.asarray(value, dtype=np.float32)
+                                for key, value in result.items()
+                            }
+                            record.update(result)
+                            successful += 1
+                        elif status == STATUS_NO_PERSON:
+                            no_person_paths.add(relative_path)
+                        else:
+                            failed += 1
+                        checkpoint.append(record)
+
+                        rate = i / (time.perf_counter() - start_time)
+                        line = f"[{i}/{len(todo)}] {rate:.2f} img/s  {status:<9} {relative_path}"
+                        print(f"{line}  ({error})" if error else line)
+        finally:
+            checkpoint.close()
+            session.close()
+
+    # Save results to the embedding store, in image order and without images
+    # that were deleted since they were embedded
+    embeddings_map = {
+        relative_path: embeddings_map[relative_path]
+        for relative_path in relative_paths if relative_path in embeddings_map
     }
-
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_file, "w") as f:
-        json.dump(output_data, f, indent=2)
+    print(f"\nSaving results to {output_dir}...")
+    metadata = {
+        "total_images": len(image_files),
+        "successful": len(embeddings_map),
+        "failed": failed,
+        "no_person_detected": len(no_person_paths & set(relative_paths)),
+        "pose_pipeline": POSE_PIPELINE,
+    }
+    store = EmbeddingStore.from_embeddings_map(embeddings_map, metadata=metadata)
+
+    # Classify portraits once here so searches only apply a threshold
+    text_embeddings_path = backend_dir / "clip_text_embeddings.json"
+    if text_embeddings_path.exists():
+        store.compute_portrait_margins(load_clip_text_embeddings(text_embeddings_path))
+    else:
+        print(f"Warning: {text_embeddings_path} not found, skipping portrait margins")
+    store.save(output_dir)
+
+    # Pre-build the thumbnail tiers served in search results (incremental)
+    print("\nBuilding thumbnails...")
+    thumbnail_counts = build_thumbnails(data_dir.parent)
+    print(f"  Built: {thumbnail_counts['built']}, up to date: {thumbnail_counts['skipped']}, "
+          f"failed: {thumbnail_counts['failed']}")
 
     print("\nDone!")
     print(f"  Total images: {len(image_files)}")
-    print(f"  Successful: {successful}")
+    print(f"  Embedded: {len(embeddings_map)} ({successful} this run)")
     print(f"  Failed: {failed}")
-    print(f"  No person detected: {no_person}")
-    print(f"  Results saved to: {output_file}")
+    print(f"  No person detected: {len(no_person_paths)}")
+    print(f"  Results saved to: {output_dir}")
 
 
 if __name__ == "__main__":
@@ -1,8 +1,9 @@
 """
 Modal wrapper for SAM 3D Body 2D pose inference.
 """
+import os
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from modal_app import image, app, volume
 import modal
@@ -10,12 +11,34 @@ import numpy as np
 
 # Container-only imports - use Image.imports() context manager
 with image.imports():
-    from sam_3d_body import SAM3DBodyEstimator, load_sam_3d_body
+    import torch
+    from sam_3d_body import SAM3DBodyEstimator, configure_cpu_threads, load_sam_3d_body
     from sam_3d_body.metadata.mhr70 import mhr_names
     from tools.build_detector import HumanDetector
-
-
-def _load(is_volume: bool):
+    from tools.build_fov_estimator import FOVEstimator
+    from tools.build_sam import HumanSegmentor
+    from tools.lazy_submodel import LazySubmodel
+    from tools.micro_batcher import MicroBatcher
+
+# Optional submodels attached to the estimator. They are loaded lazily on first
+# use; the others are declared (see _submodels) but left out, so the estimator
+# falls back to the full image / no masks / the default FOV.
+ENABLED_SUBMODELS = ("detector",)
+# Enabled submodels to load in the background at container start
+PREFETCH_SUBMODELS = ()
+
+# Concurrent predict_2d_pose calls are micro-batched: calls arriving within
+# BATCH_WINDOW_MS of the oldest queued one (up to BATCH_MAX_IMAGES) run as one
+# process_images batch. Overridable with SAM3D_BATCH_WINDOW_MS and
+# SAM3D_BATCH_MAX_IMAGES (a window of 0 only batches calls that queued up
+# while the model was busy).
+BATCH_WINDOW_MS = 10.0
+BATCH_MAX_IMAGES = 16
+# Inputs served concurrently by one container, i.e. the calls that can be batched
+MAX_CONCURRENT_INPUTS = 32
+
+
+def _load(is_volume: bool, device: str = "cuda", attn_backend: Optional[str] = None):
     # Should be backend/ locally and /root on modal
     parent = Path(__file__).resolve().parent.parent
     if is_volume:
@@ -24,10 +47,42 @@ def _load(is_volume: bool):
                           'model.ckpt')
     MHR_PATH = str(parent / 'checkpoints' / 'sam-3d-body-dinov3' / 'assets' /
                    'mhr_model.pt')
-    return load_sam_3d_body(checkpoint_path=CHECKPOINT_PATH, mhr_path=MHR_PATH)
+    return load_sam_3d_body(checkpoint_path=CHECKPOINT_PATH, mhr_path=MHR_PATH,
+                            device=device, attn_backend=attn_backend)
+
+
+def _submodels(device: str) -> Dict[str, "LazySubmodel"]:
+    """Optional submodels of the estimator, built on first use."""
+    return {
+        "detector": LazySubmodel(
+            "detector", lambda: HumanDetector(name="vitdet", device=device)),
+        "segmentor": LazySubmodel(
+            "segmentor", lambda: HumanSegmentor(
+                name="sam2", device=device,
+                path=os.environ.get("SAM3D_SEGMENTOR_PATH", ""))),
+        "fov_estimator": LazySubmodel(
+            "fov_estimator", lambda: FOVEstimator(
+                name="moge2", device=device,
+                path=os.environ.get("SAM3D_FOV_PATH", ""))),
+    }
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def _rgb_image(image) -> np.ndarray:
+    """Validate an RGB (H, W, 3) image and return a copy as numpy array."""
+    img = np.asarray(image).copy()
+    if len(img.shape) != 3 or img.shape[2] != 3:
+        raise ValueError(
+            f"Expected RGB image with shape (H, W, 3), got {img.shape}")
+    return img
 
 
 @app.cls(gpu="A10G", image=image, volumes={"/root/data": volume}, container_idle_timeout=300, keep_warm=1)
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
 class SAM3DBodyInference:
     """Modal model class for SAM 3D Body 2D pose inference."""
 
@@ -35,22 +90,55 @@ class SAM3DBodyInference:
     def setup(self):
         """Initialize the SAM 3D Body model."""
 
-        print("Loading SAM 3D Body model...")
+        # SAM3D_DEVICE overrides the device, e.g. SAM3D_DEVICE=cpu on CPU nodes;
+        # SAM3D_NUM_THREADS / SAM3D_NUM_INTEROP_THREADS size the CPU thread pools;
+        # SAM3D_ATTN_BACKEND selects the attention kernel ("sdpa" or "math");
+        # SAM3D_MAX_BATCH_SIZE caps the person crops per batched forward pass
+        # (default: sized from the free GPU memory)
+        self.device = os.environ.get("SAM3D_DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
+        configure_cpu_threads(_env_int("SAM3D_NUM_THREADS"), _env_int("SAM3D_NUM_INTEROP_THREADS"))
+
+        print(f"Loading SAM 3D Body model on {self.device}...")
         # Load model from HuggingFace
         # Default to dinov3 model, can be made configurable
         # TODO: Change to false if testing locally
-        self.model, self.model_cfg = _load(is_volume=True)
+        self.model, self.model_cfg = _load(is_volume=True, device=self.device,
+                                           attn_backend=os.environ.get("SAM3D_ATTN_BACKEND"))
 
         # Store joint names for keypoint mapping
         self.joint_names = mhr_names
 
-        # Initialize bounding box detector
-        print("Loading bounding box detector...")
-        self.human_detector = HumanDetector(name="vitdet", device="cuda")
-        print("Bounding box detector loaded!")
+        # Optional submodels load on first use (or in the background if prefetched)
+        self.submodels = _submodels(self.device)
+        enabled = {name: self.submodels[name] for name in ENABLED_SUBMODELS}
+        for name in PREFETCH_SUBMODELS:
+            enabled[name].prefetch()
+
+        # Built once and shared by all requests: it keeps no per-request state
+        self.estimator = SAM3DBodyEstimator(
+            sam_3d_body_model=self.model,
+            model_cfg=self.model_cfg,
+            human_detector=enabled.get("detector"),
+            human_segmentor=enabled.get("segmentor"),
+            fov_estimator=enabled.get("fov_estimator"),
+            max_batch_size=_env_int("SAM3D_MAX_BATCH_SIZE"),
+        )
+
+        # Request queue coalescing concurrent predict_2d_pose calls
+        window_ms = float(os.environ.get("SAM3D_BATCH_WINDOW_MS") or BATCH_WINDOW_MS)
+        self.batcher = MicroBatcher(
+            self._predict_keypoints_batch,
+            max_batch_size=_env_int("SAM3D_BATCH_MAX_IMAGES") or BATCH_MAX_IMAGES,
+            max_wait=window_ms / 1000,
+            name="sam3d-batcher",
+        )
 
         print("SAM 3D Body model loaded successfully!")
 
+    @modal.exit()
+    def teardown(self):
+        self.batcher.close()
+
     @modal.method()
     def predict_2d_pose(
         self,
@@ -70,34 +158,67 @@ class SAM3DBodyInference:
             Returns empty dict if no person is detected.
         """
         use_bbox_detector = False
-        # Validate and convert image to numpy array
-        img = np.asarray(image).copy()
-        # Validate image shape
-        if len(img.shape) != 3 or img.shape[2] != 3:
-            raise ValueError(
-                f"Expected RGB image with shape (H, W, 3), got {img.shape}")
-
-        # Create estimator
-        estimator = SAM3DBodyEstimator(
-            sam_3d_body_model=self.model,
-            model_cfg=self.model_cfg,
-            human_detector=self.human_detector if use_bbox_detector else None,
-            human_segmentor=None,
-            fov_estimator=None,
-        )
+        img = _rgb_image(image)
+
+        # Queued and run together with concurrent calls (body decoder only,
+        # only the 2D keypoints come back). Unlike "full" mode there is no
+        # second body pass prompted with the hand decoder's wrists and the
+        # elbows, so elbow and wrist keypoints differ: the corpus must be
+        # embedded through this same method (search.store.POSE_PIPELINE).
+        keypoints = self.batcher((img, use_bbox_detector))
+
+        return self._pose_dict(keypoints)
 
-        # Process image
-        outputs = estimator.process_one_image(img)
+    @modal.method()
+    def predict_2d_poses(
+        self,
+        images: List[np.ndarray],
+        use_bbox_detector: bool = True,
+    ) -> List[Dict[str, Tuple[float, float]]]:
+        """
+        Batched predict_2d_pose for ingestion: the person crops of all images
+        run through the model together (see SAM3DBodyEstimator.process_images).
+
+        Args:
+            images: Input images as numpy arrays in RGB format (H, W, 3)
+            use_bbox_detector: As in predict_2d_pose
 
+        Returns:
+            One pose dict per image, as predict_2d_pose returns it.
+        """
+        use_bbox_detector = False
+        imgs = [_rgb_image(image) for image in images]
+        keypoints = self.estimator.process_images(
+            imgs, inference_type="keypoints_2d", use_detector=use_bbox_detector)
+        return [self._pose_dict(image_keypoints) for image_keypoints in keypoints]
+
+    @modal.method()
+    def batching_stats(self) -> Dict:
+        """Batch-size and queue-depth histograms of the predict_2d_pose queue."""
+        return self.batcher.stats()
+
+    def _predict_keypoints_batch(self, requests: List[Tuple[np.ndarray, bool]]) -> List[np.ndarray]:
+        """Keypoints of queued (image, use_detector) requests, batched per setting."""
+        keypoints = [None] * len(requests)
+        for use_detector in {flag for _, flag in requests}:
+            indices = [idx for idx, (_, flag) in enumerate(requests) if flag == use_detector]
+            results = self.estimator.process_images(
+                [requests[idx][0] for idx in indices],
+                inference_type="keypoints_2d",
+                use_detector=use_detector,
+            )
+            for idx, result in zip(indices, results):
+                keypoints[idx] = result
+        return keypoints
+
+    def _pose_dict(self, keypoints: np.ndarray) -> Dict[str, Tuple[float, float]]:
+        """Joint name -> (x, y) of the first person (empty dict if none)."""
         # Handle no person detected
-        if not outputs or len(outputs) == 0:
+        if len(keypoints) == 0:
             return {}
 
-        # Get first person's output
-        person_output = outputs[0]
-
-        # Extract 2D keypoints
-        keypoints_2d = person_output["pred_keypoints_2d"]  # Shape: [70, 2]
+        # Get first person's 2D keypoints
+        keypoints_2d = keypoints[0]  # Shape: [70, 2]
 
         # Map keypoints to joint names
         pose_dict = {}
@@ -107,3 +228,8 @@ class SAM3DBodyInference:
                 pose_dict[joint_name] = (x, y)
 
         return pose_dict
+
+    @modal.method()
+    def submodel_load_times(self) -> Dict[str, Optional[float]]:
+        """Load time in seconds of each optional submodel (None if not loaded)."""
+        return {name: submodel.load_time for name, submodel in self.submodels.items()}
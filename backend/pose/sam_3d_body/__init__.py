@@ -2,10 +2,11 @@
 __version__ = "1.0.0"
 
 from .sam_3d_body_estimator import SAM3DBodyEstimator
-from .build_models import load_sam_3d_body, load_sam_3d_body_hf
+from .build_models import configure_cpu_threads, load_sam_3d_body, load_sam_3d_body_hf
 
 __all__ = [
     "__version__",
+    "configure_cpu_threads",
     "load_sam_3d_body",
     "load_sam_3d_body_hf",
     "SAM3DBodyEstimator",
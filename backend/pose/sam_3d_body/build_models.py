@@ -1,15 +1,26 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates.
 import os
 from pathlib import Path
+from typing import Optional
+
 import torch
 
 from .models.meta_arch import SAM3DBody
+from .models.modules.transformer import set_attention_backend
 from .utils.config import get_config
 from .utils.checkpoint import load_state_dict
 
 
-def load_sam_3d_body(checkpoint_path: str = "", device: str = "cuda", mhr_path: str = ""):
+def load_sam_3d_body(
+    checkpoint_path: str = "",
+    device: str = "cuda",
+    mhr_path: str = "",
+    attn_backend: Optional[str] = None,
+):
     print("Loading SAM 3D Body model...")
+    if attn_backend is not None:
+        # "sdpa" (default) or "math", see models.modules.transformer
+        set_attention_backend(attn_backend)
 
     # Check the current directory, and if not present check the parent dir.
     model_cfg = os.path.join(os.path.dirname(checkpoint_path), "model_config.yaml")
@@ -24,6 +35,9 @@ def load_sam_3d_body(checkpoint_path: str = "", device: str = "cuda", mhr_path:
     # Disable face for inference
     model_cfg.defrost()
     model_cfg.MODEL.MHR_HEAD.MHR_MODEL_PATH = mhr_path
+    if torch.device(device).type == "cpu":
+        # Half-precision kernels are slow or missing on CPU: run in float32
+        model_cfg.TRAIN.USE_FP16 = False
     model_cfg.freeze()
 
     # Initialze the model
@@ -41,6 +55,24 @@ def load_sam_3d_body(checkpoint_path: str = "", device: str = "cuda", mhr_path:
     return model, model_cfg
 
 
+def configure_cpu_threads(
+    intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None
+):
+    """Size torch's CPU thread pools; None keeps torch's default.
+
+    intra_op_threads parallelizes single ops (matmuls, convs), inter_op_threads
+    runs independent ops concurrently. The inter-op pool can only be sized
+    before the first parallel work, so a late call only logs a warning.
+    """
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            print(f"Could not set inter-op threads: {e}")
+
+
 def _hf_download(repo_id):
     from huggingface_hub import snapshot_download
     local_dir = snapshot_download(repo_id=repo_id)
@@ -49,4 +81,4 @@ def _hf_download(repo_id):
 
 def load_sam_3d_body_hf(repo_id, **kwargs):
     ckpt_path, mhr_path = _hf_download(repo_id)
-    return load_sam_3d_body(checkpoint_path=ckpt_path, mhr_path=mhr_path)
+    return load_sam_3d_body(checkpoint_path=ckpt_path, mhr_path=mhr_path, **kwargs)
@@ -5,6 +5,20 @@ import torch
 from torch.utils.data import default_collate
 
 
+# Per-person keys that prepare_batch lays out as (batch_size, num_person, ...)
+PERSON_KEYS = (
+    "img",
+    "img_size",
+    "ori_img_size",
+    "bbox_center",
+    "bbox_scale",
+    "bbox",
+    "affine_trans",
+    "mask",
+    "mask_score",
+)
+
+
 class NoCollate:
     def __init__(self, data):
         self.data = data
@@ -43,17 +57,7 @@ def prepare_batch(
     batch = default_collate(data_list)
 
     max_num_person = batch["img"].shape[0]
-    for key in [
-        "img",
-        "img_size",
-        "ori_img_size",
-        "bbox_center",
-        "bbox_scale",
-        "bbox",
-        "affine_trans",
-        "mask",
-        "mask_score",
-    ]:
+    for key in PERSON_KEYS:
         if key in batch:
             batch[key] = batch[key].unsqueeze(0).float()
     if "mask" in batch:
@@ -76,3 +80,40 @@ def prepare_batch(
 
     batch["img_ori"] = [NoCollate(img)]
     return batch
+
+
+def pack_person_crops(batches):
+    """
+    Pack the single-image batches of prepare_batch into one batch with every
+    person crop as its own batch entry, i.e. laid out as (num_crops, 1, ...).
+
+    Each crop carries the camera intrinsics of its own image, so images with
+    different person counts need no padded person slots.
+    """
+    packed = {}
+    for key in batches[0]:
+        values = [batch[key] for batch in batches]
+        if key in PERSON_KEYS or key == "person_valid":
+            packed[key] = torch.cat([value[0].unsqueeze(1) for value in values])
+        elif key == "cam_int":
+            packed[key] = torch.cat(
+                [
+                    value.expand(batch["img"].shape[1], -1, -1)
+                    for value, batch in zip(values, batches)
+                ]
+            )
+        elif key == "img_ori":
+            packed[key] = [
+                value[0] for value, batch in zip(values, batches)
+                for _ in range(batch["img"].shape[1])
+            ]
+        elif isinstance(values[0], torch.Tensor):
+            packed[key] = torch.cat(values)
+        else:
+            packed[key] = [item for value in values for item in value]
+    return packed
+
+
+def slice_batch(batch, start, stop):
+    """Crops start:stop of a batch packed by pack_person_crops."""
+    return {key: value[start:stop] for key, value in batch.items()}
@@ -14,7 +14,7 @@ except:
 
 from timm.models.layers import drop_path, to_2tuple, trunc_normal_
 
-from ..modules.transformer import LayerNorm32
+from ..modules.transformer import LayerNorm32, scaled_dot_product_attention
 
 
 def vit(cfg):
@@ -222,13 +222,15 @@ class Attention(nn.Module):
             qkv[2],
         )  # make torchscript happy (cannot use tensor as tuple)
 
-        q = q * self.scale
-        attn = q @ k.transpose(-2, -1)
-
-        attn = attn.softmax(dim=-1)
-        attn = self.attn_drop(attn)
-
-        x = (attn @ v).transpose(1, 2).reshape(B, N, -1)
+        # Kernel selected by set_attention_backend (fused SDPA by default)
+        x = scaled_dot_product_attention(
+            q,
+            k,
+            v,
+            dropout_p=self.attn_drop.p if self.training else 0.0,
+            scale=self.scale,
+        )
+        x = x.transpose(1, 2).reshape(B, N, -1)
         x = self.proj(x)
         x = self.proj_drop(x)
 
@@ -11,6 +11,60 @@ from .drop_path import DropPath
 from .layer_scale import LayerScale
 from .swiglu_ffn import SwiGLUFFNFused
 
+# Attention kernels selectable for the ViT backbone and the promptable decoder:
+# - sdpa: F.scaled_dot_product_attention, which dispatches to fused
+#   flash / memory-efficient kernels (on CPU too) and never materializes the
+#   full N x N attention matrix when a fused kernel applies
+# - math: explicit matmul + softmax, the reference implementation
+ATTENTION_BACKENDS = ("sdpa", "math")
+_attention_backend = "sdpa"
+
+
+def set_attention_backend(name: str) -> None:
+    """Select the attention kernel used by all attention layers."""
+    global _attention_backend
+    if name not in ATTENTION_BACKENDS:
+        raise ValueError(
+            f"Unknown attention backend {name!r}, expected one of {ATTENTION_BACKENDS}"
+        )
+    _attention_backend = name
+
+
+def get_attention_backend() -> str:
+    return _attention_backend
+
+
+def scaled_dot_product_attention(
+    q: torch.Tensor,
+    k: torch.Tensor,
+    v: torch.Tensor,
+    attn_mask: Optional[torch.Tensor] = None,
+    dropout_p: float = 0.0,
+    scale: Optional[float] = None,
+) -> torch.Tensor:
+    """Attention over (..., N, C) tensors with the selected backend.
+
+    Same semantics as ``F.scaled_dot_product_attention``: a boolean
+    ``attn_mask`` marks the keys to attend to, a float one is added to the
+    attention logits, and ``scale`` defaults to ``C ** -0.5``.
+    """
+    if _attention_backend == "sdpa":
+        return F.scaled_dot_product_attention(
+            q, k, v, attn_mask=attn_mask, dropout_p=dropout_p, scale=scale
+        )
+
+    scale = q.shape[-1] ** -0.5 if scale is None else scale
+    attn = (q * scale) @ k.transpose(-2, -1)
+    if attn_mask is not None:
+        if attn_mask.dtype == torch.bool:
+            attn = attn.masked_fill(~attn_mask, float("-inf"))
+        else:
+            attn = attn + attn_mask
+    attn = attn.softmax(dim=-1)
+    if dropout_p > 0.0:
+        attn = F.dropout(attn, p=dropout_p)
+    return attn @ v
+
 
 class MLP(nn.Module):
     # borrowed from DET R
@@ -258,7 +312,7 @@ class MultiheadAttention(nn.Module):
         q, k, v = qkv[0], qkv[1], qkv[2]
 
         attn_drop = self.attn_drop if self.training else 0.0
-        x = F.scaled_dot_product_attention(q, k, v, dropout_p=attn_drop)
+        x = scaled_dot_product_attention(q, k, v, dropout_p=attn_drop)
         x = x.transpose(1, 2).reshape(B, N, self.embed_dims)
 
         x = self.proj(x)
@@ -362,7 +416,7 @@ class Attention(nn.Module):
         if attn_mask is not None:
             attn_mask = attn_mask.unsqueeze(1).expand(-1, self.num_heads, -1, -1)
 
-        x = F.scaled_dot_product_attention(
+        x = scaled_dot_product_attention(
             q, k, v, attn_mask=attn_mask, dropout_p=attn_drop
         )
         x = x.transpose(1, 2).reshape(B, N, self.embed_dims)
@@ -1,5 +1,7 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates.
-from typing import Optional, Union
+import threading
+from functools import cached_property
+from typing import List, Optional, Sequence, Union
 
 import cv2
 
@@ -14,12 +16,59 @@ from sam_3d_body.data.transforms import (
 )
 
 from sam_3d_body.data.utils.io import load_image
-from sam_3d_body.data.utils.prepare_batch import prepare_batch
+from sam_3d_body.data.utils.prepare_batch import (
+    pack_person_crops,
+    prepare_batch,
+    slice_batch,
+)
 from sam_3d_body.utils import recursive_to
 from torchvision.transforms import ToTensor
 
+# Per-person output fields computed by the MHR head -> key in its output dict
+MHR_OUTPUT_FIELDS = {
+    "focal_length": "focal_length",
+    "pred_keypoints_3d": "pred_keypoints_3d",
+    "pred_keypoints_2d": "pred_keypoints_2d",
+    "pred_vertices": "pred_vertices",
+    "pred_cam_t": "pred_cam_t",
+    "pred_pose_raw": "pred_pose_raw",
+    "global_rot": "global_rot",
+    "body_pose_params": "body_pose",
+    "hand_pose_params": "hand",
+    "scale_params": "scale",
+    "shape_params": "shape",
+    "expr_params": "face",
+    "pred_joint_coords": "pred_joint_coords",
+    "pred_global_rots": "joint_global_rots",
+    "mhr_model_params": "mhr_model_params",
+}
+# All fields returned by process_one_image; the hand boxes only in "full" mode
+OUTPUT_FIELDS = ("bbox", *MHR_OUTPUT_FIELDS, "mask", "lhand_bbox", "rhand_bbox")
+# Person crops per forward pass of process_images: the cap when sizing by free
+# CUDA memory, and the default on CPU (where throughput stops scaling early)
+MAX_BATCH_SIZE = 64
+CPU_BATCH_SIZE = 8
+
 
 class SAM3DBodyEstimator:
+    """
+    Top-down SAM 3D Body inference on full images.
+
+    Build it once and reuse it: process_one_image keeps no per-request state
+    on the estimator, and the model passes (which keep per-batch state on the
+    model) are serialized by a lock, so one estimator can serve concurrent
+    calls. Set empty_cache=True to release the CUDA caching allocator's
+    blocks after every image (slower; only useful under memory pressure).
+
+    Batches are prepared on the model's device, so the same code serves
+    CUDA and CPU models (see load_sam_3d_body(device=...)).
+
+    process_images runs the person crops of many images through the body
+    branch together, max_batch_size crops per forward pass. If it is not
+    given it is sized once from the free CUDA memory (memory_fraction of it)
+    and the measured memory per crop, or set to CPU_BATCH_SIZE on CPU.
+    """
+
     def __init__(
         self,
         sam_3d_body_model,
@@ -27,6 +76,9 @@ class SAM3DBodyEstimator:
         human_detector=None,
         human_segmentor=None,
         fov_estimator=None,
+        empty_cache: bool = False,
+        max_batch_size: Optional[int] = None,
+        memory_fraction: float = 0.8,
     ):
         self.device = sam_3d_body_model.device
         self.model, self.cfg = sam_3d_body_model, model_cfg
@@ -34,9 +86,10 @@ class SAM3DBodyEstimator:
         self.sam = human_segmentor
         self.fov_estimator = fov_estimator
         self.thresh_wrist_angle = 1.4
-
-        # For mesh visualization
-        self.faces = self.model.head_pose.faces.cpu().numpy()
+        self.empty_cache = empty_cache
+        self.max_batch_size = max_batch_size
+        self.memory_fraction = memory_fraction
+        self._model_lock = threading.Lock()
 
         if self.detector is None:
             print("No human detector is used...")
@@ -60,6 +113,11 @@ class SAM3DBodyEstimator:
             ]
         )
 
+    @cached_property
+    def faces(self) -> np.ndarray:
+        """Mesh faces, for mesh visualization."""
+        return self.model.head_pose.faces.cpu().numpy()
+
     @torch.no_grad()
     def process_one_image(
         self,
@@ -72,6 +130,8 @@ class SAM3DBodyEstimator:
         nms_thr: float = 0.3,
         use_mask: bool = False,
         inference_type: str = "full",
+        return_fields: Optional[Sequence[str]] = None,
+        use_detector: bool = True,
     ):
         """
         Perform model prediction in top-down format: assuming input is a full image.
@@ -87,52 +147,36 @@ class SAM3DBodyEstimator:
                 - full: full-body inference with both body and hand decoders
                 - body: inference with body decoder only (still full-body output)
                 - hand: inference with hand decoder only (only hand output)
+                - keypoints_2d: body decoder only, without hand refinement;
+                  returns just the 2D keypoints as a (num_person, 70, 2) array.
+                  "full" re-runs the body decoder prompted with the hand
+                  decoder's wrists and the elbows, so the elbow and wrist
+                  keypoints differ between the two modes.
+            return_fields: Output fields to return per person (see
+                OUTPUT_FIELDS); only these are transferred to the host and
+                converted to numpy. Defaults to all fields.
+            use_detector: Run the human detector (if the estimator has one)
+                when no bboxes are given; otherwise use the full image.
+
+        Returns:
+            A list with one output dict per person, or for
+            ``inference_type="keypoints_2d"`` a float32 array of shape
+            (num_person, 70, 2).
         """
 
-        # clear all cached results
-        self.batch = None
-        self.image_embeddings = None
-        self.output = None
-        self.prev_prompt = []
-        torch.cuda.empty_cache()
+        self._check_return_fields(return_fields)
 
-        if type(img) == str:
-            img = load_image(img, backend="cv2", image_format="bgr")
-            image_format = "bgr"
-        else:
-            print("####### Please make sure the input image is in RGB format")
-            image_format = "rgb"
+        img, boxes = self._person_boxes(
+            img, bboxes, det_cat_id, bbox_thr, nms_thr, use_detector
+        )
         height, width = img.shape[:2]
 
-        if bboxes is not None:
-            boxes = bboxes.reshape(-1, 4)
-            self.is_crop = True
-        elif self.detector is not None:
-            if image_format == "rgb":
-                img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-                image_format = "bgr"
-            print("Running object detector...")
-            boxes = self.detector.run_human_detection(
-                img,
-                det_cat_id=det_cat_id,
-                bbox_thr=bbox_thr,
-                nms_thr=nms_thr,
-                default_to_full_image=False,
-            )
-            print("Found boxes:", boxes)
-            self.is_crop = True
-        else:
-            boxes = np.array([0, 0, width, height]).reshape(1, 4)
-            self.is_crop = False
-
         # If there are no detected humans, don't run prediction
         if len(boxes) == 0:
+            if inference_type == "keypoints_2d":
+                return np.zeros((0, 70, 2), dtype=np.float32)
             return []
 
-        # The following models expect RGB images instead of BGR
-        if image_format == "bgr":
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
         # Handle masks - either provided externally or generated via SAM2
         masks_score = None
         if masks is not None:
@@ -157,8 +201,7 @@ class SAM3DBodyEstimator:
         batch = prepare_batch(img, self.transform, boxes, masks, masks_score)
 
         #################### Run model inference on an image ####################
-        batch = recursive_to(batch, "cuda")
-        self.model._initialize_batch(batch)
+        batch = recursive_to(batch, self.device)
 
         # Handle camera intrinsics
         # - either provided externally or generated via default FOV estimator
@@ -176,85 +219,255 @@ class SAM3DBodyEstimator:
         else:
             cam_int = batch["cam_int"].clone()
 
-        outputs = self.model.run_inference(
-            img,
-            batch,
-            inference_type=inference_type,
-            transform_hand=self.transform_hand,
-            thresh_wrist_angle=self.thresh_wrist_angle,
-        )
+        # The model keeps per-batch state (person counts, decoder indices)
+        with self._model_lock:
+            self.model._initialize_batch(batch)
+            outputs = self.model.run_inference(
+                img,
+                batch,
+                inference_type="body" if inference_type == "keypoints_2d" else inference_type,
+                transform_hand=self.transform_hand,
+                thresh_wrist_angle=self.thresh_wrist_angle,
+            )
+        if self.empty_cache and self.device.type == "cuda":
+            torch.cuda.empty_cache()
+        if inference_type == "keypoints_2d":
+            # Only the 2D keypoints leave the device: no vertices or parameters
+            return outputs["mhr"]["pred_keypoints_2d"].float().cpu().numpy()
         if inference_type == "full":
             pose_output, batch_lhand, batch_rhand, _, _ = outputs
         else:
             pose_output = outputs
 
-        out = pose_output["mhr"]
+        fields = OUTPUT_FIELDS if return_fields is None else tuple(return_fields)
+        # Only the requested tensors are copied to the host
+        out = {
+            field: pose_output["mhr"][MHR_OUTPUT_FIELDS[field]]
+            for field in fields
+            if field in MHR_OUTPUT_FIELDS
+        }
         out = recursive_to(out, "cpu")
         out = recursive_to(out, "numpy")
+        if "bbox" in fields:
+            out["bbox"] = batch["bbox"][0].cpu().numpy()
+        if "mask" in fields:
+            out["mask"] = masks
+        if inference_type == "full":
+            if "lhand_bbox" in fields:
+                out["lhand_bbox"] = self._hand_bboxes(batch_lhand)
+            if "rhand_bbox" in fields:
+                out["rhand_bbox"] = self._hand_bboxes(batch_rhand)
+
         all_out = []
         for idx in range(batch["img"].shape[1]):
             all_out.append(
                 {
-                    "bbox": batch["bbox"][0, idx].cpu().numpy(),
-                    "focal_length": out["focal_length"][idx],
-                    "pred_keypoints_3d": out["pred_keypoints_3d"][idx],
-                    "pred_keypoints_2d": out["pred_keypoints_2d"][idx],
-                    "pred_vertices": out["pred_vertices"][idx],
-                    "pred_cam_t": out["pred_cam_t"][idx],
-                    "pred_pose_raw": out["pred_pose_raw"][idx],
-                    "global_rot": out["global_rot"][idx],
-                    "body_pose_params": out["body_pose"][idx],
-                    "hand_pose_params": out["hand"][idx],
-                    "scale_params": out["scale"][idx],
-                    "shape_params": out["shape"][idx],
-                    "expr_params": out["face"][idx],
-                    "mask": masks[idx] if masks is not None else None,
-                    "pred_joint_coords": out["pred_joint_coords"][idx],
-                    "pred_global_rots": out["joint_global_rots"][idx],
-                    "mhr_model_params": out["mhr_model_params"][idx],
+                    field: value[idx] if value is not None else None
+                    for field, value in out.items()
                 }
             )
 
-            if inference_type == "full":
-                all_out[-1]["lhand_bbox"] = np.array(
-                    [
-                        (
-                            batch_lhand["bbox_center"].flatten(0, 1)[idx][0]
-                            - batch_lhand["bbox_scale"].flatten(0, 1)[idx][0] / 2
-                        ).item(),
-                        (
-                            batch_lhand["bbox_center"].flatten(0, 1)[idx][1]
-                            - batch_lhand["bbox_scale"].flatten(0, 1)[idx][1] / 2
-                        ).item(),
-                        (
-                            batch_lhand["bbox_center"].flatten(0, 1)[idx][0]
-                            + batch_lhand["bbox_scale"].flatten(0, 1)[idx][0] / 2
-                        ).item(),
-                        (
-                            batch_lhand["bbox_center"].flatten(0, 1)[idx][1]
-                            + batch_lhand["bbox_scale"].flatten(0, 1)[idx][1] / 2
-                        ).item(),
-                    ]
-                )
-                all_out[-1]["rhand_bbox"] = np.array(
-                    [
-                        (
-                            batch_rhand["bbox_center"].flatten(0, 1)[idx][0]
-                            - batch_rhand["bbox_scale"].flatten(0, 1)[idx][0] / 2
-                        ).item(),
-                        (
-                            batch_rhand["bbox_center"].flatten(0, 1)[idx][1]
-                            - batch_rhand["bbox_scale"].flatten(0, 1)[idx][1] / 2
-                        ).item(),
-                        (
-                            batch_rhand["bbox_center"].flatten(0, 1)[idx][0]
-                            + batch_rhand["bbox_scale"].flatten(0, 1)[idx][0] / 2
-                        ).item(),
-                        (
-                            batch_rhand["bbox_center"].flatten(0, 1)[idx][1]
-                            + batch_rhand["bbox_scale"].flatten(0, 1)[idx][1] / 2
-                        ).item(),
-                    ]
-                )
-
         return all_out
+
+    @torch.no_grad()
+    def process_images(
+        self,
+        imgs: Sequence[Union[str, np.ndarray]],
+        bboxes: Optional[Sequence[Optional[np.ndarray]]] = None,
+        det_cat_id: int = 0,
+        bbox_thr: float = 0.5,
+        nms_thr: float = 0.3,
+        inference_type: str = "keypoints_2d",
+        return_fields: Optional[Sequence[str]] = None,
+        use_detector: bool = True,
+        max_batch_size: Optional[int] = None,
+    ) -> List:
+        """
+        Batched process_one_image for many images (body decoder only).
+
+        The person crops of all images are packed into one batch, run through
+        the body branch at most max_batch_size crops at a time and scattered
+        back per image. Masks are not supported; camera intrinsics come from
+        the FOV estimator if there is one, else the default FOV.
+
+        Args:
+            imgs: Input images (paths or RGB numpy arrays)
+            bboxes: Optional pre-computed boxes per image (None entries are
+                detected / full image, as in process_one_image)
+            inference_type: "keypoints_2d" or "body" (see process_one_image)
+            return_fields: Output fields per person for "body" (see
+                OUTPUT_FIELDS; the hand boxes are never returned)
+            use_detector: Run the human detector for images without bboxes
+            max_batch_size: Person crops per forward pass; defaults to
+                batch_size_limit()
+
+        Returns:
+            One result per image, as process_one_image returns it.
+        """
+        if inference_type not in ("keypoints_2d", "body"):
+            raise ValueError(
+                f"process_images supports keypoints_2d and body inference, "
+                f"got {inference_type!r}"
+            )
+        self._check_return_fields(return_fields)
+        if bboxes is not None and len(bboxes) != len(imgs):
+            raise ValueError(
+                f"Got {len(bboxes)} bboxes entries for {len(imgs)} images"
+            )
+
+        batches, counts = [], []
+        for idx, img in enumerate(imgs):
+            img, boxes = self._person_boxes(
+                img,
+                None if bboxes is None else bboxes[idx],
+                det_cat_id,
+                bbox_thr,
+                nms_thr,
+                use_detector,
+            )
+            counts.append(len(boxes))
+            if len(boxes) == 0:
+                continue
+            cam_int = None
+            if self.fov_estimator is not None:
+                cam_int = self.fov_estimator.get_cam_intrinsics(img)
+            batches.append(
+                prepare_batch(img, self.transform, boxes, cam_int=cam_int)
+            )
+        num_crops = sum(counts)
+
+        keypoints = [np.zeros((0, 70, 2), dtype=np.float32)]
+        person_outputs = []
+        if num_crops:
+            batch = pack_person_crops(batches)
+            max_batch_size = max_batch_size or self.batch_size_limit()
+            for start in range(0, num_crops, max_batch_size):
+                chunk = slice_batch(batch, start, start + max_batch_size)
+                pose_output = self._forward_crops(chunk)
+                if inference_type == "keypoints_2d":
+                    keypoints.append(
+                        pose_output["mhr"]["pred_keypoints_2d"].float().cpu().numpy()
+                    )
+                else:
+                    person_outputs.extend(
+                        self._person_outputs(pose_output, chunk, return_fields)
+                    )
+            if self.empty_cache and self.device.type == "cuda":
+                torch.cuda.empty_cache()
+
+        # Scatter the crops back to their images
+        offsets = np.cumsum([0] + counts)
+        if inference_type == "keypoints_2d":
+            return np.split(np.concatenate(keypoints), offsets[1:-1])
+        return [
+            person_outputs[begin:end] for begin, end in zip(offsets[:-1], offsets[1:])
+        ]
+
+    def batch_size_limit(self) -> int:
+        """
+        Person crops per forward pass of process_images.
+
+        Unless max_batch_size was given, it is measured on first use: one
+        forward pass over two dummy crops gives the peak memory per crop,
+        and memory_fraction of the free CUDA memory is divided by it.
+        """
+        if self.max_batch_size is None:
+            if self.device.type != "cuda":
+                self.max_batch_size = CPU_BATCH_SIZE
+            else:
+                self.max_batch_size = self._batch_size_for_free_memory()
+        return self.max_batch_size
+
+    @torch.no_grad()
+    def _batch_size_for_free_memory(self) -> int:
+        size = max(self.cfg.MODEL.IMAGE_SIZE)
+        img = np.zeros((size, size, 3), dtype=np.uint8)
+        boxes = np.array([[0, 0, size, size]] * 2, dtype=np.float32)
+        batch = pack_person_crops([prepare_batch(img, self.transform, boxes)])
+
+        torch.cuda.synchronize(self.device)
+        base = torch.cuda.memory_allocated(self.device)
+        torch.cuda.reset_peak_memory_stats(self.device)
+        self._forward_crops(batch)
+        per_crop = (torch.cuda.max_memory_allocated(self.device) - base) / len(boxes)
+        free, _ = torch.cuda.mem_get_info(self.device)
+        return int(np.clip(free * self.memory_fraction // per_crop, 1, MAX_BATCH_SIZE))
+
+    @staticmethod
+    def _check_return_fields(return_fields: Optional[Sequence[str]]) -> None:
+        if return_fields is not None:
+            unknown = set(return_fields) - set(OUTPUT_FIELDS)
+            if unknown:
+                raise ValueError(f"Unknown return_fields: {sorted(unknown)}")
+
+    def _person_boxes(self, img, bboxes, det_cat_id, bbox_thr, nms_thr, use_detector):
+        """The RGB image and its person boxes (given, detected or full image)."""
+        if type(img) == str:
+            img = load_image(img, backend="cv2", image_format="bgr")
+            image_format = "bgr"
+        else:
+            print("####### Please make sure the input image is in RGB format")
+            image_format = "rgb"
+        height, width = img.shape[:2]
+
+        if bboxes is not None:
+            boxes = bboxes.reshape(-1, 4)
+        elif use_detector and self.detector is not None:
+            if image_format == "rgb":
+                img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+                image_format = "bgr"
+            print("Running object detector...")
+            boxes = self.detector.run_human_detection(
+                img,
+                det_cat_id=det_cat_id,
+                bbox_thr=bbox_thr,
+                nms_thr=nms_thr,
+                default_to_full_image=False,
+            )
+            print("Found boxes:", boxes)
+        else:
+            boxes = np.array([0, 0, width, height]).reshape(1, 4)
+
+        # The models expect RGB images instead of BGR
+        if image_format == "bgr":
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        return img, boxes
+
+    def _person_outputs(self, pose_output, batch, return_fields) -> List[dict]:
+        """Per-person output dicts of a body pass on packed person crops."""
+        fields = OUTPUT_FIELDS if return_fields is None else tuple(return_fields)
+        out = {
+            field: pose_output["mhr"][MHR_OUTPUT_FIELDS[field]]
+            for field in fields
+            if field in MHR_OUTPUT_FIELDS
+        }
+        out = recursive_to(out, "cpu")
+        out = recursive_to(out, "numpy")
+        if "bbox" in fields:
+            out["bbox"] = batch["bbox"][:, 0].cpu().numpy()
+        if "mask" in fields:
+            out["mask"] = None
+        return [
+            {
+                field: value[idx] if value is not None else None
+                for field, value in out.items()
+            }
+            for idx in range(batch["img"].shape[0])
+        ]
+
+    def _forward_crops(self, batch):
+        """Body branch on a batch of packed person crops."""
+        batch = recursive_to(batch, self.device)
+        # The model keeps per-batch state (person counts, decoder indices)
+        with self._model_lock:
+            self.model._initialize_batch(batch)
+            return self.model.forward_step(batch, decoder_type="body")
+
+    @staticmethod
+    def _hand_bboxes(batch_hand) -> np.ndarray:
+        """Hand boxes (x1, y1, x2, y2) of all persons from a hand-crop batch."""
+        center = batch_hand["bbox_center"].flatten(0, 1)[:, :2]
+        half_size = batch_hand["bbox_scale"].flatten(0, 1)[:, :2] / 2
+        boxes = torch.cat([center - half_size, center + half_size], dim=-1)
+        # float64 like the previous per-coordinate .item() construction
+        return boxes.cpu().numpy().astype(np.float64)
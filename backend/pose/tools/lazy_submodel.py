@@ -0,0 +1,62 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+Lazily loaded optional submodels (human detector, segmentor, FOV estimator).
+
+A LazySubmodel wraps the factory of a submodel and stands in for it: the first
+attribute access (e.g. ``detector.run_human_detection``) builds the model, so a
+deployment only pays cold-start time and memory for the submodels it actually
+calls. ``prefetch()`` starts the load in a background thread instead, and
+``load_time`` reports how long the load took.
+"""
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class LazySubmodel:
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self.load_time: Optional[float] = None
+        self._factory = factory
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def get(self) -> Any:
+        """Return the submodel, loading it on first use (thread-safe)."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    print(f"Loading {self.name}...")
+                    start_time = time.perf_counter()
+                    model = self._factory()
+                    self.load_time = time.perf_counter() - start_time
+                    print(f"{self.name} loaded in {self.load_time:.1f}s")
+                    self._model = model
+        return self._model
+
+    def prefetch(self) -> threading.Thread:
+        """Load the submodel in a background thread.
+
+        A failed prefetch is only logged: the next get() retries the load and
+        raises in the caller.
+        """
+
+        def load():
+            try:
+                self.get()
+            except Exception as e:
+                print(f"Prefetching {self.name} failed: {e}")
+
+        thread = threading.Thread(target=load, name=f"prefetch-{self.name}", daemon=True)
+        thread.start()
+        return thread
+
+    def __getattr__(self, attr: str) -> Any:
+        # Only called for attributes not found on the proxy itself
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
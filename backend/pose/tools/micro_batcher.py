@@ -0,0 +1,118 @@
+"""
+Cross-request dynamic micro-batching.
+
+A MicroBatcher sits in front of a batched model function. Concurrent callers
+submit() single items and get a Future; a worker thread collects the items
+that arrive within ``max_wait`` seconds of the oldest pending one (or until
+``max_batch_size`` are pending), runs them as one ``process_batch(items)``
+call and resolves each caller's future with its result. Under light load a
+request waits at most ``max_wait``; under heavy load batches fill up and the
+model runs at a larger batch size instead of serving requests one at a time.
+
+``stats()`` reports the batch-size histogram and the queue depth (pending
+requests, including the batch being taken) seen at each dispatch.
+"""
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Sequence
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 16,
+        max_wait: float = 0.01,
+        name: str = "micro-batcher",
+    ):
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}")
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._process_batch = process_batch
+        self._pending = deque()  # (arrival time, item, future)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._batch_sizes = Counter()
+        self._queue_depths = Counter()
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue one item; the future resolves to its entry of the batch result."""
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._pending.append((time.monotonic(), item, future))
+            self._cond.notify()
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        """Submit one item and wait for its result."""
+        return self.submit(item).result()
+
+    def close(self) -> None:
+        """Stop the worker once the already queued items are processed."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._worker.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            queue_depths = dict(sorted(self._queue_depths.items()))
+            pending = len(self._pending)
+        batches = sum(batch_sizes.values())
+        requests = sum(size * count for size, count in batch_sizes.items())
+        return {
+            "requests": requests,
+            "batches": batches,
+            "mean_batch_size": requests / batches if batches else 0.0,
+            "pending": pending,
+            "batch_size_histogram": batch_sizes,
+            "queue_depth_histogram": queue_depths,
+        }
+
+    def _next_batch(self) -> List[tuple]:
+        """Wait for the next batch: full, or the oldest item waited max_wait."""
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if self._pending:
+                deadline = self._pending[0][0] + self.max_wait
+                while len(self._pending) < self.max_batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            depth = len(self._pending)
+            batch = [self._pending.popleft() for _ in range(min(depth, self.max_batch_size))]
+            if batch:
+                self._batch_sizes[len(batch)] += 1
+                self._queue_depths[depth] += 1
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return  # closed and drained
+            # Callers may have cancelled their futures while queued
+            batch = [entry for entry in batch if entry[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self._process_batch([item for _, item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"process_batch returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
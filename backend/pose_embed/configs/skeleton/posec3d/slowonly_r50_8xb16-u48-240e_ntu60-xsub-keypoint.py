@@ -75,7 +75,8 @@ test_pipeline = [
         with_limb=False,
         double=True,
         left_kp=left_kp,
-        right_kp=right_kp),
+        right_kp=right_kp,
+        backend='numpy'),
     dict(type='FormatShape', input_format='NCTHW_Heatmap'),
     dict(type='PackActionInputs')
 ]
@@ -47,7 +47,8 @@ train_pipeline = [
         use_score=True,
         with_kp=False,
         with_limb=True,
-        skeletons=skeletons),
+        skeletons=skeletons,
+        backend='numpy'),
     dict(type='FormatShape', input_format='NCTHW_Heatmap'),
     dict(type='PackActionInputs')
 ]
@@ -63,7 +64,8 @@ val_pipeline = [
         use_score=True,
         with_kp=False,
         with_limb=True,
-        skeletons=skeletons),
+        skeletons=skeletons,
+        backend='numpy'),
     dict(type='FormatShape', input_format='NCTHW_Heatmap'),
     dict(type='PackActionInputs')
 ]
@@ -83,7 +85,8 @@ test_pipeline = [
         skeletons=skeletons,
         double=True,
         left_limb=left_limb,
-        right_limb=right_limb),
+        right_limb=right_limb,
+        backend='numpy'),
     dict(type='FormatShape', input_format='NCTHW_Heatmap'),
     dict(type='PackActionInputs')
 ]
@@ -1,8 +1,10 @@
 """
 Modal wrapper for PoseC3D 2D pose embedding extraction.
 """
+import copy
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from modal_app import image, app, volume
 import modal
@@ -66,6 +68,102 @@ def _load_model():
     return model, config
 
 
+# Embedding size of the ResNet3dSlowOnly backbone
+EMBEDDING_DIM = 512
+# A still image is tiled to PoseC3D's expected temporal length
+NUM_FRAMES = 48
+NUM_KEYPOINTS = 17
+# Samples per backbone forward in extract_embeddings_batch
+POSE_BATCH_SIZE = 32
+# Threads rendering heatmap volumes (test pipeline) for a batch
+PIPELINE_WORKERS = 8
+
+
+def pose_dict_to_annotation(
+    pose_dict: Dict[str, Tuple[float, float]],
+    img_shape: Tuple[int, int],
+    num_frames: int = NUM_FRAMES,
+) -> Dict[str, Any]:
+    """
+    Build the PoseC3D annotation for a single still pose.
+
+    Args:
+        pose_dict: Dictionary mapping MHR70 joint names to (x, y) coordinates
+        img_shape: Image shape (height, width)
+        num_frames: Frames the pose is tiled to (1 for the static pipeline)
+
+    Returns:
+        Annotation dict for the mmaction test pipeline
+    """
+    # Map MHR70 joints to COCO 17 format
+    coco_keypoints = np.zeros((NUM_KEYPOINTS, 2), dtype=np.float32)
+    coco_scores = np.ones(NUM_KEYPOINTS, dtype=np.float32)
+
+    for mhr_idx, coco_idx in MHR70_TO_COCO_MAPPING.items():
+        joint_name = mhr_names[mhr_idx]
+        if joint_name in pose_dict:
+            x, y = pose_dict[joint_name]
+            coco_keypoints[coco_idx] = [x, y]
+        else:
+            # Missing joint - set score to 0
+            coco_scores[coco_idx] = 0.0
+
+    # Convert to format expected by PoseC3D
+    # Format: [M x T x V x C] where M=persons, T=frames, V=keypoints, C=coords
+    # For single frame, repeat 48 times to match PoseC3D's expected temporal dimension
+    num_persons = 1
+
+    # Create keypoints: [T, M, V, C] then transpose to [M, T, V, C]
+    keypoints = np.tile(coco_keypoints[np.newaxis, np.newaxis, :, :],
+                        (num_frames, num_persons, 1, 1))
+    keypoint_scores = np.tile(coco_scores[np.newaxis, np.newaxis, :],
+                              (num_frames, num_persons, 1))
+
+    # Transpose to [M, T, V, C] format
+    keypoints = keypoints.transpose((1, 0, 2, 3))  # [M, T, V, C]
+    keypoint_scores = keypoint_scores.transpose((1, 0, 2))  # [M, T, V]
+
+    # Create fake annotation dict
+    h, w = img_shape
+    return dict(
+        frame_dict='',
+        label=-1,
+        img_shape=(h, w),
+        origin_shape=(h, w),
+        start_index=0,
+        modality='Pose',
+        total_frames=num_frames,
+        keypoint=keypoints,  # [M, T, V, C] = [1, 48, 17, 2]
+        keypoint_score=keypoint_scores,  # [M, T, V] = [1, 48, 17]
+    )
+
+
+def static_pipeline_config(test_pipeline: Sequence[Dict[str, Any]], flip: bool) -> List[Dict[str, Any]]:
+    """
+    Test pipeline for a still pose: one single-frame clip, plus its flip if requested.
+
+    The full pipeline samples 10 clips of 48 frames and renders each frame (and
+    its flip) although all frames of a still pose are identical. Rendering one
+    frame and broadcasting it over time gives the same input volume.
+    """
+    pipeline = copy.deepcopy(list(test_pipeline))
+    for transform in pipeline:
+        if transform['type'] == 'UniformSampleFrames':
+            transform.update(clip_len=1, num_clips=1)
+        elif transform['type'] == 'GeneratePoseTarget':
+            transform['double'] = flip
+    return pipeline
+
+
+def pool_features(features: "torch.Tensor") -> "torch.Tensor":
+    """Global average pool backbone features to one vector per sample."""
+    # features shape: [batch_size, channels, temporal, spatial_h, spatial_w]
+    if len(features.shape) == 5:
+        return features.mean(dim=(2, 3, 4))  # [batch_size, channels]
+    # Fallback: flatten and average
+    return features.view(features.size(0), features.size(1), -1).mean(dim=2)
+
+
 @app.cls(gpu="A10G", image=image, volumes={"/root/data": volume}, container_idle_timeout=300, keep_warm=1)
 class PoseEmbedding:
     """Modal model class for extracting embeddings from 2D poses using PoseC3D."""
@@ -79,6 +177,11 @@ class PoseEmbedding:
         # Get test pipeline from config
         init_default_scope(self.config.get('default_scope', 'mmaction'))
         self.test_pipeline = Compose(self.config.test_pipeline)
+        self.static_pipelines = {
+            flip: Compose(static_pipeline_config(self.config.test_pipeline, flip))
+            for flip in (False, True)
+        }
+        self.pipeline_pool = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS)
 
         print("PoseC3D model loaded successfully!")
 
@@ -87,6 +190,8 @@ class PoseEmbedding:
             self,
             pose_dict: Dict[str, Tuple[float, float]],
             img_shape: Tuple[int, int] = (480, 640),
+            static: bool = True,
+            flip: bool = False,
     ) -> np.ndarray:
         """
         Extract embedding from a 2D pose dictionary.
@@ -96,89 +201,116 @@ class PoseEmbedding:
                       from SAM 3D Body output.
             img_shape: Image shape (height, width) used for normalization.
                       Defaults to (480, 640).
+            static: Render the still pose once and broadcast it over time instead
+                    of running the full 10-clip test pipeline (same embedding).
+            flip: Average with the embedding of the horizontally flipped pose.
 
         Returns:
             Embedding vector as numpy array.
         """
-        # Handle empty pose dict
-        if not pose_dict:
-            # Return zero embedding (512 dim from backbone)
-            return np.zeros(512, dtype=np.float32)
-
-        # Map MHR70 joints to COCO 17 format
-        coco_keypoints = np.zeros((17, 2), dtype=np.float32)
-        coco_scores = np.ones(17, dtype=np.float32)
-
-        for mhr_idx, coco_idx in MHR70_TO_COCO_MAPPING.items():
-            joint_name = mhr_names[mhr_idx]
-            if joint_name in pose_dict:
-                x, y = pose_dict[joint_name]
-                coco_keypoints[coco_idx] = [x, y]
-            else:
-                # Missing joint - set score to 0
-                coco_scores[coco_idx] = 0.0
-
-        # Convert to format expected by PoseC3D
-        # Format: [M x T x V x C] where M=persons, T=frames, V=keypoints, C=coords
-        # For single frame, repeat 48 times to match PoseC3D's expected temporal dimension
-        num_frames = 48
-        num_persons = 1
-        num_keypoints = 17
-
-        # Create keypoints: [T, M, V, C] then transpose to [M, T, V, C]
-        keypoints = np.tile(coco_keypoints[np.newaxis, np.newaxis, :, :],
-                            (num_frames, num_persons, 1, 1))
-        keypoint_scores = np.tile(coco_scores[np.newaxis, np.newaxis, :],
-                                  (num_frames, num_persons, 1))
-
-        # Transpose to [M, T, V, C] format
-        keypoints = keypoints.transpose((1, 0, 2, 3))  # [M, T, V, C]
-        keypoint_scores = keypoint_scores.transpose((1, 0, 2))  # [M, T, V]
-
-        # Create fake annotation dict
-        h, w = img_shape
-        fake_anno = dict(
-            frame_dict='',
-            label=-1,
-            img_shape=(h, w),
-            origin_shape=(h, w),
-            start_index=0,
-            modality='Pose',
-            total_frames=num_frames,
-            keypoint=keypoints,  # [M, T, V, C] = [1, 48, 17, 2]
-            keypoint_score=keypoint_scores,  # [M, T, V] = [1, 48, 17]
-        )
-
-        # Process through test pipeline
-        data = self.test_pipeline(fake_anno)
-        data = pseudo_collate([data])
-
-        # Extract features
-        # pseudo_collate returns a dict with 'inputs' (list) and 'data_samples' keys
-        # Convert inputs list to tensor if needed
-        with torch.no_grad():
-            inputs = data['inputs']
-            # If inputs is a list, stack it into a tensor
-            if isinstance(inputs, list):
-                inputs = torch.stack(inputs)
-            inputs = inputs.to('cuda:0')
-            # Extract backbone features
-            features, _ = self.model.extract_feat(inputs,
-                                                  stage='backbone',
-                                                  test_mode=True)
-
-            # Average pool spatial and temporal dimensions
-            # features shape: [batch_size, channels, temporal, spatial_h, spatial_w]
-            # We want to get a single embedding vector per sample
-            if len(features.shape) == 5:
-                # Global average pooling over spatial and temporal dimensions
-                embedding = features.mean(dim=(2, 3,
-                                               4))  # [batch_size, channels]
-            else:
-                # Fallback: flatten and average
-                embedding = features.view(features.size(0), features.size(1),
-                                          -1).mean(dim=2)
-
-            # Convert to numpy and return first (and only) sample
-            embedding_np = embedding[0].cpu().numpy().astype(np.float32)
-            return embedding_np
+        return self._embed([pose_dict], [img_shape], static=static, flip=flip)[0]
+
+    @modal.method()
+    def extract_embeddings_batch(
+            self,
+            pose_dicts: List[Dict[str, Tuple[float, float]]],
+            img_shapes: Optional[Sequence[Tuple[int, int]]] = None,
+            batch_size: int = POSE_BATCH_SIZE,
+            static: bool = True,
+            flip: bool = False,
+    ) -> np.ndarray:
+        """
+        Extract embeddings for many 2D poses in one call.
+
+        Heatmap volumes are rendered on a thread pool and the backbone runs on
+        stacked batches of `batch_size` poses.
+
+        Args:
+            pose_dicts: List of pose dictionaries (MHR70 joint name -> (x, y))
+            img_shapes: Image shape (height, width) per pose. Defaults to (480, 640).
+            batch_size: Poses per backbone forward pass
+            static: Use the still-pose fast path (see extract_embedding)
+            flip: Average with the embeddings of the flipped poses
+
+        Returns:
+            Embeddings as numpy array. Shape: (len(pose_dicts), 512)
+        """
+        if img_shapes is None:
+            img_shapes = [(480, 640)] * len(pose_dicts)
+        if len(img_shapes) != len(pose_dicts):
+            raise ValueError(
+                f"Got {len(pose_dicts)} poses but {len(img_shapes)} image shapes")
+        return self._embed(pose_dicts, img_shapes, batch_size, static=static, flip=flip)
+
+    @modal.method()
+    def compare_static_embedding(
+            self,
+            pose_dicts: List[Dict[str, Tuple[float, float]]],
+            img_shapes: Optional[Sequence[Tuple[int, int]]] = None,
+            flip: bool = False,
+    ) -> Dict[str, float]:
+        """
+        Compare the still-pose fast path against the full test pipeline.
+
+        Returns:
+            {"max_abs_diff", "min_cosine"} over the given poses
+        """
+        if img_shapes is None:
+            img_shapes = [(480, 640)] * len(pose_dicts)
+        full = self._embed(pose_dicts, img_shapes, static=False, flip=flip)
+        fast = self._embed(pose_dicts, img_shapes, static=True, flip=flip)
+        norms = np.linalg.norm(full, axis=1) * np.linalg.norm(fast, axis=1)
+        cosine = np.sum(full * fast, axis=1) / np.maximum(norms, 1e-12)
+        return {
+            "max_abs_diff": float(np.abs(full - fast).max()) if len(full) else 0.0,
+            "min_cosine": float(cosine.min()) if len(full) else 1.0,
+        }
+
+    def _embed(
+            self,
+            pose_dicts: Sequence[Dict[str, Tuple[float, float]]],
+            img_shapes: Sequence[Tuple[int, int]],
+            batch_size: int = POSE_BATCH_SIZE,
+            static: bool = True,
+            flip: bool = False,
+    ) -> np.ndarray:
+        # Empty pose dicts get a zero embedding
+        embeddings = np.zeros((len(pose_dicts), EMBEDDING_DIM), dtype=np.float32)
+        valid = [i for i, pose_dict in enumerate(pose_dicts) if pose_dict]
+        pipeline = self.static_pipelines[flip] if static else self.test_pipeline
+        num_frames = 1 if static else NUM_FRAMES
+
+        for start in range(0, len(valid), batch_size):
+            chunk = valid[start:start + batch_size]
+            annotations = [
+                pose_dict_to_annotation(pose_dicts[i], img_shapes[i], num_frames) for i in chunk
+            ]
+
+            # Render heatmap volumes in parallel. UniformSampleFrames seeds the global
+            # RNG in test mode, but every frame of a still pose is identical, so the
+            # sampled indices (and therefore the volumes) don't depend on ordering
+            samples = list(self.pipeline_pool.map(pipeline, annotations))
+            data = pseudo_collate(samples)
+
+            with torch.no_grad():
+                # [N, num_views, C, T, H, W]; each view is a (possibly flipped) clip.
+                # The embedding uses the first clip (and the first flipped clip, which
+                # starts halfway through the views), the other clips are identical
+                # copies and are not pushed through the backbone
+                inputs = torch.stack(data['inputs'])
+                num_views = inputs.shape[1]
+                views = [0, num_views // 2] if flip else [0]
+                inputs = inputs[:, views].to('cuda:0')
+                if static:
+                    # Broadcast the single rendered frame to PoseC3D's clip length
+                    shape = list(inputs.shape)
+                    shape[3] = NUM_FRAMES
+                    inputs = inputs.expand(shape).contiguous()
+
+                features, _ = self.model.extract_feat(inputs,
+                                                      stage='backbone',
+                                                      test_mode=True)
+                pooled = pool_features(features).view(len(chunk), len(views), -1).mean(dim=1)
+                embeddings[chunk] = pooled.cpu().numpy().astype(np.float32)
+
+        return embeddings
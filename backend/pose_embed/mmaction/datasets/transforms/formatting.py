@@ -241,7 +241,7 @@ class FormatShape(BaseTransform):
             results (dict): The resulting dict to be modified and passed
                 to the next transform in pipeline.
         """
-        if not isinstance(results['imgs'], np.ndarray):
+        if not isinstance(results['imgs'], (np.ndarray, torch.Tensor)):
             results['imgs'] = np.array(results['imgs'])
 
         # [M x H x W x C]
@@ -291,7 +291,11 @@ class FormatShape(BaseTransform):
 
             imgs = imgs.reshape((-1, num_clips, clip_len) + imgs.shape[1:])
             # N_crops x N_clips x T x C x H x W
-            imgs = np.transpose(imgs, (0, 1, 3, 2, 4, 5))
+            if isinstance(imgs, torch.Tensor):
+                # rendered by GeneratePoseTarget(backend='torch')
+                imgs = imgs.permute(0, 1, 3, 2, 4, 5)
+            else:
+                imgs = np.transpose(imgs, (0, 1, 3, 2, 4, 5))
             # N_crops x N_clips x C x T x H x W
             imgs = imgs.reshape((-1, ) + imgs.shape[2:])
             # M' x C x T x H x W
@@ -3,6 +3,7 @@ from typing import Dict, List, Optional, Tuple, Union
 
 import numpy as np
 import scipy
+import torch
 from mmcv.transforms import BaseTransform, KeyMapper
 from mmengine.dataset import Compose
 from packaging import version as pv
@@ -19,6 +20,16 @@ else:
     from functools import partial
     get_mode = partial(mode, keepdims=True)
 
+# Dtype of ``np.float32 scalar - python float``: float64 under NumPy 1.x
+# value-based casting, float32 under NEP 50. The vectorized heatmap renderers
+# compute patch windows in this dtype to match the per-keypoint loop exactly.
+_SCALAR_BOUND_DTYPE = (np.float32(0) - 0.5).dtype
+# Dtype of the limb distance field in ``generate_a_limb_heatmap``, where the
+# 0/1 segment mask ``1 - bool - bool`` multiplies a float32 array: float32
+# under NumPy 1.x (uint8 mask), float64 under NEP 50 (int64 mask).
+_LIMB_DIST_DTYPE = ((1 - np.zeros(1, bool) - np.zeros(1, bool)) *
+                    np.zeros(1, np.float32)).dtype
+
 
 @TRANSFORMS.register_module()
 class DecompressPose(BaseTransform):
@@ -167,8 +178,19 @@ class GeneratePoseTarget(BaseTransform):
             flipping heatmaps. Defaults to (1, 3, 7, 8, 9, 13, 14, 15),
             which is right limbs of skeletons we defined for COCO-17p.
         scaling (float): The ratio to scale the heatmaps. Defaults to 1.
+        backend (str): How keypoint heatmaps are rendered. ``'loop'`` draws
+            one Gaussian patch per keypoint, person and frame in Python.
+            ``'numpy'`` renders all of them in one broadcasted pass and is
+            bit-identical to ``'loop'``. ``'torch'`` renders into a tensor on
+            ``device`` (equal to ``'loop'`` up to float rounding of ``exp``).
+            Defaults to ``'loop'``.
+        device (str): Device of the ``'torch'`` backend. Defaults to ``'cpu'``.
+        max_chunk_size (int): Maximum number of pixels evaluated at once by
+            the vectorized backends, to bound memory. Defaults to 2 ** 21.
     """
 
+    BACKENDS = ('loop', 'numpy', 'torch')
+
     def __init__(self,
                  sigma: float = 0.6,
                  use_score: bool = True,
@@ -185,7 +207,10 @@ class GeneratePoseTarget(BaseTransform):
                  right_kp: Tuple[int] = (2, 4, 6, 8, 10, 12, 14, 16),
                  left_limb: Tuple[int] = (0, 2, 4, 5, 6, 10, 11, 12),
                  right_limb: Tuple[int] = (1, 3, 7, 8, 9, 13, 14, 15),
-                 scaling: float = 1.) -> None:
+                 scaling: float = 1.,
+                 backend: str = 'loop',
+                 device: str = 'cpu',
+                 max_chunk_size: int = 2**21) -> None:
 
         self.sigma = sigma
         self.use_score = use_score
@@ -206,6 +231,12 @@ class GeneratePoseTarget(BaseTransform):
         self.right_limb = right_limb
         self.scaling = scaling
 
+        assert backend in self.BACKENDS, (
+            f'backend should be one of {self.BACKENDS}, got {backend}')
+        self.backend = backend
+        self.device = device
+        self.max_chunk_size = max_chunk_size
+
     def generate_a_heatmap(self, arr: np.ndarray, centers: np.ndarray,
                            max_values: np.ndarray) -> None:
         """Generate pseudo heatmap for one keypoint in one frame.
@@ -353,14 +384,177 @@ class GeneratePoseTarget(BaseTransform):
                 self.generate_a_limb_heatmap(arr[i], starts, ends,
                                              start_values, end_values)
 
-    def gen_an_aug(self, results: Dict) -> np.ndarray:
+    def _windows(self, lower: np.ndarray, upper: np.ndarray,
+                 size: int) -> Tuple[np.ndarray]:
+        """Patch window [start, end) along one axis, as computed by
+        :meth:`generate_a_heatmap` and :meth:`generate_a_limb_heatmap`.
+
+        Args:
+            lower (np.ndarray): Smallest coordinate covered along the axis
+                (the keypoint, or the lower end of a limb).
+            upper (np.ndarray): Largest coordinate covered along the axis.
+            size (int): Heatmap size along the axis.
+
+        Returns:
+            tuple[np.ndarray]: Window starts and ends (int64), same shape as
+            ``lower``.
+        """
+        lower = lower.astype(_SCALAR_BOUND_DTYPE)
+        upper = upper.astype(_SCALAR_BOUND_DTYPE)
+        # int() truncates toward zero
+        start = np.trunc(lower - 3 * self.sigma).astype(np.int64)
+        end = np.trunc(upper + 3 * self.sigma).astype(np.int64) + 1
+        return np.maximum(start, 0), np.minimum(end, size)
+
+    def _frame_chunks(self, num_frame: int, pixels_per_frame: int):
+        """Frame ranges rendered at once by the vectorized backends, so that
+        at most ``max_chunk_size`` pixels are evaluated per pass."""
+        chunk = max(1, self.max_chunk_size // max(pixels_per_frame, 1))
+        for start in range(0, num_frame, chunk):
+            yield start, min(start + chunk, num_frame)
+
+    def _kp_patches(self, all_kps: np.ndarray) -> Tuple[np.ndarray]:
+        """Pixel coordinates of the 3-sigma patch around every keypoint.
+
+        Args:
+            all_kps (np.ndarray): The coordinates of keypoints.
+                Shape: M * t * V * 2.
+
+        Returns:
+            tuple[np.ndarray]: ``px`` (M * t * V * Px) and ``py``
+            (M * t * V * Py) pixel indices, and boolean masks of the same
+            shapes marking the indices inside each keypoint's window.
+        """
+        patches = []
+        for axis, size in ((0, self._img_w), (1, self._img_h)):
+            start, end = self._windows(all_kps[..., axis],
+                                       all_kps[..., axis], size)
+            patch_size = max(int((end - start).max(initial=0)), 0)
+            pos = start[..., None] + np.arange(patch_size)
+            patches.append((pos, pos < end[..., None]))
+        (px, valid_x), (py, valid_y) = patches
+        return px, py, valid_x, valid_y
+
+    def generate_kp_heatmaps(self, ret: np.ndarray, all_kps: np.ndarray,
+                             all_kpscores: np.ndarray) -> None:
+        """Generate keypoint heatmaps for all frames in one broadcasted pass.
+
+        Bit-identical to calling :meth:`generate_a_heatmap` for every frame
+        and keypoint: the 3-sigma patches of all (person, frame, keypoint)
+        triples are evaluated at once with the same float32 operations per
+        pixel, then max-reduced into the heatmaps.
+
+        Args:
+            ret (np.ndarray): The array to store the generated heatmaps.
+                Shape: T * C * img_h * img_w, keypoints in the first V
+                channels.
+            all_kps (np.ndarray): The coordinates of keypoints.
+                Shape: M * T * V * 2.
+            all_kpscores (np.ndarray): The max values of each keypoint.
+                Shape: M * T * V.
+        """
+        num_person, num_frame, num_kp = all_kps.shape[:3]
+        self._img_h, self._img_w = ret.shape[-2:]
+        # ``patch * max_value`` multiplies a float32 array with a scalar of
+        # the score dtype; keep the resulting dtype of the loop
+        value_dtype = (np.ones(1, np.float32) *
+                       all_kpscores.dtype.type(1)).dtype
+        patch_area = int(np.ceil(6 * self.sigma) + 2)**2
+
+        for t0, t1 in self._frame_chunks(num_frame,
+                                         num_person * num_kp * patch_area):
+            kps = all_kps[:, t0:t1]
+            max_values = all_kpscores[:, t0:t1]
+            px, py, valid_x, valid_y = self._kp_patches(kps)
+            if not (px.shape[-1] and py.shape[-1]):
+                continue
+
+            # M, t, V, Py, Px
+            d2 = ((px.astype(np.float32) - kps[..., 0, None])**2)[..., None, :] + \
+                ((py.astype(np.float32) - kps[..., 1, None])**2)[..., :, None]
+            patch = np.exp(-d2 / 2 / self.sigma**2).astype(value_dtype)
+            patch *= max_values.astype(value_dtype)[..., None, None]
+
+            mask = valid_y[..., :, None] & valid_x[..., None, :]
+            mask &= ~(max_values < self.eps)[..., None, None]
+            patch = np.where(mask, patch, 0).astype(np.float32)
+
+            # Out-of-window pixels carry 0 and heatmaps are >= 0, so clipping
+            # their indices into the image leaves the target unchanged
+            frame_idx = np.arange(t0, t1)[None, :, None, None, None]
+            kp_idx = np.arange(num_kp)[None, None, :, None, None]
+            y_idx = np.minimum(py, self._img_h - 1)[..., :, None]
+            x_idx = np.minimum(px, self._img_w - 1)[..., None, :]
+            np.maximum.at(ret, (frame_idx, kp_idx, y_idx, x_idx), patch)
+
+    def generate_kp_heatmaps_torch(self, ret: torch.Tensor,
+                                   all_kps: np.ndarray,
+                                   all_kpscores: np.ndarray) -> None:
+        """Generate keypoint heatmaps for all frames directly into a tensor.
+
+        Same algorithm as :meth:`generate_kp_heatmaps` in float32 torch ops
+        on the tensor's device (CPU or GPU), scattered with an ``amax``
+        reduction.
+
+        Args:
+            ret (torch.Tensor): The tensor to store the generated heatmaps.
+                Shape: T * C * img_h * img_w, keypoints in the first V
+                channels.
+            all_kps (np.ndarray): The coordinates of keypoints.
+                Shape: M * T * V * 2.
+            all_kpscores (np.ndarray): The max values of each keypoint.
+                Shape: M * T * V.
+        """
+        num_person, num_frame, num_kp = all_kps.shape[:3]
+        self._img_h, self._img_w = ret.shape[-2:]
+        device = ret.device
+        patch_area = int(np.ceil(6 * self.sigma) + 2)**2
+        flat = ret.view(-1)
+
+        for t0, t1 in self._frame_chunks(num_frame,
+                                         num_person * num_kp * patch_area):
+            kps = all_kps[:, t0:t1]
+            px, py, valid_x, valid_y = self._kp_patches(kps)
+            if not (px.shape[-1] and py.shape[-1]):
+                continue
+            px, py, valid_x, valid_y = (
+                torch.from_numpy(a).to(device)
+                for a in (px, py, valid_x, valid_y))
+            mu = torch.from_numpy(np.ascontiguousarray(
+                kps, dtype=np.float32)).to(device)
+            max_values = torch.from_numpy(np.ascontiguousarray(
+                all_kpscores[:, t0:t1], dtype=np.float32)).to(device)
+
+            d2 = ((px.float() - mu[..., 0, None])**2)[..., None, :] + \
+                ((py.float() - mu[..., 1, None])**2)[..., :, None]
+            patch = torch.exp(-d2 / 2 / self.sigma**2)
+            patch *= max_values[..., None, None]
+
+            mask = valid_y[..., :, None] & valid_x[..., None, :]
+            mask &= ~(max_values < self.eps)[..., None, None]
+            patch = torch.where(mask, patch, torch.zeros_like(patch))
+
+            frame_idx = torch.arange(t0, t1, device=device)[None, :, None,
+                                                            None, None]
+            kp_idx = torch.arange(num_kp, device=device)[None, None, :, None,
+                                                         None]
+            y_idx = py.clamp(max=self._img_h - 1)[..., :, None]
+            x_idx = px.clamp(max=self._img_w - 1)[..., None, :]
+            index = ((frame_idx * ret.shape[1] + kp_idx) * self._img_h +
+                     y_idx) * self._img_w + x_idx
+            index = index.expand(patch.shape)
+            flat.scatter_reduce_(0, index.reshape(-1), patch.reshape(-1),
+                                 reduce='amax')
+
+    def gen_an_aug(self, results: Dict) -> Union[np.ndarray, torch.Tensor]:
         """Generate pseudo heatmaps for all frames.
 
         Args:
             results (dict): The dictionary that contains all info of a sample.
 
         Returns:
-            np.ndarray: The generated pseudo heatmaps.
+            np.ndarray | torch.Tensor: The generated pseudo heatmaps, a tensor
+            on ``device`` for the ``'torch'`` backend.
         """
 
         all_kps = results['keypoint'].astype(np.float32)
@@ -387,16 +581,139 @@ class GeneratePoseTarget(BaseTransform):
 
         ret = np.zeros([num_frame, num_c, img_h, img_w], dtype=np.float32)
 
-        for i in range(num_frame):
-            # M, V, C
-            kps = all_kps[:, i]
-            # M, C
-            kpscores = all_kpscores[:, i] if self.use_score else \
-                np.ones_like(all_kpscores[:, i])
+        if self.backend == 'loop':
+            for i in range(num_frame):
+                # M, V, C
+                kps = all_kps[:, i]
+                # M, C
+                kpscores = all_kpscores[:, i] if self.use_score else \
+                    np.ones_like(all_kpscores[:, i])
 
-            self.generate_heatmap(ret[i], kps, kpscores)
+                self.generate_heatmap(ret[i], kps, kpscores)
+            return ret
+
+        if not self.use_score:
+            all_kpscores = np.ones_like(all_kpscores)
+        if self.with_limb:
+            self.generate_limb_heatmaps(ret, all_kps, all_kpscores)
+
+        if self.backend == 'torch':
+            ret = torch.from_numpy(ret).to(self.device)
+            if self.with_kp:
+                self.generate_kp_heatmaps_torch(ret, all_kps, all_kpscores)
+        elif self.with_kp:
+            self.generate_kp_heatmaps(ret, all_kps, all_kpscores)
         return ret
 
+    @staticmethod
+    def _limb_lengths2(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """Squared limb lengths, computed like ``generate_a_limb_heatmap``.
+
+        The loop squares NumPy scalars, and scalar ``**`` (``powf``) is not
+        always correctly rounded like an array square, so the same scalar
+        arithmetic is applied per limb here.
+        """
+        d_x = (starts[..., 0] - ends[..., 0]).reshape(-1)
+        d_y = (starts[..., 1] - ends[..., 1]).reshape(-1)
+        # Iterating an array yields NumPy scalars (``tolist`` would give
+        # Python floats, i.e. float64 arithmetic)
+        d2_ab = [x**2 + y**2 for x, y in zip(d_x, d_y)]
+        return np.array(d2_ab, dtype=d_x.dtype).reshape(starts.shape[:-1])
+
+    def generate_limb_heatmaps(self, ret: np.ndarray, all_kps: np.ndarray,
+                               all_kpscores: np.ndarray) -> None:
+        """Generate limb heatmaps for all frames in one broadcasted pass.
+
+        Bit-identical to calling :meth:`generate_a_limb_heatmap` for every
+        frame and limb: the point-to-segment distance fields of all (person,
+        frame, limb) triples are evaluated at once over their bounding
+        windows, with the same per-pixel operations and dtypes (and the
+        loop's scalar arithmetic for the limb lengths, see
+        :meth:`_limb_lengths2`), then max-reduced into the heatmaps. Limbs shorter than one pixel are drawn
+        as the Gaussian of their start keypoint, like the loop.
+
+        Args:
+            ret (np.ndarray): The array to store the generated heatmaps.
+                Shape: T * C * img_h * img_w, limbs in the first L channels.
+            all_kps (np.ndarray): The coordinates of keypoints.
+                Shape: M * T * V * 2.
+            all_kpscores (np.ndarray): The max values of each keypoint.
+                Shape: M * T * V.
+        """
+        num_person, num_frame = all_kps.shape[:2]
+        num_limb = len(self.skeletons)
+        img_h, img_w = ret.shape[-2:]
+        start_idx, end_idx = (np.array(idx, dtype=np.int64)
+                              for idx in zip(*self.skeletons))
+
+        # M, T, L (* 2)
+        starts, ends = all_kps[:, :, start_idx], all_kps[:, :, end_idx]
+        start_values = all_kpscores[:, :, start_idx]
+        value_coeff = np.minimum(start_values, all_kpscores[:, :, end_idx])
+        active = ~(value_coeff < self.eps)
+        d2_ab = self._limb_lengths2(starts, ends)
+        short = d2_ab < 1
+
+        self.generate_kp_heatmaps(ret, starts, start_values * (active & short))
+
+        segment = active & ~short
+        x_start, x_end = self._windows(
+            np.minimum(starts[..., 0], ends[..., 0]),
+            np.maximum(starts[..., 0], ends[..., 0]), img_w)
+        y_start, y_end = self._windows(
+            np.minimum(starts[..., 1], ends[..., 1]),
+            np.maximum(starts[..., 1], ends[..., 1]), img_h)
+        widths = np.maximum(x_end - x_start, 0)
+        areas = np.where(segment, widths * np.maximum(y_end - y_start, 0), 0)
+
+        # ``exp(d2_seg) * value_coeff`` keeps the dtypes of the loop
+        patch_dtype = (np.ones(1, _LIMB_DIST_DTYPE) *
+                       all_kpscores.dtype.type(1)).dtype
+        value_coeff = value_coeff.astype(patch_dtype)
+        flat_ret = ret.reshape(-1)
+
+        # The windows of one person never overlap within a channel, so each
+        # person's pixels are max-reduced with a plain gather / scatter
+        for m in range(num_person):
+            # Limb windows are laid out back to back as one ragged pixel
+            # list (T * L limbs), split into chunks of ~max_chunk_size pixels
+            limb_ids = np.flatnonzero(areas[m])
+            limb_areas = areas[m].reshape(-1)[limb_ids]
+            chunk_of = (np.cumsum(limb_areas) - 1) // self.max_chunk_size
+            splits = np.flatnonzero(np.diff(chunk_of)) + 1
+            for ids, area in zip(np.split(limb_ids, splits),
+                                 np.split(limb_areas, splits)):
+                pixel_limb = np.repeat(ids, area)
+                offset = np.arange(pixel_limb.size) - np.repeat(
+                    np.cumsum(area) - area, area)
+                dy, dx = np.divmod(offset, widths[m].reshape(-1)[pixel_limb])
+                px = x_start[m].reshape(-1)[pixel_limb] + dx
+                py = y_start[m].reshape(-1)[pixel_limb] + dy
+
+                x = px.astype(np.float32)
+                y = py.astype(np.float32)
+                start_x, start_y, end_x, end_y, ab = (
+                    a[m].reshape(-1)[pixel_limb]
+                    for a in (starts[..., 0], starts[..., 1], ends[..., 0],
+                              ends[..., 1], d2_ab))
+
+                d2_start = (x - start_x)**2 + (y - start_y)**2
+                d2_end = (x - end_x)**2 + (y - end_y)**2
+                coeff = (d2_start - d2_end + ab) / 2. / ab
+                d2_line = (x - (start_x + coeff * (end_x - start_x)))**2 + \
+                    (y - (start_y + coeff * (end_y - start_y)))**2
+                d2_seg = np.where(coeff <= 0, d2_start,
+                                  np.where(coeff >= 1, d2_end, d2_line))
+
+                patch = np.exp(-d2_seg.astype(_LIMB_DIST_DTYPE) / 2. /
+                               self.sigma**2).astype(patch_dtype)
+                patch *= value_coeff[m].reshape(-1)[pixel_limb]
+
+                frame_idx, limb_idx = np.divmod(pixel_limb, num_limb)
+                index = ((frame_idx * ret.shape[1] + limb_idx) * img_h +
+                         py) * img_w + px
+                flat_ret[index] = np.maximum(flat_ret[index], patch)
+
     def transform(self, results: Dict) -> Dict:
         """Generate pseudo heatmaps based on joint coordinates and confidence.
 
@@ -414,8 +731,13 @@ class GeneratePoseTarget(BaseTransform):
             for l, r in zip(left, right):  # noqa: E741
                 indices[l] = r
                 indices[r] = l
-            heatmap_flip = heatmap[..., ::-1][:, indices]
-            heatmap = np.concatenate([heatmap, heatmap_flip])
+            if isinstance(heatmap, torch.Tensor):
+                indices = torch.from_numpy(indices).to(heatmap.device)
+                heatmap_flip = torch.flip(heatmap, dims=(-1, ))[:, indices]
+                heatmap = torch.cat([heatmap, heatmap_flip])
+            else:
+                heatmap_flip = heatmap[..., ::-1][:, indices]
+                heatmap = np.concatenate([heatmap, heatmap_flip])
         results[key] = heatmap
         return results
 
@@ -431,7 +753,8 @@ class GeneratePoseTarget(BaseTransform):
                     f'right_kp={self.right_kp}, '
                     f'left_limb={self.left_limb}, '
                     f'right_limb={self.right_limb}, '
-                    f'scaling={self.scaling})')
+                    f'scaling={self.scaling}, '
+                    f'backend={self.backend})')
         return repr_str
 
 
@@ -0,0 +1,43 @@
+"""
+CPU-side search index for the hybrid pose + CLIP image search.
+"""
+from search.ann import HybridANNSearcher, build_ann_indexes, load_ann_indexes, save_ann_indexes
+from search.index import SearchIndex, SearchIndexCache, get_search_index
+from search.portrait import load_clip_text_embeddings, portrait_margins, portrait_mask
+from search.query_cache import QueryEmbeddingCache, get_query_cache
+from search.quantize import CompressedSearcher, build_compressed, load_compressed, save_compressed
+from search.scoring import HybridScorer, normalize_rows, top_k
+from search.store import (
+    EmbeddingStore,
+    convert_embeddings_json,
+    load_embedding_store,
+)
+from search.thumbnails import THUMBNAIL_SIZES, build_thumbnails, resolve_image_path
+
+__all__ = [
+    "CompressedSearcher",
+    "EmbeddingStore",
+    "HybridANNSearcher",
+    "HybridScorer",
+    "QueryEmbeddingCache",
+    "SearchIndex",
+    "SearchIndexCache",
+    "THUMBNAIL_SIZES",
+    "build_ann_indexes",
+    "build_compressed",
+    "build_thumbnails",
+    "convert_embeddings_json",
+    "get_query_cache",
+    "get_search_index",
+    "load_ann_indexes",
+    "load_clip_text_embeddings",
+    "load_compressed",
+    "load_embedding_store",
+    "normalize_rows",
+    "portrait_margins",
+    "portrait_mask",
+    "resolve_image_path",
+    "save_ann_indexes",
+    "save_compressed",
+    "top_k",
+]
@@ -0,0 +1,393 @@
+"""
+Approximate nearest neighbour search for the hybrid pose + CLIP score.
+
+Each modality gets its own IVF-flat index over the normalized embeddings
+(inner product == cosine). A hybrid query retrieves candidates from the pose
+index and the CLIP index, takes the union and reranks it exactly with the
+lambda formula, so scores of returned images are identical to brute force;
+only recall is approximate. `nprobe` (inverted lists scanned per modality) and
+`candidates` (rows kept per modality before the rerank) trade recall for latency.
+
+Backends:
+    numpy - pure NumPy IVF with spherical k-means, always available
+    faiss - faiss.IndexIVFFlat, used when faiss is installed
+
+Index files live next to the embedding store:
+    ann.json            - backend, parameters and the store manifest hash
+    ann_pose.npz/.faiss - pose index
+    ann_clip.npz/.faiss - CLIP index
+
+Build from the backend directory:
+    python -m search.build_ann --store data/embedding_store
+"""
+import json
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from search.scoring import HybridScorer, top_k
+from search.store import MANIFEST_NAME, _write_json, file_content_hash
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+ANN_MANIFEST_NAME = "ann.json"
+ANN_VERSION = 1
+MODALITIES = ("pose", "clip")
+
+# Rows scored per chunk during k-means assignment, bounds the (chunk, n_lists) temp
+_ASSIGN_CHUNK = 32768
+
+
+def default_n_lists(n: int) -> int:
+    """Number of inverted lists for n vectors (~4 * sqrt(n), the usual IVF rule)."""
+    return int(max(1, min(n, round(4 * np.sqrt(n)))))
+
+
+class IVFFlatIndex:
+    """
+    Pure NumPy inverted-file index over unit vectors.
+
+    Vectors are not copied: the index only keeps centroids and the row ids of
+    each list, and search() gathers rows from the matrix it is given.
+
+    Attributes:
+        centroids: (n_lists, D) unit-norm centroids
+        offsets: (n_lists + 1,) start of each list in list_ids
+        list_ids: (N,) row ids grouped by list
+    """
+
+    backend = "numpy"
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, list_ids: np.ndarray):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.list_ids = list_ids
+
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        n_lists: Optional[int] = None,
+        n_iter: int = 20,
+        max_train: int = 256,
+        seed: int = 0,
+    ) -> "IVFFlatIndex":
+        """
+        Train centroids with spherical k-means and assign every row to a list.
+
+        Args:
+            vectors: (N, D) unit-norm float32 vectors
+            n_lists: Number of inverted lists (default: default_n_lists(N))
+            n_iter: k-means iterations
+            max_train: Training sample size per list (caps k-means cost)
+            seed: Random seed
+
+        Returns:
+            Trained IVFFlatIndex
+        """
+        n = vectors.shape[0]
+        n_lists = min(n_lists or default_n_lists(n), n)
+        rng = np.random.default_rng(seed)
+
+        train = vectors
+        if n > n_lists * max_train:
+            train = vectors[np.sort(rng.choice(n, n_lists * max_train, replace=False))]
+        train = np.ascontiguousarray(train, dtype=np.float32)
+
+        centroids = train[rng.choice(train.shape[0], n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = _assign(train, centroids)
+            counts = np.bincount(assign, minlength=n_lists)
+
+            # Per-list sums via one sort + reduceat (np.add.at is far slower)
+            order = np.argsort(assign, kind="stable")
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            nonempty = np.flatnonzero(counts)
+            sums = np.zeros_like(centroids)
+            sums[nonempty] = np.add.reduceat(train[order], starts[nonempty], axis=0)
+
+            # Re-seed empty lists from random training points
+            empty = np.flatnonzero(counts == 0)
+            if empty.size:
+                sums[empty] = train[rng.choice(train.shape[0], empty.size, replace=False)]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.divide(sums, norms, out=np.zeros_like(sums), where=norms > 0)
+
+        assign = _assign(vectors, centroids)
+        list_ids = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=n_lists), out=offsets[1:])
+        return cls(centroids, offsets, list_ids)
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        nprobe: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k rows of `vectors` by inner product with `query`.
+
+        Args:
+            vectors: (N, D) matrix the index was built over
+            query: (D,) query vector
+            k: Number of rows to return
+            nprobe: Number of inverted lists to scan
+
+        Returns:
+            (ids, scores) best first
+        """
+        nprobe = max(1, min(nprobe, self.n_lists))
+        probe, _ = top_k(self.centroids @ query, nprobe)
+        ids = np.concatenate([
+            self.list_ids[self.offsets[i]:self.offsets[i + 1]] for i in probe
+        ])
+        if ids.size == 0:
+            return ids, np.empty(0, dtype=np.float32)
+
+        order, scores = top_k(vectors[ids] @ query, k)
+        return ids[order], scores
+
+    def save(self, path: Path) -> Path:
+        path = Path(path).with_suffix(".npz")
+        np.savez(path, centroids=self.centroids, offsets=self.offsets, list_ids=self.list_ids)
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFFlatIndex":
+        with np.load(Path(path).with_suffix(".npz")) as data:
+            return cls(data["centroids"], data["offsets"], data["list_ids"])
+
+
+class FaissIVFIndex:
+    """faiss.IndexIVFFlat (inner product) behind the IVFFlatIndex interface."""
+
+    backend = "faiss"
+
+    def __init__(self, index):
+        self.index = index
+
+    @property
+    def n_lists(self) -> int:
+        return self.index.nlist
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        n_lists: Optional[int] = None,
+        n_iter: int = 20,
+        max_train: int = 256,
+        seed: int = 0,
+    ) -> "FaissIVFIndex":
+        if faiss is None:
+            raise ImportError("faiss is not installed")
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n, dim = vectors.shape
+        n_lists = min(n_lists or default_n_lists(n), n)
+
+        # index_factory owns its quantizer, unlike IndexIVFFlat(IndexFlatIP(...), ...)
+        index = faiss.index_factory(dim, f"IVF{n_lists},Flat", faiss.METRIC_INNER_PRODUCT)
+        index.cp.niter = n_iter
+        index.cp.seed = seed
+        index.cp.max_points_per_centroid = max_train
+        index.train(vectors)
+        index.add(vectors)
+        return cls(index)
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        nprobe: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        self.index.nprobe = max(1, min(nprobe, self.n_lists))
+        scores, ids = self.index.search(query.reshape(1, -1).astype(np.float32), k)
+        valid = ids[0] >= 0
+        return ids[0][valid].astype(np.int64), scores[0][valid]
+
+    def save(self, path: Path) -> Path:
+        path = Path(path).with_suffix(".faiss")
+        faiss.write_index(self.index, str(path))
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "FaissIVFIndex":
+        if faiss is None:
+            raise ImportError("faiss is not installed")
+        return cls(faiss.read_index(str(Path(path).with_suffix(".faiss"))))
+
+
+BACKENDS = {"numpy": IVFFlatIndex, "faiss": FaissIVFIndex}
+
+
+def resolve_backend(backend: str = "auto") -> str:
+    """Map "auto" to faiss when installed, else numpy."""
+    if backend == "auto":
+        return "faiss" if faiss is not None else "numpy"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ANN backend {backend!r}, expected one of {list(BACKENDS)}")
+    return backend
+
+
+class HybridANNSearcher:
+    """
+    Candidate retrieval per modality + exact lambda rerank.
+
+    Args:
+        scorer: HybridScorer holding the normalized corpus matrices
+        indexes: {"pose": index, "clip": index}, built over scorer.pose / scorer.clip
+        nprobe: Default inverted lists scanned per modality
+        candidates: Default rows retrieved per modality (at least k)
+    """
+
+    def __init__(
+        self,
+        scorer: HybridScorer,
+        indexes: Dict[str, object],
+        nprobe: int = 16,
+        candidates: int = 256,
+    ):
+        self.scorer = scorer
+        self.indexes = indexes
+        self.nprobe = nprobe
+        self.candidates = candidates
+
+    def search(
+        self,
+        pose_query: np.ndarray,
+        clip_query: np.ndarray,
+        lambda_param: float,
+        k: int,
+        mask: Optional[np.ndarray] = None,
+        nprobe: Optional[int] = None,
+        candidates: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k by hybrid score; returned scores are exact.
+
+        Falls back to brute force when the mask leaves fewer than k candidates.
+
+        Returns:
+            (indices, scores) best first
+        """
+        nprobe = nprobe or self.nprobe
+        n_candidates = max(int(k), candidates or self.candidates)
+        query = self.scorer.query_vector(pose_query, clip_query, lambda_param)
+        pose_dim = self.scorer.pose_dim
+
+        # A modality with zero weight can't change the ranking, skip its lookup
+        found = []
+        if lambda_param > 0:
+            ids, _ = self.indexes["pose"].search(
+                self.scorer.pose, query[:pose_dim], n_candidates, nprobe)
+            found.append(ids)
+        if lambda_param < 1:
+            ids, _ = self.indexes["clip"].search(
+                self.scorer.clip, query[pose_dim:], n_candidates, nprobe)
+            found.append(ids)
+
+        ids = np.unique(np.concatenate(found))
+        if mask is not None:
+            ids = ids[mask[ids]]
+        if ids.size < min(int(k), len(self.scorer) if mask is None else int(mask.sum())):
+            return self.scorer.search(pose_query, clip_query, lambda_param, k, mask=mask)
+
+        order, scores = top_k(self.scorer.matrix[ids] @ query, k)
+        return ids[order], scores
+
+
+def build_ann_indexes(
+    scorer: HybridScorer,
+    backend: str = "auto",
+    n_lists: Optional[int] = None,
+    n_iter: int = 20,
+    seed: int = 0,
+) -> Dict[str, object]:
+    """Build one IVF index per modality over the scorer's normalized matrices."""
+    index_cls = BACKENDS[resolve_backend(backend)]
+    return {
+        "pose": index_cls.build(scorer.pose, n_lists=n_lists, n_iter=n_iter, seed=seed),
+        "clip": index_cls.build(scorer.clip, n_lists=n_lists, n_iter=n_iter, seed=seed),
+    }
+
+
+def save_ann_indexes(root: Path, indexes: Dict[str, object], params: Dict) -> Path:
+    """
+    Persist per-modality indexes next to the store, tagged with the manifest hash.
+
+    Returns:
+        Path to ann.json
+    """
+    root = Path(root)
+    files = {}
+    for modality in MODALITIES:
+        files[modality] = indexes[modality].save(root / f"ann_{modality}").name
+
+    manifest = {
+        "version": ANN_VERSION,
+        "backend": indexes["pose"].backend,
+        "store_hash": file_content_hash(root / MANIFEST_NAME),
+        "files": files,
+        "params": params,
+        "created_at": time.time(),
+    }
+    manifest_path = root / ANN_MANIFEST_NAME
+    _write_json(manifest_path, manifest, indent=2)
+    return manifest_path
+
+
+def load_ann_indexes(root: Path, store_hash: Optional[str] = None) -> Optional[Dict[str, object]]:
+    """
+    Load persisted indexes for a store directory.
+
+    Args:
+        root: Store directory
+        store_hash: Expected store manifest hash; indexes built for another
+            version of the store are ignored
+
+    Returns:
+        {"pose": index, "clip": index}, or None if missing, stale or unloadable
+    """
+    manifest_path = Path(root) / ANN_MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+
+    if manifest.get("version") != ANN_VERSION:
+        print(f"Warning: Ignoring ANN index with version {manifest.get('version')}")
+        return None
+    if store_hash is not None and manifest.get("store_hash") != store_hash:
+        print("Warning: ANN index is stale (store changed), rebuild with `python -m search.build_ann`")
+        return None
+
+    index_cls = BACKENDS.get(manifest.get("backend"))
+    try:
+        return {m: index_cls.load(Path(root) / manifest["files"][m]) for m in MODALITIES}
+    except Exception as e:
+        print(f"Warning: Failed to load ANN index: {e}")
+        return None
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (max inner product) of every row, in bounded chunks."""
+    assign = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], _ASSIGN_CHUNK):
+        chunk = np.asarray(vectors[start:start + _ASSIGN_CHUNK], dtype=np.float32)
+        assign[start:start + _ASSIGN_CHUNK] = np.argmax(chunk @ centroids.T, axis=1)
+    return assign
@@ -0,0 +1,44 @@
+"""
+Build the ANN indexes (see search.ann) for an embedding store.
+
+Run from the backend directory:
+    python -m search.build_ann
+    python -m search.build_ann --store data/embedding_store --backend numpy --lists 1024
+"""
+import argparse
+import time
+from pathlib import Path
+
+from search.ann import BACKENDS, build_ann_indexes, resolve_backend, save_ann_indexes
+from search.scoring import HybridScorer
+from search.store import load_embedding_store
+
+
+def main():
+    backend_dir = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description="Build ANN indexes for an embedding store")
+    parser.add_argument("--store", type=Path, default=backend_dir / "data" / "embedding_store")
+    parser.add_argument("--backend", choices=["auto", *BACKENDS], default="auto")
+    parser.add_argument("--lists", type=int, default=None,
+                        help="Inverted lists per modality (default: ~4*sqrt(N))")
+    parser.add_argument("--iters", type=int, default=20, help="k-means iterations")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    store = load_embedding_store(args.store)
+    scorer = HybridScorer.from_store(store)
+    backend = resolve_backend(args.backend)
+    print(f"Building {backend} IVF indexes for {len(store)} images...")
+
+    start_time = time.time()
+    indexes = build_ann_indexes(scorer, backend, args.lists, args.iters, args.seed)
+    elapsed = time.time() - start_time
+
+    params = {"n_lists": indexes["pose"].n_lists, "n_iter": args.iters, "seed": args.seed}
+    manifest_path = save_ann_indexes(args.store, indexes, params)
+    print(f"Done in {elapsed:.2f}s ({params['n_lists']} lists per modality)")
+    print(f"  Saved to: {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
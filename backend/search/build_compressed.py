@@ -0,0 +1,51 @@
+"""
+Build compressed first-pass codes (see search.quantize) for an embedding store.
+
+Run from the backend directory:
+    python -m search.build_compressed --pca 128 --codec int8
+    python -m search.build_compressed --pca 256 --codec pq --subspaces 32
+"""
+import argparse
+import time
+from pathlib import Path
+
+from search.quantize import CODECS, build_compressed, save_compressed
+from search.store import load_embedding_store
+
+
+def main():
+    backend_dir = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description="Build compressed codes for an embedding store")
+    parser.add_argument("--store", type=Path, default=backend_dir / "data" / "embedding_store")
+    parser.add_argument("--codec", choices=CODECS, default="int8")
+    parser.add_argument("--pca", type=int, default=None,
+                        help="PCA dimensions per modality (default: no projection)")
+    parser.add_argument("--subspaces", type=int, default=16,
+                        help="PQ sub-spaces (bytes per vector) when --codec pq")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    store = load_embedding_store(args.store)
+    print(f"Compressing {len(store)} images ({args.codec}, pca={args.pca})...")
+
+    start_time = time.time()
+    pose, clip = build_compressed(store, args.codec, args.pca, args.subspaces, args.seed)
+    elapsed = time.time() - start_time
+
+    params = {"codec": args.codec, "pca_dims": args.pca, "n_subspaces": args.subspaces,
+              "seed": args.seed}
+    manifest_path = save_compressed(args.store, pose, clip, params)
+
+    full_bytes = store.pose.nbytes + store.clip.nbytes
+    compressed_bytes = pose.nbytes + clip.nbytes
+    print(f"Done in {elapsed:.2f}s")
+    print(f"  Full precision: {full_bytes / (1024 * 1024):.2f} MB")
+    print(f"  Compressed: {compressed_bytes / (1024 * 1024):.2f} MB "
+          f"({full_bytes / max(compressed_bytes, 1):.1f}x smaller)")
+    if pose.pca is not None:
+        print(f"  PCA energy kept: pose {pose.pca.explained:.3f}, clip {clip.pca.explained:.3f}")
+    print(f"  Saved to: {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Build thumbnail tiers (see search.thumbnails) for data/downloaded_pins.
+
+Run from the backend directory:
+    python -m search.build_thumbnails
+    python -m search.build_thumbnails --workers 8 --force
+"""
+import argparse
+import time
+from pathlib import Path
+
+from search.thumbnails import THUMBNAIL_SIZES, build_thumbnails, thumbnails_dir
+
+
+def main():
+    backend_dir = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description="Build search result thumbnails")
+    parser.add_argument("--data", type=Path, default=backend_dir / "data",
+                        help="Data directory holding downloaded_pins/")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Rebuild up-to-date thumbnails")
+    args = parser.parse_args()
+
+    print(f"Building thumbnails {THUMBNAIL_SIZES} into {thumbnails_dir(args.data)}...")
+    start_time = time.time()
+    counts = build_thumbnails(args.data, workers=args.workers, force=args.force)
+    elapsed = time.time() - start_time
+
+    print(f"Done in {elapsed:.2f}s")
+    print(f"  Images: {counts['total']}")
+    print(f"  Built: {counts['built']}")
+    print(f"  Up to date: {counts['skipped']}")
+    print(f"  Failed: {counts['failed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Convert data/embeddings.json into the binary embedding store.
+
+Run from the backend directory:
+    python -m search.convert
+    python -m search.convert --input data/embeddings.json --output data/embedding_store
+"""
+import argparse
+import time
+from pathlib import Path
+
+from search.portrait import load_clip_text_embeddings
+from search.store import convert_embeddings_json
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path,
+                        default=BACKEND_DIR / "data" / "embeddings.json",
+                        help="Legacy embeddings.json file")
+    parser.add_argument("--output", type=Path,
+                        default=BACKEND_DIR / "data" / "embedding_store",
+                        help="Output store directory")
+    parser.add_argument("--text-embeddings", type=Path,
+                        default=BACKEND_DIR / "clip_text_embeddings.json",
+                        help="CLIP keyword embeddings for the portrait_margin column")
+    args = parser.parse_args()
+
+    text_embeddings = None
+    if args.text_embeddings.exists():
+        text_embeddings = load_clip_text_embeddings(args.text_embeddings)
+    else:
+        print(f"Warning: {args.text_embeddings} not found, skipping portrait margins")
+
+    print(f"Converting {args.input} -> {args.output}")
+    start_time = time.time()
+    store = convert_embeddings_json(args.input, args.output, text_embeddings)
+    elapsed = time.time() - start_time
+
+    print(f"Done in {elapsed:.2f}s")
+    print(f"  Images: {len(store)}")
+    print(f"  Pose embedding dimension: {store.pose_dim}")
+    print(f"  CLIP embedding dimension: {store.clip_dim}")
+    print(f"  Portrait margins: {'yes' if store.portrait_margin is not None else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Container-resident search index.
+
+Building the index (opening the store and normalizing the matrices) happens once
+per container. Later requests reuse it and only stat the backing file; the index
+is rebuilt when that file's mtime/size changes *and* its content hash differs.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from search.ann import ANN_MANIFEST_NAME, HybridANNSearcher, load_ann_indexes
+from search.portrait import load_clip_text_embeddings, portrait_margins, portrait_mask
+from search.quantize import COMPRESSED_MANIFEST_NAME, CompressedSearcher, load_compressed
+from search.scoring import HybridScorer
+from search.store import (
+    MANIFEST_NAME,
+    POSE_PIPELINE,
+    EmbeddingStore,
+    file_content_hash,
+    load_embedding_store,
+)
+
+STORE_DIR_NAME = "embedding_store"
+LEGACY_JSON_NAME = "embeddings.json"
+
+
+def resolve_index_source(data_dir: Path) -> Path:
+    """
+    Pick the file that backs the index: the store manifest, else embeddings.json.
+
+    Raises:
+        FileNotFoundError: If neither exists
+    """
+    manifest_path = data_dir / STORE_DIR_NAME / MANIFEST_NAME
+    if manifest_path.exists():
+        return manifest_path
+
+    json_path = data_dir / LEGACY_JSON_NAME
+    if json_path.exists():
+        return json_path
+
+    raise FileNotFoundError(
+        f"No embeddings found: expected {manifest_path} or {json_path}")
+
+
+def load_embedding_index(data_dir: Path) -> EmbeddingStore:
+    """
+    Load the corpus embeddings, preferring the binary store over embeddings.json.
+
+    Args:
+        data_dir: Data directory containing embedding_store/ and/or embeddings.json
+
+    Returns:
+        EmbeddingStore (memory-mapped when loaded from the binary store)
+
+    Raises:
+        FileNotFoundError: If neither the store nor the JSON file exists
+        ValueError: If the store or JSON structure is invalid
+    """
+    source = resolve_index_source(data_dir)
+    if source.name == MANIFEST_NAME:
+        return load_embedding_store(source.parent)
+
+    # Legacy fallback until data/embeddings.json has been converted
+    # (python -m search.convert)
+    print(f"Embedding store not found in {data_dir / STORE_DIR_NAME}, falling back to {source.name}")
+    return EmbeddingStore.from_json(source)
+
+
+def _stat_key(path: Path) -> Tuple[str, int, int]:
+    stat = os.stat(path)
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+def _sidecar_keys(source: Path) -> Tuple[Optional[Tuple[str, int, int]], ...]:
+    """
+    Stat keys of the ANN and compressed-code manifests next to a store
+    (None for a missing one). They are written after the store, without
+    touching its manifest.
+    """
+    if source.name != MANIFEST_NAME:
+        return ()
+    keys = []
+    for name in (ANN_MANIFEST_NAME, COMPRESSED_MANIFEST_NAME):
+        try:
+            keys.append(_stat_key(source.parent / name))
+        except FileNotFoundError:
+            keys.append(None)
+    return tuple(keys)
+
+
+class SearchIndex:
+    """
+    Everything a query needs, built once from an EmbeddingStore.
+
+    Attributes:
+        store: The backing embedding store (paths, raw matrices, metadata)
+        scorer: HybridScorer over the normalized matrices; None when compressed
+            codes are used (built lazily for exact searches)
+        compressed: CompressedSearcher if compressed codes exist for this store
+        source: File the index was built from
+        content_hash: SHA-256 of source at build time
+        portrait_margin: (N,) portrait margins, or None if unavailable
+        ann: HybridANNSearcher if ANN indexes were built for this store, else None
+        build_seconds: Wall time spent building the in-memory search structures
+    """
+
+    def __init__(
+        self,
+        store: EmbeddingStore,
+        source: Path,
+        content_hash: str,
+        text_embeddings: Optional[Dict[str, np.ndarray]] = None,
+    ):
+        start_time = time.perf_counter()
+        self.store = store
+        self.source = source
+        self.content_hash = content_hash
+        self._scorer_lock = threading.Lock()
+
+        # Query poses come from POSE_PIPELINE; a corpus from another pipeline
+        # still searches, but its pose scores are skewed until re-ingested
+        pose_pipeline = store.metadata.get("pose_pipeline")
+        if pose_pipeline != POSE_PIPELINE:
+            print(f"Warning: pose embeddings in {source} were built with pose pipeline "
+                  f"{pose_pipeline or 'unknown (SAM 3D Body full mode)'}, queries use "
+                  f"{POSE_PIPELINE}; re-run pinterest/generate_embeddings.py to re-embed them")
+
+        # Compressed codes replace the full-precision in-memory matrices; the
+        # store's mmap'd vectors are then only read for rerank candidates
+        compressed = None
+        if store.root is not None:
+            compressed = load_compressed(store.root, store_hash=content_hash)
+        if compressed is not None:
+            self.compressed = CompressedSearcher(store, *compressed)
+            self.scorer = None
+        else:
+            self.compressed = None
+            self.scorer = HybridScorer.from_store(store)
+
+        # Prefer the margins stored at ingestion; otherwise classify the whole
+        # corpus once here rather than per request
+        if store.portrait_margin is not None:
+            self.portrait_margin = np.asarray(store.portrait_margin, dtype=np.float32)
+        elif text_embeddings is not None:
+            clip = self.scorer.clip if self.scorer is not None else store.clip
+            self.portrait_margin = portrait_margins(clip, text_embeddings)
+        else:
+            self.portrait_margin = None
+
+        self.ann = None
+        if store.root is not None and self.scorer is not None:
+            indexes = load_ann_indexes(store.root, store_hash=content_hash)
+            if indexes is not None:
+                self.ann = HybridANNSearcher(self.scorer, indexes)
+        self.build_seconds = time.perf_counter() - start_time
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    @property
+    def paths(self):
+        return self.store.paths
+
+    @property
+    def mode(self) -> str:
+        """Default search path: "compressed", "ann" or "exact"."""
+        if self.compressed is not None:
+            return "compressed"
+        return "ann" if self.ann is not None else "exact"
+
+    def portrait_mask(self, threshold: float = 0.0) -> Optional[np.ndarray]:
+        """
+        (N,) boolean mask of non-portrait images, or None if margins are unavailable.
+        """
+        if self.portrait_margin is None:
+            return None
+        return portrait_mask(self.portrait_margin, threshold)
+
+    def search(
+        self,
+        pose_query: np.ndarray,
+        clip_query: np.ndarray,
+        lambda_param: float,
+        k: int,
+        mask: Optional[np.ndarray] = None,
+        exact: bool = False,
+        nprobe: Optional[int] = None,
+        rerank: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k (indices, scores) for a query.
+
+        Uses the compressed codes or the ANN indexes when they exist, unless
+        `exact` is set; `nprobe` overrides the number of inverted lists scanned
+        per modality and `rerank` the number of compressed-score candidates
+        reranked exactly. See HybridScorer.search, HybridANNSearcher.search and
+        CompressedSearcher.search.
+        """
+        if not exact:
+            if self.compressed is not None:
+                return self.compressed.search(pose_query, clip_query, lambda_param, k,
+                                              mask=mask, rerank=rerank)
+            if self.ann is not None:
+                return self.ann.search(pose_query, clip_query, lambda_param, k,
+                                       mask=mask, nprobe=nprobe)
+
+        if self.scorer is None:
+            # Concurrent exact searches build the scorer once
+            with self._scorer_lock:
+                if self.scorer is None:
+                    print("Building full-precision scorer for exact search...")
+                    self.scorer = HybridScorer.from_store(self.store)
+        return self.scorer.search(pose_query, clip_query, lambda_param, k, mask=mask)
+
+
+class SearchIndexCache:
+    """
+    Holds one SearchIndex per data directory and rebuilds it when the data changes.
+
+    The backing file is stat'ed at most once every `check_interval` seconds. A
+    changed mtime/size triggers a content hash; the index is rebuilt only if the
+    hash differs from the one it was built from. The ANN and compressed-code
+    manifests are stat'ed too: adding, replacing or removing one rebuilds the
+    index so the new search path is picked up.
+
+    Args:
+        data_dir: Data directory holding embedding_store/ or embeddings.json
+        check_interval: Minimum seconds between change checks
+        before_check: Optional hook run before each change check, e.g. a
+            Modal volume reload. Failures are logged and ignored.
+        text_embeddings_path: Optional clip_text_embeddings.json, used to compute
+            portrait margins at build time when the store doesn't have them
+    """
+
+    def __init__(
+        self,
+        data_dir: Path,
+        check_interval: float = 10.0,
+        before_check: Optional[Callable[[], None]] = None,
+        text_embeddings_path: Optional[Path] = None,
+    ):
+        self.data_dir = Path(data_dir)
+        self.check_interval = check_interval
+        self.before_check = before_check
+        self.text_embeddings_path = text_embeddings_path
+        self._index: Optional[SearchIndex] = None
+        self._stat_key: Optional[Tuple[str, int, int]] = None
+        self._sidecar_keys: Tuple[Optional[Tuple[str, int, int]], ...] = ()
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def get(self) -> SearchIndex:
+        """
+        Return the current index, building or rebuilding it if needed.
+
+        Raises:
+            FileNotFoundError: If no embeddings exist in data_dir
+            ValueError: If the embeddings are invalid
+        """
+        now = time.monotonic()
+        index = self._index
+        if index is not None and now - self._last_check < self.check_interval:
+            return index
+
+        with self._lock:
+            if self._index is not None and now - self._last_check < self.check_interval:
+                return self._index
+            self._refresh()
+            self._last_check = time.monotonic()
+            return self._index
+
+    def invalidate(self) -> None:
+        """Force a change check on the next get()."""
+        self._last_check = 0.0
+
+    def _refresh(self) -> None:
+        if self.before_check is not None and self._index is not None:
+            try:
+                self.before_check()
+            except Exception as e:
+                print(f"Warning: pre-check hook failed, using current view of {self.data_dir}: {e}")
+
+        source = resolve_index_source(self.data_dir)
+        stat_key = _stat_key(source)
+        sidecar_keys = _sidecar_keys(source)
+        sidecars_unchanged = sidecar_keys == self._sidecar_keys
+        if self._index is not None and stat_key == self._stat_key and sidecars_unchanged:
+            return
+
+        content_hash = file_content_hash(source)
+        if (self._index is not None and content_hash == self._index.content_hash
+                and sidecars_unchanged):
+            # Touched but unchanged: remember the new mtime, keep the index
+            self._stat_key = stat_key
+            return
+
+        print(f"Building search index from {source}...")
+        store = load_embedding_index(self.data_dir)
+        text_embeddings = None
+        if store.portrait_margin is None and self.text_embeddings_path is not None:
+            try:
+                text_embeddings = load_clip_text_embeddings(self.text_embeddings_path)
+            except Exception as e:
+                print(f"Warning: Failed to load text embeddings for portrait filtering: {e}")
+        self._index = SearchIndex(store, source, content_hash, text_embeddings)
+        self._stat_key = stat_key
+        self._sidecar_keys = sidecar_keys
+        self.builds += 1
+        print(f"Search index ready: {len(self._index)} images "
+              f"({self._index.build_seconds * 1000:.1f} ms, "
+              f"{self._index.mode} search)")
+
+
+_INDEX_CACHES: Dict[Path, SearchIndexCache] = {}
+_INDEX_CACHES_LOCK = threading.Lock()
+
+
+def get_search_index(
+    data_dir: Path,
+    check_interval: float = 10.0,
+    before_check: Optional[Callable[[], None]] = None,
+    text_embeddings_path: Optional[Path] = None,
+) -> SearchIndex:
+    """
+    Module-level singleton access to the warm index for a data directory.
+
+    The first call in a container builds the index; later calls return the same
+    object until the backing file changes. See SearchIndexCache for arguments.
+    """
+    data_dir = Path(data_dir).resolve()
+    with _INDEX_CACHES_LOCK:
+        cache = _INDEX_CACHES.get(data_dir)
+        if cache is None:
+            cache = SearchIndexCache(data_dir, check_interval, before_check,
+                                     text_embeddings_path)
+            _INDEX_CACHES[data_dir] = cache
+    return cache.get()
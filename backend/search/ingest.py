@@ -0,0 +1,83 @@
+"""
+Batched pose + CLIP image embeddings for corpus ingestion.
+
+A batch of images goes through the pose chain as two batched calls:
+SAM3DBodyInference.predict_2d_poses runs the person crops of all images
+through shared forward passes, then PoseEmbedding.extract_embeddings_batch
+embeds every detected pose. One Clip.encode_images_batch call is spawned
+first and runs alongside. Throughput then scales with the batch size instead
+of paying one round trip and one forward pass per image.
+
+Like search.query, the model arguments only need Modal's method interface, so
+the same code runs against the deployed classes or the stand-ins in
+search.local_models.
+"""
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from search.query import _cancel
+
+NO_PERSON_ERROR = "No person detected"
+
+
+def extract_image_embeddings(
+    images: Sequence[np.ndarray],
+    pose_model: Any,
+    pose_embedder: Any,
+    clip_model: Any,
+    use_bbox_detector: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Compute the pose and CLIP image embeddings of a batch of images.
+
+    Args:
+        images: Decoded RGB images (H, W, 3)
+        pose_model: SAM3DBodyInference (or stand-in) instance
+        pose_embedder: PoseEmbedding (or stand-in) instance
+        clip_model: Clip (or stand-in) instance
+        use_bbox_detector: As in SAM3DBodyInference.predict_2d_pose
+
+    Returns:
+        One dict per image with "pose_embedding" and "clip_embedding" arrays,
+        or both None and "error" set to NO_PERSON_ERROR
+
+    Raises:
+        Exception: A failed model call fails the whole batch
+    """
+    images = list(images)
+    if not images:
+        return []
+
+    # Start the independent CLIP call before the (longer) pose chain
+    clip_call = clip_model.encode_images_batch.spawn(images=images, normalize=False)
+    try:
+        pose_dicts = pose_model.predict_2d_poses.remote(
+            images=images,
+            use_bbox_detector=use_bbox_detector,
+        )
+        found = [idx for idx, pose_dict in enumerate(pose_dicts) if pose_dict]
+        pose_embeddings = {}
+        if found:
+            embeddings = pose_embedder.extract_embeddings_batch.remote(
+                pose_dicts=[pose_dicts[idx] for idx in found],
+                img_shapes=[images[idx].shape[:2] for idx in found],
+            )
+            pose_embeddings = dict(zip(found, embeddings))
+    except BaseException:
+        _cancel(clip_call)
+        raise
+    clip_embeddings = clip_call.get()
+
+    results = []
+    for idx in range(len(images)):
+        if idx in pose_embeddings:
+            results.append({
+                "pose_embedding": pose_embeddings[idx],
+                "clip_embedding": clip_embeddings[idx],
+                "error": None,
+            })
+        else:
+            results.append({"pose_embedding": None, "clip_embedding": None,
+                            "error": NO_PERSON_ERROR})
+    return results
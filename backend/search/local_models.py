@@ -0,0 +1,161 @@
+"""
+CPU stand-ins for the remote model classes, for offline tests and benchmarks.
+
+Each stand-in exposes its methods through the same interface as a Modal
+method (`.remote()`, `.local()`, `.spawn()` -> handle with `.get()` and
+`.cancel()`), sleeps for a configurable latency to mimic the GPU round trip,
+and returns deterministic embeddings derived from its inputs.
+"""
+import hashlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+EMBEDDING_DIM = 512
+
+# Shared pool backing .spawn(), like Modal running calls in other containers
+_SPAWN_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="local-spawn")
+
+
+class LocalFunctionCall:
+    """Handle returned by LocalMethod.spawn(), mirroring modal.FunctionCall."""
+
+    def __init__(self, future: Future):
+        self._future = future
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        return self._future.result(timeout)
+
+    def cancel(self) -> None:
+        self._future.cancel()
+
+
+class LocalMethod:
+    """A plain callable exposed with Modal's method call interface."""
+
+    def __init__(self, fn: Callable[..., Any]):
+        self._fn = fn
+
+    def remote(self, *args, **kwargs) -> Any:
+        return self._fn(*args, **kwargs)
+
+    local = remote
+
+    def spawn(self, *args, **kwargs) -> LocalFunctionCall:
+        return LocalFunctionCall(_SPAWN_POOL.submit(self._fn, *args, **kwargs))
+
+
+def _seeded_vector(*parts: Any) -> np.ndarray:
+    digest = hashlib.sha256(repr(parts).encode("utf-8")).digest()
+    rng = np.random.default_rng(int.from_bytes(digest[:8], "little"))
+    return rng.normal(size=EMBEDDING_DIM).astype(np.float32)
+
+
+class _LocalModel:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self) -> None:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class LocalSAM3DBody(_LocalModel):
+    """Stand-in for pose.inference.SAM3DBodyInference.
+
+    A call costs latency plus per_image_latency for each image, like a batched
+    forward pass with a fixed launch overhead.
+    """
+
+    def __init__(self, latency: float = 0.0, detect_person: bool = True,
+                 per_image_latency: float = 0.0):
+        super().__init__(latency)
+        self.detect_person = detect_person
+        self.per_image_latency = per_image_latency
+        self.predict_2d_pose = LocalMethod(self._predict_2d_pose)
+        self.predict_2d_poses = LocalMethod(self._predict_2d_poses)
+
+    def _predict_2d_pose(self, image: np.ndarray, use_bbox_detector: bool = True,
+                         **kwargs) -> Dict[str, List[float]]:
+        return self._predict_2d_poses([image], use_bbox_detector)[0]
+
+    def _predict_2d_poses(self, images: List[np.ndarray], use_bbox_detector: bool = True,
+                          **kwargs) -> List[Dict[str, List[float]]]:
+        self._call()
+        if self.per_image_latency:
+            time.sleep(self.per_image_latency * len(images))
+        return [self._pose_dict(image) for image in images]
+
+    def _pose_dict(self, image: np.ndarray) -> Dict[str, List[float]]:
+        if not self.detect_person:
+            return {}
+        height, width = image.shape[:2]
+        offset = float(np.asarray(image, dtype=np.float64).mean())
+        return {
+            "nose": [width / 2 + offset, height / 4],
+            "left-hip": [width / 3, height / 2 + offset],
+            "right-hip": [2 * width / 3, height / 2],
+        }
+
+
+class LocalPoseEmbedding(_LocalModel):
+    """Stand-in for pose_embed.inference.PoseEmbedding."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(latency)
+        self.extract_embedding = LocalMethod(self._extract_embedding)
+        self.extract_embeddings_batch = LocalMethod(self._extract_embeddings_batch)
+
+    def _extract_embedding(self, pose_dict: Dict[str, List[float]],
+                           img_shape: Tuple[int, int]) -> np.ndarray:
+        self._call()
+        return _seeded_vector("pose", sorted(pose_dict.items()), tuple(img_shape))
+
+    def _extract_embeddings_batch(self, pose_dicts: List[Dict[str, List[float]]],
+                                  img_shapes: List[Tuple[int, int]], **kwargs) -> np.ndarray:
+        self._call()
+        return np.stack([_seeded_vector("pose", sorted(pose_dict.items()), tuple(img_shape))
+                         for pose_dict, img_shape in zip(pose_dicts, img_shapes)])
+
+
+class LocalClip(_LocalModel):
+    """Stand-in for clip.clipModel.Clip."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(latency)
+        self.encode_text = LocalMethod(self._encode_text)
+        self.encode_image = LocalMethod(self._encode_image)
+        self.encode_images_batch = LocalMethod(self._encode_images_batch)
+
+    def _encode_text(self, texts: Union[str, List[str]], normalize: bool = False) -> np.ndarray:
+        self._call()
+        if isinstance(texts, str):
+            texts = [texts]
+        return self._maybe_normalize(np.stack([_seeded_vector("text", t) for t in texts]), normalize)
+
+    def _encode_image(self, image: np.ndarray, normalize: bool = False) -> np.ndarray:
+        self._call()
+        vector = _seeded_vector("image", hashlib.sha256(np.ascontiguousarray(image)).hexdigest())
+        return self._maybe_normalize(vector[None, :], normalize)
+
+    def _encode_images_batch(self, images: List[np.ndarray], normalize: bool = False,
+                             **kwargs) -> np.ndarray:
+        self._call()
+        features = np.stack([
+            _seeded_vector("image", hashlib.sha256(np.ascontiguousarray(image)).hexdigest())
+            for image in images
+        ])
+        return self._maybe_normalize(features, normalize)
+
+    @staticmethod
+    def _maybe_normalize(features: np.ndarray, normalize: bool) -> np.ndarray:
+        if normalize:
+            features = features / np.linalg.norm(features, axis=-1, keepdims=True)
+        return features
@@ -0,0 +1,93 @@
+"""
+Portrait classification from pre-computed CLIP embeddings.
+
+An image is a portrait when its best match among the portrait keywords beats
+its best match among the full-body keywords by more than a threshold. The raw
+margin (max portrait similarity - max full-body similarity) is computed once
+for the whole corpus and stored with the embeddings, so the threshold stays a
+query-time parameter.
+"""
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from search.scoring import normalize_rows
+
+# Portrait-related keywords
+PORTRAIT_KEYWORDS = ["a portrait", "headshot", "face only", "close-up portrait"]
+# Full-body keywords
+FULL_BODY_KEYWORDS = ["full body", "full body pose", "person standing", "full figure"]
+
+
+def load_clip_text_embeddings(json_path: Path) -> Dict[str, np.ndarray]:
+    """
+    Load CLIP text embeddings from JSON file and convert to numpy arrays.
+
+    Args:
+        json_path: Path to the clip_text_embeddings.json file
+
+    Returns:
+        Dictionary mapping text strings to numpy arrays of embeddings
+
+    Raises:
+        FileNotFoundError: If JSON file doesn't exist
+        ValueError: If JSON structure is invalid
+    """
+    json_path = Path(json_path)
+    if not json_path.exists():
+        raise FileNotFoundError(f"CLIP text embeddings file not found: {json_path}")
+
+    with open(json_path, "r") as f:
+        data = json.load(f)
+
+    # Convert nested list structure to numpy arrays
+    # Each word has format: "word": [[embedding_values...]]
+    embeddings_dict = {}
+    for word, embedding_list in data.items():
+        if isinstance(embedding_list, list) and len(embedding_list) > 0:
+            # Handle nested list structure: [[...]] -> [...]
+            if isinstance(embedding_list[0], list):
+                embeddings_dict[word] = np.array(embedding_list[0], dtype=np.float32)
+            else:
+                embeddings_dict[word] = np.array(embedding_list, dtype=np.float32)
+
+    return embeddings_dict
+
+
+def portrait_margins(
+    clip_matrix: np.ndarray,
+    text_embeddings: Dict[str, np.ndarray],
+) -> Optional[np.ndarray]:
+    """
+    Portrait margin of every image, as two small matrix products.
+
+    Args:
+        clip_matrix: (N, D) CLIP image embeddings (normalized or not)
+        text_embeddings: Dictionary of text embeddings from load_clip_text_embeddings()
+
+    Returns:
+        (N,) float32 array of max portrait similarity - max full-body similarity,
+        or None if the text embeddings lack either keyword group
+    """
+    portrait = [text_embeddings[k] for k in PORTRAIT_KEYWORDS if k in text_embeddings]
+    full_body = [text_embeddings[k] for k in FULL_BODY_KEYWORDS if k in text_embeddings]
+    if not portrait or not full_body:
+        return None
+
+    images = normalize_rows(clip_matrix)
+    max_portrait_sim = (images @ normalize_rows(np.stack(portrait)).T).max(axis=1)
+    max_full_body_sim = (images @ normalize_rows(np.stack(full_body)).T).max(axis=1)
+    return (max_portrait_sim - max_full_body_sim).astype(np.float32)
+
+
+def portrait_mask(margins: np.ndarray, threshold: float = 0.0) -> np.ndarray:
+    """
+    Boolean mask of images to keep (i.e. not portraits) for a given threshold.
+
+    An image is a portrait if margin > threshold, matching
+    max_portrait_sim > max_full_body_sim + threshold.
+    """
+    return ~(margins > threshold)
+
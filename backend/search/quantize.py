@@ -0,0 +1,431 @@
+"""
+Compressed embedding representation for first-pass scoring.
+
+Each modality's normalized embeddings are optionally projected with PCA and then
+encoded with one of:
+    int8 - scalar quantization with a per-dimension scale (1 byte/dim)
+    pq   - product quantization, M sub-vectors x 256 centroids (1 byte/sub-vector),
+           scored with asymmetric distance tables (query stays float)
+
+CompressedSearcher scores the whole corpus on the codes, keeps the best `rerank`
+candidates, and reranks them exactly against the full-precision vectors, which
+stay memory-mapped on disk and are only paged in for those rows.
+
+Files written next to the embedding store:
+    compressed.json - codec parameters and the store manifest hash
+    compressed.npz  - PCA components, scales / codebooks and codes per modality
+
+Build from the backend directory:
+    python -m search.build_compressed --pca 128 --codec int8
+"""
+import json
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from search.scoring import normalize_rows, top_k
+from search.store import MANIFEST_NAME, EmbeddingStore, _write_json, file_content_hash
+
+COMPRESSED_MANIFEST_NAME = "compressed.json"
+COMPRESSED_FILE = "compressed.npz"
+COMPRESSED_VERSION = 1
+CODECS = ("int8", "pq")
+
+# Rows decoded/scored per chunk, bounds the float32 temporaries during scoring
+_SCORE_CHUNK = 65536
+
+
+class PCAProjection:
+    """
+    Uncentered PCA: projects onto the top right-singular vectors of the corpus.
+
+    Without centering, inner products in the projected space approximate the
+    original inner products, which is what cosine scoring needs.
+
+    Attributes:
+        components: (n_components, D) orthonormal projection rows
+        explained: Fraction of the corpus energy kept
+    """
+
+    def __init__(self, components: np.ndarray, explained: float = 1.0):
+        self.components = components
+        self.explained = explained
+
+    @classmethod
+    def fit(
+        cls,
+        vectors: np.ndarray,
+        n_components: int,
+        max_train: int = 100_000,
+        seed: int = 0,
+    ) -> "PCAProjection":
+        rng = np.random.default_rng(seed)
+        train = vectors
+        if vectors.shape[0] > max_train:
+            train = vectors[np.sort(rng.choice(vectors.shape[0], max_train, replace=False))]
+        train = np.asarray(train, dtype=np.float32)
+
+        _, singular_values, vt = np.linalg.svd(train, full_matrices=False)
+        energy = singular_values ** 2
+        explained = float(energy[:n_components].sum() / max(energy.sum(), 1e-12))
+        return cls(np.ascontiguousarray(vt[:n_components], dtype=np.float32), explained)
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32) @ self.components.T
+
+
+class Int8Codec:
+    """
+    Symmetric per-dimension int8 quantization: x_d ~= codes_d * scales_d.
+
+    Attributes:
+        scales: (D,) float32 step size per dimension
+        codes: (N, D) int8 codes
+    """
+
+    name = "int8"
+
+    def __init__(self, scales: np.ndarray, codes: np.ndarray):
+        self.scales = scales
+        self.codes = codes
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, **kwargs) -> "Int8Codec":
+        max_abs = np.abs(vectors).max(axis=0)
+        scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+        return cls(scales, codes)
+
+    def score(self, query: np.ndarray) -> np.ndarray:
+        """Approximate inner product of every code with a float query."""
+        scaled_query = (query * self.scales).astype(np.float32)
+        scores = np.empty(self.codes.shape[0], dtype=np.float32)
+        for start in range(0, self.codes.shape[0], _SCORE_CHUNK):
+            chunk = self.codes[start:start + _SCORE_CHUNK].astype(np.float32)
+            scores[start:start + _SCORE_CHUNK] = chunk @ scaled_query
+        return scores
+
+    def decode(self) -> np.ndarray:
+        return self.codes.astype(np.float32) * self.scales
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {"scales": self.scales, "codes": self.codes}
+
+    @property
+    def nbytes(self) -> int:
+        return self.scales.nbytes + self.codes.nbytes
+
+
+class PQCodec:
+    """
+    Product quantization with 256 centroids per sub-space.
+
+    Attributes:
+        codebooks: (M, 256, D // M) float32 sub-space centroids
+        codes: (N, M) uint8 centroid index per sub-space
+    """
+
+    name = "pq"
+
+    def __init__(self, codebooks: np.ndarray, codes: np.ndarray):
+        self.codebooks = codebooks
+        self.codes = codes
+
+    @property
+    def n_subspaces(self) -> int:
+        return self.codebooks.shape[0]
+
+    @classmethod
+    def fit(
+        cls,
+        vectors: np.ndarray,
+        n_subspaces: int = 16,
+        n_iter: int = 15,
+        max_train: int = 65536,
+        seed: int = 0,
+        **kwargs,
+    ) -> "PQCodec":
+        n, dim = vectors.shape
+        if dim % n_subspaces != 0:
+            raise ValueError(f"Dimension {dim} is not divisible by {n_subspaces} sub-spaces")
+
+        rng = np.random.default_rng(seed)
+        train = vectors
+        if n > max_train:
+            train = vectors[np.sort(rng.choice(n, max_train, replace=False))]
+
+        sub_dim = dim // n_subspaces
+        n_centroids = min(256, train.shape[0])
+        codebooks = np.zeros((n_subspaces, 256, sub_dim), dtype=np.float32)
+        codes = np.empty((n, n_subspaces), dtype=np.uint8)
+        for m in range(n_subspaces):
+            columns = slice(m * sub_dim, (m + 1) * sub_dim)
+            centroids = _kmeans(np.ascontiguousarray(train[:, columns]), n_centroids, n_iter, rng)
+            codebooks[m, :n_centroids] = centroids
+            codes[:, m] = _nearest(np.ascontiguousarray(vectors[:, columns]), centroids)
+        return cls(codebooks, codes)
+
+    def score(self, query: np.ndarray) -> np.ndarray:
+        """Asymmetric distance computation: one (M, 256) lookup table per query."""
+        sub_queries = query.astype(np.float32).reshape(self.n_subspaces, 1, -1)
+        table = (self.codebooks * sub_queries).sum(axis=2)  # (M, 256)
+
+        subspaces = np.arange(self.n_subspaces)
+        scores = np.empty(self.codes.shape[0], dtype=np.float32)
+        for start in range(0, self.codes.shape[0], _SCORE_CHUNK):
+            chunk = self.codes[start:start + _SCORE_CHUNK]
+            scores[start:start + _SCORE_CHUNK] = table[subspaces, chunk].sum(axis=1)
+        return scores
+
+    def decode(self) -> np.ndarray:
+        subspaces = np.arange(self.n_subspaces)
+        return self.codebooks[subspaces, self.codes].reshape(self.codes.shape[0], -1)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks, "codes": self.codes}
+
+    @property
+    def nbytes(self) -> int:
+        return self.codebooks.nbytes + self.codes.nbytes
+
+
+_CODEC_CLASSES = {"int8": Int8Codec, "pq": PQCodec}
+
+
+class CompressedModality:
+    """Optional PCA projection + codec for one modality's normalized embeddings."""
+
+    def __init__(self, codec, pca: Optional[PCAProjection] = None):
+        self.codec = codec
+        self.pca = pca
+
+    @classmethod
+    def build(
+        cls,
+        normalized: np.ndarray,
+        codec: str = "int8",
+        pca_dims: Optional[int] = None,
+        n_subspaces: int = 16,
+        seed: int = 0,
+    ) -> "CompressedModality":
+        if codec not in _CODEC_CLASSES:
+            raise ValueError(f"Unknown codec {codec!r}, expected one of {CODECS}")
+
+        pca = None
+        vectors = np.asarray(normalized, dtype=np.float32)
+        if pca_dims and pca_dims < vectors.shape[1]:
+            pca = PCAProjection.fit(vectors, pca_dims, seed=seed)
+            vectors = pca.transform(vectors)
+        return cls(_CODEC_CLASSES[codec].fit(vectors, n_subspaces=n_subspaces, seed=seed), pca)
+
+    def score(self, normalized_query: np.ndarray) -> np.ndarray:
+        query = normalized_query if self.pca is None else self.pca.transform(normalized_query)
+        return self.codec.score(query)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codec.nbytes + (self.pca.components.nbytes if self.pca is not None else 0)
+
+    def arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        arrays = {f"{prefix}_{name}": value for name, value in self.codec.arrays().items()}
+        if self.pca is not None:
+            arrays[f"{prefix}_pca"] = self.pca.components
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, data, prefix: str, codec: str) -> "CompressedModality":
+        pca = PCAProjection(data[f"{prefix}_pca"]) if f"{prefix}_pca" in data else None
+        if codec == "int8":
+            return cls(Int8Codec(data[f"{prefix}_scales"], data[f"{prefix}_codes"]), pca)
+        return cls(PQCodec(data[f"{prefix}_codebooks"], data[f"{prefix}_codes"]), pca)
+
+
+class CompressedSearcher:
+    """
+    First-pass scoring on compressed codes, exact rerank on full-precision vectors.
+
+    Args:
+        store: Embedding store; its (memory-mapped) matrices are only read for
+            rerank candidates
+        pose: Compressed pose embeddings
+        clip: Compressed CLIP embeddings
+        rerank: Default number of first-pass candidates reranked exactly
+    """
+
+    def __init__(
+        self,
+        store: EmbeddingStore,
+        pose: CompressedModality,
+        clip: CompressedModality,
+        rerank: int = 256,
+    ):
+        self.store = store
+        self.pose = pose
+        self.clip = clip
+        self.rerank = rerank
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    @property
+    def nbytes(self) -> int:
+        return self.pose.nbytes + self.clip.nbytes
+
+    def approximate_scores(
+        self,
+        pose_query: np.ndarray,
+        clip_query: np.ndarray,
+        lambda_param: float,
+    ) -> np.ndarray:
+        """(N,) approximate hybrid scores from the codes alone."""
+        scores = np.zeros(len(self.store), dtype=np.float32)
+        if lambda_param > 0:
+            scores += lambda_param * self.pose.score(normalize_rows(pose_query).ravel())
+        if lambda_param < 1:
+            scores += (1 - lambda_param) * self.clip.score(normalize_rows(clip_query).ravel())
+        return scores
+
+    def search(
+        self,
+        pose_query: np.ndarray,
+        clip_query: np.ndarray,
+        lambda_param: float,
+        k: int,
+        mask: Optional[np.ndarray] = None,
+        rerank: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k (indices, scores), best first; returned scores are exact.
+        """
+        approx = self.approximate_scores(pose_query, clip_query, lambda_param)
+        candidates, _ = top_k(approx, max(int(k), rerank or self.rerank), mask)
+
+        # Sorted row order keeps the mmap reads sequential
+        rows = np.sort(candidates)
+        pose = normalize_rows(self.store.pose[rows])
+        clip = normalize_rows(self.store.clip[rows])
+        exact = (lambda_param * (pose @ normalize_rows(pose_query).ravel())
+                 + (1 - lambda_param) * (clip @ normalize_rows(clip_query).ravel()))
+
+        order, scores = top_k(exact.astype(np.float32), k)
+        return rows[order], scores
+
+
+def build_compressed(
+    store: EmbeddingStore,
+    codec: str = "int8",
+    pca_dims: Optional[int] = None,
+    n_subspaces: int = 16,
+    seed: int = 0,
+) -> Tuple[CompressedModality, CompressedModality]:
+    """Compress both modalities of a store. Normalizes the matrices chunk by chunk."""
+    return tuple(
+        CompressedModality.build(_normalize_chunked(matrix), codec, pca_dims, n_subspaces, seed)
+        for matrix in (store.pose, store.clip)
+    )
+
+
+def save_compressed(
+    root: Path,
+    pose: CompressedModality,
+    clip: CompressedModality,
+    params: Dict,
+) -> Path:
+    """
+    Persist compressed codes next to the store, tagged with the manifest hash.
+
+    Returns:
+        Path to compressed.json
+    """
+    root = Path(root)
+    tmp_path = root / (COMPRESSED_FILE + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **pose.arrays("pose"), **clip.arrays("clip"))
+    tmp_path.replace(root / COMPRESSED_FILE)
+
+    manifest = {
+        "version": COMPRESSED_VERSION,
+        "codec": pose.codec.name,
+        "store_hash": file_content_hash(root / MANIFEST_NAME),
+        "file": COMPRESSED_FILE,
+        "params": params,
+        "nbytes": pose.nbytes + clip.nbytes,
+        "created_at": time.time(),
+    }
+    manifest_path = root / COMPRESSED_MANIFEST_NAME
+    _write_json(manifest_path, manifest, indent=2)
+    return manifest_path
+
+
+def load_compressed(
+    root: Path,
+    store_hash: Optional[str] = None,
+) -> Optional[Tuple[CompressedModality, CompressedModality]]:
+    """
+    Load compressed codes for a store directory.
+
+    Args:
+        root: Store directory
+        store_hash: Expected store manifest hash; codes built for another
+            version of the store are ignored
+
+    Returns:
+        (pose, clip) compressed modalities, or None if missing or stale
+    """
+    manifest_path = Path(root) / COMPRESSED_MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+
+    if manifest.get("version") != COMPRESSED_VERSION:
+        print(f"Warning: Ignoring compressed index with version {manifest.get('version')}")
+        return None
+    if store_hash is not None and manifest.get("store_hash") != store_hash:
+        print("Warning: Compressed index is stale (store changed), "
+              "rebuild with `python -m search.build_compressed`")
+        return None
+
+    with np.load(Path(root) / manifest["file"]) as data:
+        return (CompressedModality.from_arrays(data, "pose", manifest["codec"]),
+                CompressedModality.from_arrays(data, "clip", manifest["codec"]))
+
+
+def _normalize_chunked(matrix: np.ndarray) -> np.ndarray:
+    out = np.empty(matrix.shape, dtype=np.float32)
+    for start in range(0, matrix.shape[0], _SCORE_CHUNK):
+        out[start:start + _SCORE_CHUNK] = normalize_rows(matrix[start:start + _SCORE_CHUNK])
+    return out
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest (L2) centroid for every row, in bounded chunks."""
+    half_norms = 0.5 * (centroids ** 2).sum(axis=1)
+    assign = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], _SCORE_CHUNK):
+        chunk = vectors[start:start + _SCORE_CHUNK]
+        assign[start:start + _SCORE_CHUNK] = np.argmax(chunk @ centroids.T - half_norms, axis=1)
+    return assign
+
+
+def _kmeans(vectors: np.ndarray, k: int, n_iter: int, rng: np.random.Generator) -> np.ndarray:
+    """Plain L2 k-means (PQ sub-spaces are not unit-norm)."""
+    centroids = vectors[rng.choice(vectors.shape[0], k, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = _nearest(vectors, centroids)
+        counts = np.bincount(assign, minlength=k)
+
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        nonempty = np.flatnonzero(counts)
+        centroids[nonempty] = (np.add.reduceat(vectors[order], starts[nonempty], axis=0)
+                               / counts[nonempty, None])
+
+        # Re-seed empty clusters from random points
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            centroids[empty] = vectors[rng.choice(vectors.shape[0], empty.size, replace=False)]
+    return centroids
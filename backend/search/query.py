@@ -0,0 +1,119 @@
+"""
+Query-embedding fan-out for the search pipeline.
+
+The CLIP text embedding does not depend on the pose chain (SAM 3D Body 2D pose
+-> PoseC3D embedding), so the CLIP call is spawned first and joined after the
+pose chain finishes: latency is max(pose chain, CLIP) instead of their sum.
+
+The model arguments only need Modal's method interface (`.remote()` and
+`.spawn()` returning a handle with `.get()` / `.cancel()`), so the same code
+runs against the deployed classes or the stand-ins in search.local_models.
+"""
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+from search.query_cache import QueryEmbeddingCache, array_key, text_key
+from search.store import CLIP_MODEL, POSE_PIPELINE
+
+# Cache namespaces name the pipeline / model behind each embedding, so entries
+# persisted by an older one (e.g. on the volume) are never served
+POSE_CACHE_NAMESPACE = f"pose_{POSE_PIPELINE}"
+CLIP_TEXT_CACHE_NAMESPACE = f"clip_text_{CLIP_MODEL.replace('/', '_')}"
+
+
+class QueryEmbeddingError(Exception):
+    """A query embedding could not be computed; the message is user-facing."""
+
+
+def extract_query_embeddings(
+    sketch_array: np.ndarray,
+    sketch_shape: Tuple[int, int],
+    text: str,
+    pose_model: Any,
+    pose_embedder: Any,
+    clip_model: Any,
+    cache: Optional[QueryEmbeddingCache] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the pose (P_A) and CLIP text (C_A) query embeddings concurrently.
+
+    Args:
+        sketch_array: Decoded sketch image
+        sketch_shape: (height, width) of the sketch
+        text: Text query
+        pose_model: SAM3DBodyInference (or stand-in) instance
+        pose_embedder: PoseEmbedding (or stand-in) instance
+        clip_model: Clip (or stand-in) instance
+        cache: Optional query-embedding cache; cached embeddings skip their calls
+
+    Returns:
+        (P_A, C_A)
+
+    Raises:
+        QueryEmbeddingError: If no person is detected or a model call fails
+    """
+    pose_key = array_key(sketch_array, namespace=POSE_CACHE_NAMESPACE)
+    clip_key = text_key(text, namespace=CLIP_TEXT_CACHE_NAMESPACE)
+    P_A = cache.get(pose_key) if cache is not None else None
+    C_A = cache.get(clip_key) if cache is not None else None
+
+    # Start the independent CLIP call before the (longer) pose chain
+    clip_call = None
+    if C_A is None:
+        try:
+            clip_call = clip_model.encode_text.spawn(texts=text, normalize=False)
+        except Exception as e:
+            raise QueryEmbeddingError(f"Failed to extract CLIP text embedding: {str(e)}") from e
+
+    if P_A is None:
+        try:
+            P_A = _pose_chain(sketch_array, sketch_shape, pose_model, pose_embedder)
+        except BaseException:
+            if clip_call is not None:
+                _cancel(clip_call)
+            raise
+        if cache is not None:
+            cache.put(pose_key, P_A)
+
+    if clip_call is not None:
+        try:
+            C_A = clip_call.get()
+        except Exception as e:
+            raise QueryEmbeddingError(f"Failed to extract CLIP text embedding: {str(e)}") from e
+        # If multiple texts, take first
+        if len(C_A.shape) > 1:
+            C_A = C_A[0]
+        if cache is not None:
+            cache.put(clip_key, C_A)
+
+    return P_A, C_A
+
+
+def _pose_chain(sketch_array, sketch_shape, pose_model, pose_embedder) -> np.ndarray:
+    try:
+        pose_dict = pose_model.predict_2d_pose.remote(
+            image=sketch_array,
+            use_bbox_detector=True,
+        )
+    except Exception as e:
+        raise QueryEmbeddingError(f"Failed to extract pose embedding: {str(e)}") from e
+
+    if not pose_dict:
+        raise QueryEmbeddingError("No person detected in sketch image")
+
+    try:
+        return pose_embedder.extract_embedding.remote(
+            pose_dict=pose_dict,
+            img_shape=sketch_shape,
+        )
+    except Exception as e:
+        raise QueryEmbeddingError(f"Failed to extract pose embedding: {str(e)}") from e
+
+
+def _cancel(call: Any) -> None:
+    # The spawned result is no longer needed; cancelling is best effort
+    try:
+        call.cancel()
+    except Exception:
+        pass
@@ -0,0 +1,197 @@
+"""
+Cache of query embeddings (CLIP text C_A, sketch pose P_A).
+
+Users re-submit the same sketch and text while moving the lambda slider, so the
+GPU calls are skipped when the normalized text / decoded sketch was seen
+recently. Entries live in a bounded in-memory LRU with a TTL and can optionally
+be persisted as one .npy file per key (e.g. on the Modal volume) so warm
+containers share hot entries.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+
+def text_key(text: str, namespace: str = "clip_text") -> str:
+    """Cache key for a text query: case- and whitespace-insensitive."""
+    normalized = " ".join(text.lower().split())
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return f"{namespace}-{digest}"
+
+
+def array_key(array: np.ndarray, namespace: str = "pose_sketch") -> str:
+    """Cache key for a decoded image: hash of its pixels, shape and dtype."""
+    array = np.ascontiguousarray(array)
+    digest = hashlib.sha256()
+    digest.update(f"{array.shape}{array.dtype.str}".encode("ascii"))
+    digest.update(memoryview(array).cast("B"))
+    return f"{namespace}-{digest.hexdigest()}"
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU + TTL cache of embedding vectors.
+
+    Args:
+        max_entries: In-memory capacity; least recently used entries are evicted
+        ttl: Seconds an entry stays valid (in memory and on disk)
+        persist_dir: Optional directory for a shared on-disk copy of each entry
+        clock: Time source (for tests)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 24 * 3600.0,
+        persist_dir: Optional[Path] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist_dir = Path(persist_dir) if persist_dir is not None else None
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Cached vector for key, or None (counted as a miss)."""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        value, stored_at = self._load(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._insert(key, value, stored_at)
+        return value
+
+    def put(self, key: str, value: np.ndarray) -> None:
+        """Store a vector (read-only copy) in memory and, if enabled, on disk."""
+        value = np.array(value, dtype=np.float32)
+        value.flags.writeable = False
+        now = self._clock()
+        with self._lock:
+            self._insert(key, value, now)
+        self._save(key, value)
+
+    def get_or_compute(self, key: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """Cached vector for key, computing and storing it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def prune(self) -> int:
+        """Delete expired persisted entries; returns how many were removed."""
+        if self.persist_dir is None or not self.persist_dir.exists():
+            return 0
+        removed = 0
+        now = self._clock()
+        for path in self.persist_dir.glob("*.npy"):
+            try:
+                if now - path.stat().st_mtime > self.ttl:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def clear(self) -> None:
+        """Drop in-memory entries (persisted entries are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def _insert(self, key: str, value: np.ndarray, stored_at: float) -> None:
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _entry_path(self, key: str) -> Path:
+        return self.persist_dir / f"{key}.npy"
+
+    def _load(self, key: str, now: float) -> Tuple[Optional[np.ndarray], float]:
+        if self.persist_dir is None:
+            return None, now
+        path = self._entry_path(key)
+        try:
+            stored_at = path.stat().st_mtime
+            if now - stored_at > self.ttl:
+                return None, now
+            value = np.load(path)
+        except (OSError, ValueError):
+            return None, now
+        value.flags.writeable = False
+        return value, stored_at
+
+    def _save(self, key: str, value: np.ndarray) -> None:
+        if self.persist_dir is None:
+            return
+        # Persistence is best effort, a failed write only costs a future miss
+        try:
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+            path = self._entry_path(key)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Failed to persist query embedding {key}: {e}")
+
+
+_QUERY_CACHES: Dict[str, QueryEmbeddingCache] = {}
+_QUERY_CACHES_LOCK = threading.Lock()
+
+
+def get_query_cache(
+    name: str,
+    max_entries: int = 1024,
+    ttl: float = 24 * 3600.0,
+    persist_dir: Optional[Path] = None,
+) -> QueryEmbeddingCache:
+    """
+    Module-level singleton cache per name, shared by all requests in a container.
+    Arguments are only used when the cache is first created.
+    """
+    with _QUERY_CACHES_LOCK:
+        cache = _QUERY_CACHES.get(name)
+        if cache is None:
+            cache = QueryEmbeddingCache(max_entries, ttl, persist_dir)
+            cache.prune()
+            _QUERY_CACHES[name] = cache
+    return cache
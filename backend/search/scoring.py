@@ -0,0 +1,177 @@
+"""
+Vectorized hybrid pose + CLIP scoring.
+
+The corpus matrices are L2-normalized once, so every cosine similarity becomes a
+dot product. The hybrid score
+
+    Sim = lambda * Pose_Sim + (1 - lambda) * Clip_Sim
+
+is then a single mat-vec product against the row-concatenated [pose | clip]
+matrix with the query [lambda * p, (1 - lambda) * c].
+"""
+from typing import TYPE_CHECKING, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from search.store import EmbeddingStore
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize each row of a matrix (or a single vector).
+
+    Zero rows stay zero, matching cosine_similarity() which returns 0.0 when
+    either vector has zero norm.
+
+    Args:
+        matrix: (N, D) or (D,) array
+
+    Returns:
+        float32 array of the same shape with unit-norm (or zero) rows
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class HybridScorer:
+    """
+    Scores a (pose, CLIP) query against every corpus row at once.
+
+    Attributes:
+        matrix: (N, pose_dim + clip_dim) float32, normalized pose | normalized CLIP
+        pose: (N, pose_dim) view of the normalized pose columns
+        clip: (N, clip_dim) view of the normalized CLIP columns
+    """
+
+    def __init__(self, pose: np.ndarray, clip: np.ndarray):
+        if pose.shape[0] != clip.shape[0]:
+            raise ValueError(
+                f"Row count mismatch: pose.shape={pose.shape}, clip.shape={clip.shape}"
+            )
+
+        self.pose_dim = pose.shape[1]
+        self.clip_dim = clip.shape[1]
+        self.matrix = np.empty((pose.shape[0], self.pose_dim + self.clip_dim), dtype=np.float32)
+        self.matrix[:, :self.pose_dim] = normalize_rows(pose)
+        self.matrix[:, self.pose_dim:] = normalize_rows(clip)
+        self.pose = self.matrix[:, :self.pose_dim]
+        self.clip = self.matrix[:, self.pose_dim:]
+
+    @classmethod
+    def from_store(cls, store: "EmbeddingStore") -> "HybridScorer":
+        return cls(store.pose, store.clip)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def query_vector(
+        self,
+        pose_query: np.ndarray,
+        clip_query: np.ndarray,
+        lambda_param: float,
+    ) -> np.ndarray:
+        """
+        Build the fused (pose_dim + clip_dim,) query for a given lambda.
+
+        Raises:
+            ValueError: If the query dimensions don't match the corpus
+        """
+        pose_query = np.asarray(pose_query, dtype=np.float32).ravel()
+        clip_query = np.asarray(clip_query, dtype=np.float32).ravel()
+        if pose_query.shape[0] != self.pose_dim or clip_query.shape[0] != self.clip_dim:
+            raise ValueError(
+                f"Query dimensions must match: pose {pose_query.shape[0]} vs {self.pose_dim}, "
+                f"clip {clip_query.shape[0]} vs {self.clip_dim}"
+            )
+
+        query = np.empty(self.pose_dim + self.clip_dim, dtype=np.float32)
+        query[:self.pose_dim] = lambda_param * normalize_rows(pose_query)
+        query[self.pose_dim:] = (1 - lambda_param) * normalize_rows(clip_query)
+        return query
+
+    def score(
+        self,
+        pose_query: np.ndarray,
+        clip_query: np.ndarray,
+        lambda_param: float,
+    ) -> np.ndarray:
+        """
+        Compute the hybrid score of every corpus row.
+
+        Args:
+            pose_query: Query pose embedding (P_A)
+            clip_query: Query CLIP text embedding (C_A)
+            lambda_param: Weight of the pose similarity, in [0, 1]
+
+        Returns:
+            (N,) float32 array of hybrid scores
+        """
+        return self.matrix @ self.query_vector(pose_query, clip_query, lambda_param)
+
+    def search(
+        self,
+        pose_query: np.ndarray,
+        clip_query: np.ndarray,
+        lambda_param: float,
+        k: int,
+        mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score the corpus and return the k best rows.
+
+        Args:
+            pose_query: Query pose embedding (P_A)
+            clip_query: Query CLIP text embedding (C_A)
+            lambda_param: Weight of the pose similarity, in [0, 1]
+            k: Number of results
+            mask: Optional (N,) boolean array; only True rows are eligible
+
+        Returns:
+            (indices, scores) of the top-k rows, best first
+        """
+        scores = self.score(pose_query, clip_query, lambda_param)
+        return top_k(scores, k, mask)
+
+
+def top_k(
+    scores: np.ndarray,
+    k: int,
+    mask: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Select the k highest scores with a partition (O(N)) and sort only those k.
+
+    Ties are broken by row index, also at the k-th place: of the rows scoring
+    the k-th highest value, the lowest-indexed are kept. This matches a stable
+    full sort (the reference loop's list.sort()).
+
+    Args:
+        scores: (N,) array of scores
+        k: Number of results; clamped to the number of eligible rows
+        mask: Optional (N,) boolean array; only True rows are eligible
+
+    Returns:
+        (indices, scores) of the top-k rows, best first
+    """
+    candidates = np.flatnonzero(mask) if mask is not None else None
+    eligible = scores[candidates] if candidates is not None else scores
+
+    k = max(0, min(int(k), eligible.shape[0]))
+    if k == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=scores.dtype)
+
+    if k < eligible.shape[0]:
+        # Everything above the k-th highest score, then the first rows tied with
+        # it (argpartition alone would pick arbitrary rows among those ties)
+        kth = -np.partition(-eligible, k - 1)[k - 1]
+        above = np.flatnonzero(eligible > kth)
+        tied = np.flatnonzero(eligible == kth)[:k - above.size]
+        part = np.concatenate((above, tied))
+    else:
+        part = np.arange(eligible.shape[0])
+    order = part[np.argsort(-eligible[part], kind="stable")]
+
+    indices = candidates[order] if candidates is not None else order
+    return indices, scores[indices]
@@ -0,0 +1,349 @@
+"""
+Columnar on-disk embedding store.
+
+Layout of a store directory:
+    manifest.json  - format version, row count, dims and file names (written last)
+    pose.npy       - (N, pose_dim) float32 pose embeddings
+    clip.npy       - (N, clip_dim) float32 CLIP image embeddings
+    paths.json     - list of N relative image paths; row i belongs to paths[i]
+    portrait_margin.npy - optional (N,) float32 portrait margins (see search.portrait)
+
+The .npy matrices are opened with mmap, so loading a store only reads the
+manifest and the path table. Embedding pages are faulted in on first use.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from search.portrait import portrait_margins
+
+STORE_FORMAT = "posematic-embedding-store"
+STORE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+POSE_FILE = "pose.npy"
+CLIP_FILE = "clip.npy"
+PATHS_FILE = "paths.json"
+PORTRAIT_MARGIN_FILE = "portrait_margin.npy"
+
+# Pipeline behind the pose embeddings, recorded in the store metadata as
+# "pose_pipeline": SAM 3D Body "keypoints_2d" mode (body decoder only) ->
+# PoseC3D. The earlier "full" mode re-ran the body decoder with the hand
+# decoder's wrists and the elbows as keypoint prompts, so its elbow and wrist
+# keypoints (and embeddings) differ. Query and corpus must use the same one.
+POSE_PIPELINE = "sam3d_kp2d_v2"
+
+# Model behind the CLIP image embeddings and the CLIP text queries
+CLIP_MODEL = "openai/clip-vit-base-patch32"
+
+
+class EmbeddingStore:
+    """
+    Pose and CLIP embeddings for the image corpus, one row per image.
+
+    Attributes:
+        paths: Relative image paths (from data/downloaded_pins), row-aligned
+        pose: (N, pose_dim) float32 matrix of pose embeddings
+        clip: (N, clip_dim) float32 matrix of CLIP image embeddings
+        metadata: Free-form metadata carried over from ingestion
+        root: Directory the store was loaded from, or None if in-memory
+        portrait_margin: Optional (N,) float32 portrait margins, None if not computed
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        pose: np.ndarray,
+        clip: np.ndarray,
+        metadata: Optional[Dict[str, Any]] = None,
+        root: Optional[Path] = None,
+        portrait_margin: Optional[np.ndarray] = None,
+    ):
+        if pose.ndim != 2 or clip.ndim != 2:
+            raise ValueError(
+                f"Embedding matrices must be 2D: pose.shape={pose.shape}, clip.shape={clip.shape}"
+            )
+        if not (len(paths) == pose.shape[0] == clip.shape[0]):
+            raise ValueError(
+                f"Row count mismatch: {len(paths)} paths, pose.shape={pose.shape}, clip.shape={clip.shape}"
+            )
+
+        if portrait_margin is not None and portrait_margin.shape != (len(paths),):
+            raise ValueError(
+                f"portrait_margin.shape={portrait_margin.shape}, expected ({len(paths)},)"
+            )
+
+        self.paths = paths
+        self.pose = pose
+        self.clip = clip
+        self.metadata = metadata or {}
+        self.root = root
+        self.portrait_margin = portrait_margin
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    @property
+    def pose_dim(self) -> int:
+        return self.pose.shape[1]
+
+    @property
+    def clip_dim(self) -> int:
+        return self.clip.shape[1]
+
+    def compute_portrait_margins(self, text_embeddings: Dict[str, np.ndarray]) -> bool:
+        """
+        Fill the portrait_margin column from the CLIP keyword embeddings.
+
+        Args:
+            text_embeddings: Dictionary from search.portrait.load_clip_text_embeddings()
+
+        Returns:
+            True if margins were computed, False if the keywords are missing
+        """
+        self.portrait_margin = portrait_margins(self.clip, text_embeddings)
+        return self.portrait_margin is not None
+
+    @classmethod
+    def from_embeddings_map(
+        cls,
+        embeddings_map: Dict[str, Dict[str, List[float]]],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> "EmbeddingStore":
+        """
+        Build an in-memory store from the legacy embeddings.json mapping.
+
+        Entries missing either embedding, or whose dimensions disagree with the
+        first valid entry, are skipped (the search loop skipped them too).
+
+        Args:
+            embeddings_map: {relative_path: {"pose_embedding": [...], "clip_embedding": [...]}};
+                the embeddings may be lists or arrays (e.g. rows of another store)
+            metadata: Optional metadata to keep with the store
+
+        Returns:
+            EmbeddingStore with rows in the mapping's iteration order
+        """
+        paths = []
+        pose_rows = []
+        clip_rows = []
+        pose_dim = clip_dim = None
+
+        for relative_path, embeddings in embeddings_map.items():
+            if "pose_embedding" not in embeddings or "clip_embedding" not in embeddings:
+                continue
+
+            pose = np.asarray(embeddings["pose_embedding"], dtype=np.float32).ravel()
+            clip = np.asarray(embeddings["clip_embedding"], dtype=np.float32).ravel()
+
+            if pose_dim is None:
+                pose_dim, clip_dim = pose.shape[0], clip.shape[0]
+            if pose.shape[0] != pose_dim or clip.shape[0] != clip_dim:
+                print(
+                    f"Skipping {relative_path}: expected dims ({pose_dim}, {clip_dim}), "
+                    f"got ({pose.shape[0]}, {clip.shape[0]})"
+                )
+                continue
+
+            paths.append(relative_path)
+            pose_rows.append(pose)
+            clip_rows.append(clip)
+
+        if not paths:
+            return cls([], np.zeros((0, 0), np.float32), np.zeros((0, 0), np.float32), metadata)
+
+        return cls(paths, np.stack(pose_rows), np.stack(clip_rows), metadata)
+
+    @classmethod
+    def from_json(cls, json_path: Path) -> "EmbeddingStore":
+        """
+        Build an in-memory store from a legacy embeddings.json file.
+
+        Args:
+            json_path: Path to embeddings.json ({"embeddings": {...}, "metadata": {...}})
+
+        Returns:
+            EmbeddingStore holding the parsed embeddings
+
+        Raises:
+            FileNotFoundError: If the JSON file doesn't exist
+            ValueError: If the JSON structure is invalid
+        """
+        json_path = Path(json_path)
+        if not json_path.exists():
+            raise FileNotFoundError(f"Embeddings file not found: {json_path}")
+
+        with open(json_path, "r") as f:
+            data = json.load(f)
+        if "embeddings" not in data:
+            raise ValueError("Invalid embeddings JSON structure: missing 'embeddings' key")
+
+        return cls.from_embeddings_map(data["embeddings"], metadata=dict(data.get("metadata", {})))
+
+    def save(self, root: Path) -> Path:
+        """
+        Write the store to a directory.
+
+        The matrices and path table are written first and the manifest last, so
+        a reader never sees a manifest that points at half-written files.
+
+        Args:
+            root: Output directory (created if missing)
+
+        Returns:
+            Path to the written manifest
+        """
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+
+        _save_npy(root / POSE_FILE, self.pose)
+        _save_npy(root / CLIP_FILE, self.clip)
+        _write_json(root / PATHS_FILE, list(self.paths))
+
+        files = {"pose": POSE_FILE, "clip": CLIP_FILE, "paths": PATHS_FILE}
+        if self.portrait_margin is not None:
+            _save_npy(root / PORTRAIT_MARGIN_FILE, self.portrait_margin)
+            files["portrait_margin"] = PORTRAIT_MARGIN_FILE
+
+        manifest = {
+            "format": STORE_FORMAT,
+            "version": STORE_VERSION,
+            "count": len(self),
+            "pose_dim": int(self.pose.shape[1]),
+            "clip_dim": int(self.clip.shape[1]),
+            "dtype": "float32",
+            "files": files,
+            "created_at": time.time(),
+            "metadata": self.metadata,
+        }
+        manifest_path = root / MANIFEST_NAME
+        _write_json(manifest_path, manifest, indent=2)
+        return manifest_path
+
+
+def load_embedding_store(root: Path, mmap: bool = True) -> EmbeddingStore:
+    """
+    Load an embedding store from disk.
+
+    Args:
+        root: Store directory containing manifest.json
+        mmap: If True, memory-map the embedding matrices instead of reading them
+
+    Returns:
+        EmbeddingStore backed by the files in root
+
+    Raises:
+        FileNotFoundError: If the manifest doesn't exist
+        ValueError: If the manifest or files don't describe a valid store
+    """
+    root = Path(root)
+    manifest_path = root / MANIFEST_NAME
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"Embedding store manifest not found: {manifest_path}")
+
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format") != STORE_FORMAT:
+        raise ValueError(f"Not an embedding store manifest: {manifest_path}")
+    if manifest.get("version") != STORE_VERSION:
+        raise ValueError(
+            f"Unsupported embedding store version {manifest.get('version')} (expected {STORE_VERSION})"
+        )
+
+    files = manifest["files"]
+    mmap_mode = "r" if mmap else None
+    pose = _load_npy(root / files["pose"], mmap_mode)
+    clip = _load_npy(root / files["clip"], mmap_mode)
+    with open(root / files["paths"], "r") as f:
+        paths = json.load(f)
+    portrait_margin = None
+    if "portrait_margin" in files:
+        portrait_margin = _load_npy(root / files["portrait_margin"], mmap_mode)
+
+    if pose.dtype != np.float32 or clip.dtype != np.float32:
+        raise ValueError(f"Expected float32 matrices, got pose={pose.dtype}, clip={clip.dtype}")
+    count = manifest["count"]
+    if len(paths) != count:
+        raise ValueError(
+            f"Path table has {len(paths)} rows but manifest says {count}"
+        )
+    # A matrix from another save (or a partial copy) must not be paired with this manifest
+    expected_shapes = {
+        "pose": (pose, (count, manifest["pose_dim"])),
+        "clip": (clip, (count, manifest["clip_dim"])),
+    }
+    if portrait_margin is not None:
+        expected_shapes["portrait_margin"] = (portrait_margin, (count,))
+    for name, (array, shape) in expected_shapes.items():
+        if array.shape != shape:
+            raise ValueError(f"{files[name]} has shape {array.shape} but manifest says {shape}")
+
+    return EmbeddingStore(paths, pose, clip, metadata=manifest.get("metadata"), root=root,
+                          portrait_margin=portrait_margin)
+
+
+def convert_embeddings_json(
+    json_path: Path,
+    root: Path,
+    text_embeddings: Optional[Dict[str, np.ndarray]] = None,
+) -> EmbeddingStore:
+    """
+    One-shot conversion of a legacy embeddings.json file into a store directory.
+
+    Args:
+        json_path: Path to embeddings.json ({"embeddings": {...}, "metadata": {...}})
+        root: Output store directory
+        text_embeddings: Optional CLIP keyword embeddings used to precompute the
+            portrait_margin column
+
+    Returns:
+        The converted store, memory-mapped from root
+
+    Raises:
+        FileNotFoundError: If the JSON file doesn't exist
+        ValueError: If the JSON structure is invalid
+    """
+    store = EmbeddingStore.from_json(json_path)
+    store.metadata["converted_from"] = Path(json_path).name
+    if text_embeddings is not None and not store.compute_portrait_margins(text_embeddings):
+        print("Warning: portrait/full-body keywords missing, skipping portrait margins")
+    store.save(root)
+    return load_embedding_store(root)
+
+
+def file_content_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_npy(path: Path, mmap_mode: Optional[str]) -> np.ndarray:
+    """np.load with the file named in errors (e.g. a truncated .npy)."""
+    try:
+        return np.load(path, mmap_mode=mmap_mode)
+    except ValueError as e:
+        raise ValueError(f"Invalid or truncated {path.name}: {e}") from e
+
+
+def _save_npy(path: Path, array: np.ndarray) -> None:
+    """Write a C-contiguous float32 .npy file via a temp file and atomic rename."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(array, dtype=np.float32))
+    os.replace(tmp_path, path)
+
+
+def _write_json(path: Path, obj: Any, indent: Optional[int] = None) -> None:
+    """Write JSON via a temp file and atomic rename."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(obj, f, indent=indent)
+    os.replace(tmp_path, path)
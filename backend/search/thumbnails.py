@@ -0,0 +1,241 @@
+"""
+Pre-generated thumbnail tiers for search results.
+
+Thumbnails are built once at ingest time, next to the originals:
+    data/thumbnails/<tier>/<relative_path>.webp
+
+so search responses can inline a small variant and the full original is only
+served on request. Building is incremental (an image is skipped when all of
+its tiers are newer than the original) and runs across worker processes.
+
+Build from the backend directory:
+    python -m search.build_thumbnails
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image
+
+from search.store import file_content_hash
+
+# Tier name -> longest side in pixels, largest first
+THUMBNAIL_SIZES: Dict[str, int] = {"large": 1024, "medium": 512, "small": 256}
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_SUFFIX = ".webp"
+THUMBNAIL_QUALITY = 80
+ORIGINAL = "original"
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
+
+MIME_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".bmp": "image/bmp",
+    ".webp": "image/webp",
+}
+
+
+def originals_dir(data_dir: Path) -> Path:
+    return Path(data_dir) / "downloaded_pins"
+
+
+def thumbnails_dir(data_dir: Path) -> Path:
+    return Path(data_dir) / "thumbnails"
+
+
+def resolve_image_path(data_dir: Path, relative_path: str, tier: str = ORIGINAL) -> Path:
+    """
+    Path of an original image or one of its thumbnails.
+
+    Args:
+        data_dir: Data directory holding downloaded_pins/ and thumbnails/
+        relative_path: Path relative to downloaded_pins (e.g. "pose-reference/image.jpg")
+        tier: "original" or a THUMBNAIL_SIZES key
+
+    Raises:
+        ValueError: If the tier is unknown or the path escapes the image directory
+    """
+    if tier == ORIGINAL:
+        base = originals_dir(data_dir)
+        path = base / relative_path
+    elif tier in THUMBNAIL_SIZES:
+        base = thumbnails_dir(data_dir) / tier
+        path = base / (relative_path + THUMBNAIL_SUFFIX)
+    else:
+        raise ValueError(f"Unknown image size {tier!r}, expected {ORIGINAL!r} or one of "
+                         f"{list(THUMBNAIL_SIZES)}")
+
+    # Relative paths come from clients, never let them leave the image directory
+    if not path.resolve().is_relative_to(base.resolve()):
+        raise ValueError(f"Invalid image path: {relative_path}")
+    return path
+
+
+def resolve_served_image(
+    data_dir: Path,
+    relative_path: str,
+    tier: str = ORIGINAL,
+    version: str = "",
+) -> Tuple[Path, bool]:
+    """
+    File to serve for an image request, and whether it may be cached as immutable.
+
+    A thumbnail tier that has not been built yet falls back to the original.
+    The response is immutable only if `version` matches the original's content
+    hash *and* the requested tier itself is served: a fallback original has to
+    stay revalidatable, or the thumbnail built later never reaches clients.
+
+    Args:
+        data_dir: Data directory holding downloaded_pins/ and thumbnails/
+        relative_path: Path relative to downloaded_pins
+        tier: "original" or a THUMBNAIL_SIZES key
+        version: Content hash of the original pinned by the URL ("" if none)
+
+    Raises:
+        ValueError: If the tier is unknown or the path escapes the image directory
+        FileNotFoundError: If the original doesn't exist either
+    """
+    original_path = resolve_image_path(data_dir, relative_path)
+    image_path = resolve_image_path(data_dir, relative_path, tier)
+    fallback = tier != ORIGINAL and not image_path.exists()
+    if fallback:
+        image_path = original_path
+    if not image_path.exists():
+        raise FileNotFoundError(f"Image not found: {relative_path}")
+
+    immutable = bool(version) and not fallback and version == content_hash(original_path)
+    return image_path, immutable
+
+
+def mime_type(path: Path) -> str:
+    return MIME_TYPES.get(path.suffix.lower(), "application/octet-stream")
+
+
+def content_hash(path: Path) -> str:
+    """
+    SHA-256 of an image file, cached per (path, mtime, size).
+
+    Used as the stable ID of a search result and as the strong ETag of the
+    served bytes, so hot images are only hashed once per container.
+    """
+    stat = Path(path).stat()
+    return _cached_content_hash(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches an ETag (weak comparison).
+
+    The header is "*" or a comma-separated list of entity tags, each quoted
+    and optionally prefixed with W/; `etag` is the quoted current tag.
+    """
+    if not if_none_match:
+        return False
+    current = etag.removeprefix("W/").strip('"')
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/").strip('"') == current:
+            return True
+    return False
+
+
+@lru_cache(maxsize=65536)
+def _cached_content_hash(path: str, mtime_ns: int, size: int) -> str:
+    return file_content_hash(Path(path))
+
+
+def find_originals(data_dir: Path) -> List[str]:
+    """Sorted relative paths of every original image under downloaded_pins/."""
+    base = originals_dir(data_dir)
+    return sorted(
+        str(path.relative_to(base)) for path in base.rglob("*")
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS
+    )
+
+
+def is_up_to_date(data_dir: Path, relative_path: str, tiers: Iterable[str]) -> bool:
+    """True if every tier exists and is at least as new as the original."""
+    source_mtime = resolve_image_path(data_dir, relative_path).stat().st_mtime_ns
+    for tier in tiers:
+        thumb = resolve_image_path(data_dir, relative_path, tier)
+        if not thumb.exists() or thumb.stat().st_mtime_ns < source_mtime:
+            return False
+    return True
+
+
+def render_thumbnails(
+    data_dir: Path,
+    relative_path: str,
+    sizes: Optional[Dict[str, int]] = None,
+) -> Tuple[str, Optional[str]]:
+    """
+    Decode one original and write all of its tiers, largest first.
+
+    Each tier is downscaled from the previous one, and JPEG decoding uses
+    draft mode so big originals are decoded near the largest tier's size.
+
+    Returns:
+        (relative_path, error message or None)
+    """
+    sizes = sizes or THUMBNAIL_SIZES
+    try:
+        with Image.open(resolve_image_path(data_dir, relative_path)) as img:
+            largest = max(sizes.values())
+            img.draft("RGB", (largest, largest))
+            img = img.convert("RGB")
+
+            for tier, max_side in sorted(sizes.items(), key=lambda item: -item[1]):
+                img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+                out_path = resolve_image_path(data_dir, relative_path, tier)
+                out_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = out_path.with_name(out_path.name + ".tmp")
+                img.save(tmp_path, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+                os.replace(tmp_path, out_path)
+        return relative_path, None
+    except Exception as e:
+        return relative_path, str(e)
+
+
+def build_thumbnails(
+    data_dir: Path,
+    sizes: Optional[Dict[str, int]] = None,
+    workers: Optional[int] = None,
+    force: bool = False,
+) -> Dict[str, int]:
+    """
+    Build missing or outdated thumbnails for every original image.
+
+    Args:
+        data_dir: Data directory holding downloaded_pins/
+        sizes: Tier name -> longest side (default: THUMBNAIL_SIZES)
+        workers: Worker processes (default: os.cpu_count())
+        force: Rebuild even if thumbnails are up to date
+
+    Returns:
+        Counts: {"total", "built", "skipped", "failed"}
+    """
+    sizes = sizes or THUMBNAIL_SIZES
+    relative_paths = find_originals(data_dir)
+    todo = [p for p in relative_paths if force or not is_up_to_date(data_dir, p, sizes)]
+    counts = {"total": len(relative_paths), "built": 0,
+              "skipped": len(relative_paths) - len(todo), "failed": 0}
+    if not todo:
+        return counts
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(render_thumbnails, [data_dir] * len(todo), todo,
+                               [sizes] * len(todo), chunksize=16)
+        for i, (relative_path, error) in enumerate(results, 1):
+            if error is None:
+                counts["built"] += 1
+            else:
+                counts["failed"] += 1
+                print(f"  Failed: {relative_path}: {error}")
+            if i % 100 == 0 or i == len(todo):
+                print(f"  [{i}/{len(todo)}] thumbnails built")
+    return counts
@@ -0,0 +1,77 @@
+"""
+Numerical parity of the SAM 3D Body attention backends ("sdpa" fused kernels vs
+the explicit "math" reference) for the ViT backbone and the promptable decoder.
+Run with: pytest backend/test_attention_backends.py (needs the pose dependencies)
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+sys.path.insert(0, str(Path(__file__).parent / "pose"))
+
+transformer = pytest.importorskip("sam_3d_body.models.modules.transformer")
+
+ATOL = 1e-5
+
+
+@pytest.fixture(autouse=True)
+def restore_backend():
+    backend = transformer.get_attention_backend()
+    yield
+    transformer.set_attention_backend(backend)
+
+
+def run_with(backend, fn):
+    transformer.set_attention_backend(backend)
+    with torch.no_grad():
+        return fn()
+
+
+@pytest.mark.parametrize("mask", [None, "bool", "float"])
+def test_functional_parity(mask):
+    generator = torch.Generator().manual_seed(0)
+    q, k, v = (torch.randn(2, 4, 33, 16, generator=generator) for _ in range(3))
+    attn_mask = None
+    if mask == "bool":
+        attn_mask = torch.rand(2, 4, 33, 33, generator=generator) > 0.3
+        attn_mask[..., 0] = True  # every query attends to at least one key
+    elif mask == "float":
+        attn_mask = torch.randn(2, 4, 33, 33, generator=generator)
+
+    def attend():
+        return transformer.scaled_dot_product_attention(q, k, v, attn_mask=attn_mask, scale=0.2)
+
+    torch.testing.assert_close(run_with("sdpa", attend), run_with("math", attend), atol=ATOL, rtol=0)
+
+
+def test_decoder_attention_parity():
+    torch.manual_seed(0)
+    layer = transformer.Attention(embed_dims=64, num_heads=8).eval()
+    q, kv = torch.randn(3, 75, 64), torch.randn(3, 192, 64)
+    attn_mask = torch.rand(3, 75, 192) > 0.2
+    attn_mask[..., 0] = True
+
+    def attend():
+        return layer(q, kv, kv, attn_mask=attn_mask)
+
+    torch.testing.assert_close(run_with("sdpa", attend), run_with("math", attend), atol=ATOL, rtol=0)
+
+
+def test_vit_attention_parity():
+    vit = pytest.importorskip("sam_3d_body.models.backbones.vit")
+    torch.manual_seed(0)
+    layer = vit.Attention(dim=128, num_heads=8, qkv_bias=True).eval()
+    x = torch.randn(2, 192, 128)
+
+    def attend():
+        return layer(x)
+
+    torch.testing.assert_close(run_with("sdpa", attend), run_with("math", attend), atol=ATOL, rtol=0)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown attention backend"):
+        transformer.set_attention_backend("flash")
@@ -39,20 +39,22 @@ def main():
     print(f"\nGetting embeddings for {len(TEST_WORDS)} words...")
     embeddings_dict = {}
 
-    for word in TEST_WORDS:
-        try:
-            payload = {"text": word, "normalize": False}
-            response = requests.post(clip_endpoint_url, json=payload, timeout=60)
-            response.raise_for_status()
-            result = response.json()
+    # One request for all words (batched on the server)
+    try:
+        payload = {"text": TEST_WORDS, "normalize": False}
+        response = requests.post(clip_endpoint_url, json=payload, timeout=60)
+        response.raise_for_status()
+        result = response.json()
 
-            if result.get("success") and result.get("embedding"):
-                embeddings_dict[word] = result["embedding"]
+        if result.get("success") and result.get("embedding"):
+            # Keep the per-word [[...]] format of clip_text_embeddings.json
+            for word, embedding in zip(TEST_WORDS, result["embedding"]):
+                embeddings_dict[word] = [embedding]
                 print(f"  ✓ {word}")
-            else:
-                print(f"  ✗ {word}: {result.get('error', 'Unknown error')}")
-        except Exception as e:
-            print(f"  ✗ {word}: {e}")
+        else:
+            print(f"  ✗ {result.get('error', 'Unknown error')}")
+    except Exception as e:
+        print(f"  ✗ {e}")
 
     # Save to JSON
     output_path = Path(__file__).parent / "data" / "test" / "clip_text_embeddings.json"
@@ -0,0 +1,127 @@
+"""
+Tests for the memory-mapped embedding store (search.store): save / load round
+trip, embeddings.json conversion and rejection of damaged files.
+Run with: pytest backend/test_embedding_store.py
+"""
+import json
+
+import numpy as np
+import pytest
+
+from search.portrait import FULL_BODY_KEYWORDS, PORTRAIT_KEYWORDS, portrait_margins
+from search.store import (
+    CLIP_FILE,
+    MANIFEST_NAME,
+    POSE_FILE,
+    EmbeddingStore,
+    convert_embeddings_json,
+    file_content_hash,
+    load_embedding_store,
+)
+
+
+@pytest.fixture
+def store():
+    rng = np.random.default_rng(0)
+    return EmbeddingStore(
+        ["a/1.jpg", "b/2.png", "c/3.webp"],
+        rng.normal(size=(3, 8)).astype(np.float32),
+        rng.normal(size=(3, 5)).astype(np.float32),
+        metadata={"total_images": 4, "pose_pipeline": "test"},
+        portrait_margin=np.array([0.1, -0.2, 0.0], dtype=np.float32),
+    )
+
+
+def test_save_and_load_round_trip(store, tmp_path):
+    store.save(tmp_path)
+    loaded = load_embedding_store(tmp_path)
+
+    assert loaded.paths == store.paths
+    assert loaded.metadata == store.metadata
+    assert loaded.root == tmp_path
+    assert isinstance(loaded.pose, np.memmap) and isinstance(loaded.clip, np.memmap)
+    np.testing.assert_array_equal(loaded.pose, store.pose)
+    np.testing.assert_array_equal(loaded.clip, store.clip)
+    np.testing.assert_array_equal(loaded.portrait_margin, store.portrait_margin)
+
+    in_memory = load_embedding_store(tmp_path, mmap=False)
+    assert not isinstance(in_memory.pose, np.memmap)
+    np.testing.assert_array_equal(in_memory.pose, store.pose)
+
+
+def test_resave_changes_manifest_hash(store, tmp_path):
+    store.save(tmp_path)
+    first_hash = file_content_hash(tmp_path / MANIFEST_NAME)
+
+    store.pose[0, 0] += 1
+    store.save(tmp_path)
+
+    assert file_content_hash(tmp_path / MANIFEST_NAME) != first_hash
+    np.testing.assert_array_equal(load_embedding_store(tmp_path).pose, store.pose)
+
+
+def test_missing_manifest_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_embedding_store(tmp_path)
+
+
+def test_truncated_npy_is_rejected(store, tmp_path):
+    store.save(tmp_path)
+    data = (tmp_path / POSE_FILE).read_bytes()
+    (tmp_path / POSE_FILE).write_bytes(data[:-16])
+
+    for mmap in (True, False):
+        with pytest.raises(ValueError, match=POSE_FILE):
+            load_embedding_store(tmp_path, mmap=mmap)
+
+
+@pytest.mark.parametrize("array", [
+    np.zeros((2, 5), np.float32),    # rows from another save
+    np.zeros((3, 4), np.float32),    # wrong dimension
+    np.zeros((3, 5), np.float64),    # wrong dtype
+])
+def test_mismatched_npy_is_rejected(store, tmp_path, array):
+    store.save(tmp_path)
+    np.save(tmp_path / CLIP_FILE, array)
+
+    with pytest.raises(ValueError):
+        load_embedding_store(tmp_path)
+
+
+def test_mismatched_path_table_is_rejected(store, tmp_path):
+    store.save(tmp_path)
+    (tmp_path / "paths.json").write_text(json.dumps(store.paths[:2]))
+
+    with pytest.raises(ValueError, match="Path table"):
+        load_embedding_store(tmp_path)
+
+
+def test_convert_embeddings_json(tmp_path):
+    rng = np.random.default_rng(0)
+    embeddings = {
+        f"pins/{idx}.jpg": {
+            "pose_embedding": rng.normal(size=8).tolist(),
+            "clip_embedding": rng.normal(size=5).tolist(),
+        }
+        for idx in range(4)
+    }
+    # Skipped like the search loop skipped them: a missing and a mis-sized embedding
+    embeddings["pins/missing.jpg"] = {"pose_embedding": [0.0] * 8}
+    embeddings["pins/short.jpg"] = {"pose_embedding": [0.0] * 7, "clip_embedding": [0.0] * 5}
+    json_path = tmp_path / "embeddings.json"
+    json_path.write_text(json.dumps({"embeddings": embeddings, "metadata": {"failed": 1}}))
+    text_embeddings = {k: rng.normal(size=5).astype(np.float32)
+                       for k in PORTRAIT_KEYWORDS + FULL_BODY_KEYWORDS}
+
+    store = convert_embeddings_json(json_path, tmp_path / "store", text_embeddings)
+
+    expected_paths = [f"pins/{idx}.jpg" for idx in range(4)]
+    assert store.paths == expected_paths
+    assert store.metadata == {"failed": 1, "converted_from": "embeddings.json"}
+    np.testing.assert_allclose(
+        store.pose, np.array([embeddings[p]["pose_embedding"] for p in expected_paths]), rtol=1e-6)
+    np.testing.assert_allclose(
+        store.clip, np.array([embeddings[p]["clip_embedding"] for p in expected_paths]), rtol=1e-6)
+    np.testing.assert_allclose(store.portrait_margin,
+                               portrait_margins(store.clip, text_embeddings), rtol=1e-6)
+    assert load_embedding_store(tmp_path / "store").paths == expected_paths
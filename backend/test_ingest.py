@@ -0,0 +1,80 @@
+"""
+Offline tests for batched ingestion embeddings (search.ingest), using the CPU
+stand-ins for the remote model classes.
+Run with: pytest backend/test_ingest.py
+"""
+import time
+
+import numpy as np
+import pytest
+
+from search.ingest import NO_PERSON_ERROR, extract_image_embeddings
+from search.local_models import LocalClip, LocalPoseEmbedding, LocalSAM3DBody
+
+LATENCY = 0.2
+
+
+class BlankMeansNobody(LocalSAM3DBody):
+    """Detects nobody in all-black images."""
+
+    def _pose_dict(self, image):
+        return super()._pose_dict(image) if image.any() else {}
+
+
+@pytest.fixture
+def images():
+    rng = np.random.default_rng(0)
+    images = [rng.integers(1, 255, (40 + 8 * idx, 32, 3), dtype=np.uint8) for idx in range(5)]
+    images[2] = np.zeros((48, 48, 3), dtype=np.uint8)
+    return images
+
+
+def test_matches_per_image_calls(images):
+    pose_model, pose_embedder, clip_model = BlankMeansNobody(), LocalPoseEmbedding(), LocalClip()
+    results = extract_image_embeddings(images, pose_model, pose_embedder, clip_model)
+
+    assert len(results) == len(images)
+    for image, result in zip(images, results):
+        pose_dict = pose_model.predict_2d_pose.remote(image=image, use_bbox_detector=True)
+        if not pose_dict:
+            assert result == {"pose_embedding": None, "clip_embedding": None,
+                              "error": NO_PERSON_ERROR}
+            continue
+        expected_pose = pose_embedder.extract_embedding.remote(pose_dict=pose_dict,
+                                                               img_shape=image.shape[:2])
+        expected_clip = clip_model.encode_image.remote(image=image, normalize=False)[0]
+        assert result["error"] is None
+        np.testing.assert_array_equal(result["pose_embedding"], expected_pose)
+        np.testing.assert_array_equal(result["clip_embedding"], expected_clip)
+
+
+def test_one_call_per_model_per_batch(images):
+    models = BlankMeansNobody(), LocalPoseEmbedding(), LocalClip()
+    extract_image_embeddings(images, *models)
+    assert [model.calls for model in models] == [1, 1, 1]
+
+
+def test_no_person_in_the_whole_batch_skips_the_embedder(images):
+    pose_embedder = LocalPoseEmbedding()
+    results = extract_image_embeddings(images, LocalSAM3DBody(detect_person=False),
+                                       pose_embedder, LocalClip())
+
+    assert [result["error"] for result in results] == [NO_PERSON_ERROR] * len(images)
+    assert pose_embedder.calls == 0
+
+
+def test_clip_runs_concurrently_with_pose_chain(images):
+    models = LocalSAM3DBody(LATENCY), LocalPoseEmbedding(LATENCY), LocalClip(2 * LATENCY)
+
+    start_time = time.perf_counter()
+    extract_image_embeddings(images, *models)
+    elapsed = time.perf_counter() - start_time
+
+    # max(pose chain, CLIP) = 2 * LATENCY, the sequential sum would be 4 * LATENCY
+    assert elapsed < 3 * LATENCY
+
+
+def test_empty_batch_makes_no_calls():
+    models = LocalSAM3DBody(), LocalPoseEmbedding(), LocalClip()
+    assert extract_image_embeddings([], *models) == []
+    assert [model.calls for model in models] == [0, 0, 0]
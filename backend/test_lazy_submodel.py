@@ -0,0 +1,66 @@
+"""
+Tests for the lazily loaded optional SAM 3D Body submodels.
+Run with: pytest backend/test_lazy_submodel.py
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "pose"))
+
+from tools.lazy_submodel import LazySubmodel  # noqa: E402
+
+
+class FakeDetector:
+    def __init__(self, load_latency: float = 0.0):
+        time.sleep(load_latency)
+
+    def run_human_detection(self, img):
+        return [[0, 0, 10, 10]]
+
+
+def test_loads_on_first_use_only():
+    builds = []
+    detector = LazySubmodel("detector", lambda: builds.append(1) or FakeDetector())
+    assert not detector.loaded and detector.load_time is None
+
+    assert detector.run_human_detection(None) == [[0, 0, 10, 10]]
+    detector.run_human_detection(None)
+
+    assert builds == [1]
+    assert detector.loaded and detector.load_time >= 0
+
+
+def test_concurrent_first_use_builds_once():
+    builds = []
+    detector = LazySubmodel("detector", lambda: builds.append(1) or FakeDetector(0.05))
+    threads = [threading.Thread(target=detector.get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert builds == [1]
+
+
+def test_prefetch_loads_in_background():
+    detector = LazySubmodel("detector", lambda: FakeDetector(0.05))
+    thread = detector.prefetch()
+    assert not detector.loaded
+    thread.join()
+    assert detector.loaded and detector.load_time >= 0.05
+
+
+def test_failed_prefetch_retries_on_use():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("checkpoint missing")
+        return FakeDetector()
+
+    detector = LazySubmodel("detector", factory)
+    detector.prefetch().join()
+    assert not detector.loaded
+    assert detector.get() is not None and len(attempts) == 2
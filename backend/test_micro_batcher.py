@@ -0,0 +1,125 @@
+"""
+Tests for the cross-request micro-batching queue of SAM3DBodyInference.
+Run with: pytest backend/test_micro_batcher.py
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "pose"))
+
+from search.local_models import LocalSAM3DBody  # noqa: E402
+from tools.micro_batcher import MicroBatcher  # noqa: E402
+
+
+class RecordingModel:
+    """Batched function that records the batches it ran."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        time.sleep(self.latency)
+        return [item * 10 for item in items]
+
+
+def test_coalesces_requests_within_window():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=16, max_wait=0.2)
+    futures = [batcher.submit(item) for item in range(5)]
+
+    assert [future.result(timeout=5) for future in futures] == [0, 10, 20, 30, 40]
+    assert model.batches == [[0, 1, 2, 3, 4]]
+    batcher.close()
+
+
+def test_full_batch_does_not_wait_for_window():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=4, max_wait=10.0)
+
+    start_time = time.perf_counter()
+    futures = [batcher.submit(item) for item in range(8)]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert time.perf_counter() - start_time < 5
+    assert results == [item * 10 for item in range(8)]
+    assert [len(batch) for batch in model.batches] == [4, 4]
+    batcher.close()
+
+
+def test_concurrent_callers_get_their_own_results():
+    model = RecordingModel(latency=0.01)
+    batcher = MicroBatcher(model, max_batch_size=8, max_wait=0.005)
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(batcher, range(200)))
+
+    assert results == [item * 10 for item in range(200)]
+    assert max(len(batch) for batch in model.batches) > 1
+    stats = batcher.stats()
+    assert stats["requests"] == 200 and stats["pending"] == 0
+    assert stats["batches"] == len(model.batches)
+    assert sum(stats["batch_size_histogram"].values()) == stats["batches"]
+    assert max(stats["batch_size_histogram"]) <= 8
+    assert sum(stats["queue_depth_histogram"].values()) == stats["batches"]
+    batcher.close()
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    def fails_on_negative(items):
+        if min(items) < 0:
+            raise ValueError("model failed")
+        return [item * 10 for item in items]
+
+    batcher = MicroBatcher(fails_on_negative, max_wait=0.05)
+    futures = [batcher.submit(item) for item in (1, -1, 2)]
+    for future in futures:
+        with pytest.raises(ValueError, match="model failed"):
+            future.result(timeout=5)
+
+    # The worker keeps serving later batches
+    assert batcher(1) == 10
+    batcher.close()
+
+
+def test_result_count_mismatch_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:-1], max_wait=0.05)
+    futures = [batcher.submit(item) for item in range(2)]
+    with pytest.raises(RuntimeError, match="1 results for 2 items"):
+        futures[0].result(timeout=5)
+    batcher.close()
+
+
+def test_close_drains_queue():
+    release = threading.Event()
+    model = RecordingModel()
+
+    def blocking(items):
+        release.wait(5)
+        return model(items)
+
+    batcher = MicroBatcher(blocking, max_batch_size=2, max_wait=0.0)
+    futures = [batcher.submit(item) for item in range(5)]
+    release.set()
+    batcher.close()
+
+    assert [future.result(timeout=0) for future in futures] == [0, 10, 20, 30, 40]
+    with pytest.raises(RuntimeError):
+        batcher.submit(5)
+
+
+def test_batched_stand_in_matches_single_calls():
+    model = LocalSAM3DBody()
+    images = [np.full((32, 24, 3), value, dtype=np.uint8) for value in range(4)]
+    batcher = MicroBatcher(model.predict_2d_poses.remote, max_wait=0.05)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        batched = list(pool.map(batcher, images))
+    batcher.close()
+
+    assert batched == [model.predict_2d_pose.remote(image) for image in images]
@@ -0,0 +1,82 @@
+"""
+Tests for corpus-wide portrait margins against the per-embedding classifier
+they replaced.
+Run with: pytest backend/test_portrait.py
+"""
+import numpy as np
+import pytest
+
+from search.portrait import (
+    FULL_BODY_KEYWORDS,
+    PORTRAIT_KEYWORDS,
+    portrait_margins,
+    portrait_mask,
+)
+
+
+def cosine_similarity(a, b):
+    """Scalar cosine similarity, as in the original modal_api.cosine_similarity."""
+    a = np.asarray(a, dtype=np.float32).flatten()
+    b = np.asarray(b, dtype=np.float32).flatten()
+    norm_a = np.linalg.norm(a)
+    norm_b = np.linalg.norm(b)
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return float(np.dot(a, b) / (norm_a * norm_b))
+
+
+def reference_margin(image_embedding, text_embeddings):
+    """The original per-image is_portrait_embedding, returning its margin."""
+    portrait = [cosine_similarity(image_embedding, text_embeddings[k])
+                for k in PORTRAIT_KEYWORDS if k in text_embeddings]
+    full_body = [cosine_similarity(image_embedding, text_embeddings[k])
+                 for k in FULL_BODY_KEYWORDS if k in text_embeddings]
+    if not portrait or not full_body:
+        return None
+    return max(portrait) - max(full_body)
+
+
+@pytest.fixture
+def text_embeddings():
+    rng = np.random.default_rng(0)
+    keywords = PORTRAIT_KEYWORDS + FULL_BODY_KEYWORDS + ["unrelated"]
+    return {k: rng.normal(size=64).astype(np.float32) * rng.uniform(0.5, 2) for k in keywords}
+
+
+@pytest.fixture
+def images(text_embeddings):
+    rng = np.random.default_rng(1)
+    images = rng.normal(size=(40, 64)).astype(np.float32) * rng.uniform(0.1, 10, (40, 1))
+    # Some images close to a keyword, so both classes occur
+    images[:5] += 5 * text_embeddings["headshot"]
+    images[5:10] += 5 * text_embeddings["full body"]
+    images[10] = 0.0
+    return images
+
+
+def test_margins_match_per_image_classification(images, text_embeddings):
+    margins = portrait_margins(images, text_embeddings)
+
+    expected = np.array([reference_margin(image, text_embeddings) for image in images])
+    np.testing.assert_allclose(margins, expected, rtol=1e-5, atol=1e-6)
+    assert margins[:5].min() > 0 > margins[5:10].max()
+
+
+@pytest.mark.parametrize("threshold", [-0.1, 0.0, 0.05, 0.2])
+def test_mask_keeps_non_portraits(images, text_embeddings, threshold):
+    mask = portrait_mask(portrait_margins(images, text_embeddings), threshold)
+
+    for image, keep in zip(images, mask):
+        margin = reference_margin(image, text_embeddings)
+        if abs(margin - threshold) > 1e-5:
+            # is_portrait_embedding: max_portrait_sim > max_full_body_sim + threshold
+            assert keep == (not margin > threshold)
+
+
+def test_missing_keyword_group_gives_no_margins(images, text_embeddings):
+    portrait_only = {k: text_embeddings[k] for k in PORTRAIT_KEYWORDS}
+    assert portrait_margins(images, portrait_only) is None
+    # A partial group still works
+    partial = {k: v for k, v in text_embeddings.items() if k != "a portrait"}
+    expected = [reference_margin(image, partial) for image in images]
+    np.testing.assert_allclose(portrait_margins(images, partial), expected, rtol=1e-5, atol=1e-6)
@@ -0,0 +1,83 @@
+"""
+Packing of several images' person crops into one SAM 3D Body batch
+(prepare_batch.pack_person_crops / slice_batch, used by process_images).
+Run with: pytest backend/test_pose_batching.py (needs the pose dependencies)
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+sys.path.insert(0, str(Path(__file__).parent / "pose"))
+
+prepare_batch_module = pytest.importorskip("sam_3d_body.data.utils.prepare_batch")
+prepare_batch = prepare_batch_module.prepare_batch
+pack_person_crops = prepare_batch_module.pack_person_crops
+slice_batch = prepare_batch_module.slice_batch
+
+CROP_SIZE = 8
+
+
+def fake_transform(data_info):
+    """Stand-in for the estimator's crop transform: fixed-size crop of the box."""
+    x1, y1, x2, y2 = data_info["bbox"]
+    img = data_info["img"]
+    return {
+        "img": torch.full((3, CROP_SIZE, CROP_SIZE), float(img.mean())),
+        "bbox": np.asarray(data_info["bbox"], dtype=np.float32),
+        "bbox_center": np.array([(x1 + x2) / 2, (y1 + y2) / 2], dtype=np.float32),
+        "bbox_scale": np.array([x2 - x1, y2 - y1], dtype=np.float32),
+        "img_size": np.array([CROP_SIZE, CROP_SIZE], dtype=np.float32),
+        "ori_img_size": np.array(img.shape[1::-1], dtype=np.float32),
+        "affine_trans": np.eye(2, 3, dtype=np.float32),
+        "mask": data_info["mask"][:CROP_SIZE, :CROP_SIZE, 0],
+        "mask_score": data_info["mask_score"],
+        "bbox_format": data_info["bbox_format"],
+    }
+
+
+def make_batches():
+    images = [np.full((20, 30, 3), value, dtype=np.uint8) for value in (1, 2, 3)]
+    boxes = [
+        np.array([[0, 0, 10, 10], [5, 5, 20, 15]], dtype=np.float32),
+        np.array([[1, 2, 3, 4]], dtype=np.float32),
+        np.array([[0, 0, 30, 20], [2, 2, 8, 8], [4, 4, 9, 9]], dtype=np.float32),
+    ]
+    return images, boxes, [prepare_batch(img, fake_transform, b) for img, b in zip(images, boxes)]
+
+
+def test_pack_person_crops_layout():
+    images, boxes, batches = make_batches()
+    packed = pack_person_crops(batches)
+
+    assert packed["img"].shape == (6, 1, 3, CROP_SIZE, CROP_SIZE)
+    assert packed["person_valid"].shape == (6, 1)
+    assert packed["mask"].shape == (6, 1, 1, CROP_SIZE, CROP_SIZE)
+    assert packed["cam_int"].shape == (6, 3, 3)
+    assert len(packed["img_ori"]) == len(packed["bbox_format"]) == 6
+    # The model flattens (batch, person) with .view
+    assert packed["img"].is_contiguous()
+
+    # Crops keep their own box, image and intrinsics
+    np.testing.assert_array_equal(packed["bbox"][:, 0].numpy(), np.concatenate(boxes))
+    owners = [0, 0, 1, 2, 2, 2]
+    assert [float(crop[0, 0, 0, 0]) for crop in packed["img"]] == [owners[i] + 1.0 for i in range(6)]
+    for crop, owner in enumerate(owners):
+        assert packed["img_ori"][crop].data is images[owner]
+        torch.testing.assert_close(packed["cam_int"][crop], batches[owner]["cam_int"][0])
+
+
+def test_slice_batch():
+    _, _, batches = make_batches()
+    packed = pack_person_crops(batches)
+    chunks = [slice_batch(packed, start, start + 4) for start in (0, 4)]
+
+    assert [len(chunk["img"]) for chunk in chunks] == [4, 2]
+    for key, value in packed.items():
+        if isinstance(value, torch.Tensor):
+            torch.testing.assert_close(torch.cat([chunk[key] for chunk in chunks]), value)
+        else:
+            assert sum((chunk[key] for chunk in chunks), []) == value
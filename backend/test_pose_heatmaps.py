@@ -0,0 +1,118 @@
+"""
+Equivalence tests for the vectorized GeneratePoseTarget heatmap backends against
+the reference per-keypoint / per-limb loop.
+Run with: pytest backend/test_pose_heatmaps.py (needs mmcv, mmengine and torch)
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("mmcv")
+torch = pytest.importorskip("torch")
+
+sys.path.insert(0, str(Path(__file__).parent / "pose_embed"))
+
+from mmaction.datasets.transforms.pose_transforms import GeneratePoseTarget  # noqa: E402
+
+
+def make_results(num_person=2, num_frame=6, num_kp=17, img_shape=(48, 64),
+                 score_dtype=np.float32, seed=0):
+    rng = np.random.default_rng(seed)
+    height, width = img_shape
+    # Include keypoints on and beyond the borders so windows get clipped
+    kps = rng.uniform(-3, max(height, width) + 3, (num_person, num_frame, num_kp, 2))
+    kps = kps.astype(np.float32)
+    kps[0, 0, 0] = [0.0, 0.0]
+    kps[0, 0, 1] = [width - 0.8, height + 1.8]
+    if num_person > 1:
+        # Overlapping Gaussians of two persons on the same keypoint channel
+        kps[1, :, 2] = kps[0, :, 2] + 0.3
+    # Limbs (0, 1) and (1, 3) shorter than a pixel: drawn as keypoint Gaussians
+    kps[:, :, 1] = kps[:, :, 0] + 0.4
+    kps[:, 0, 3] = kps[:, 0, 1]
+    scores = rng.uniform(0, 1, (num_person, num_frame, num_kp)).astype(score_dtype)
+    scores[..., :2] = 5e-5  # below eps, skipped
+    return dict(keypoint=kps, keypoint_score=scores, img_shape=img_shape)
+
+
+@pytest.mark.parametrize("kwargs", [
+    dict(),
+    dict(sigma=1.3),
+    dict(use_score=False),
+    dict(scaling=0.5),
+    dict(max_chunk_size=1000),
+])
+def test_numpy_backend_is_bit_identical(kwargs):
+    results = make_results()
+    expected = GeneratePoseTarget(backend="loop", **kwargs).gen_an_aug(dict(results))
+    actual = GeneratePoseTarget(backend="numpy", **kwargs).gen_an_aug(dict(results))
+    assert actual.dtype == expected.dtype
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_numpy_backend_float64_scores():
+    results = make_results(score_dtype=np.float64)
+    expected = GeneratePoseTarget(backend="loop").gen_an_aug(dict(results))
+    np.testing.assert_array_equal(GeneratePoseTarget(backend="numpy").gen_an_aug(dict(results)),
+                                  expected)
+
+
+def test_torch_backend_matches_loop():
+    results = make_results()
+    expected = GeneratePoseTarget(backend="loop").gen_an_aug(dict(results))
+    actual = GeneratePoseTarget(backend="torch", device="cpu").gen_an_aug(dict(results))
+    assert isinstance(actual, torch.Tensor)
+    np.testing.assert_allclose(actual.numpy(), expected, rtol=1e-6, atol=1e-7)
+
+
+@pytest.mark.parametrize("backend", ["numpy", "torch"])
+def test_double_flips_like_loop(backend):
+    results = make_results(num_person=1, num_frame=4)
+    expected = GeneratePoseTarget(backend="loop", double=True).transform(dict(results))["imgs"]
+    actual = GeneratePoseTarget(backend=backend, double=True).transform(dict(results))["imgs"]
+    np.testing.assert_allclose(np.asarray(actual), expected, rtol=1e-6, atol=1e-7)
+
+
+@pytest.mark.parametrize("kwargs", [
+    dict(),
+    dict(with_kp=True),
+    dict(sigma=1.3),
+    dict(use_score=False),
+    dict(max_chunk_size=500),
+])
+def test_limb_heatmaps_are_bit_identical(kwargs):
+    kwargs = dict(dict(with_kp=False, with_limb=True), **kwargs)
+    results = make_results()
+    expected = GeneratePoseTarget(backend="loop", **kwargs).gen_an_aug(dict(results))
+    actual = GeneratePoseTarget(backend="numpy", **kwargs).gen_an_aug(dict(results))
+    np.testing.assert_array_equal(actual, expected)
+
+
+def random_poses(seed, low, high, num_person=2, num_frame=4, img_shape=(48, 64)):
+    """Unconstrained random poses with keypoints uniform in [low, high)."""
+    rng = np.random.default_rng(seed)
+    kps = rng.uniform(low, high, (num_person, num_frame, 17, 2)).astype(np.float32)
+    scores = rng.uniform(0, 1, (num_person, num_frame, 17)).astype(np.float32)
+    return dict(keypoint=kps, keypoint_score=scores, img_shape=img_shape)
+
+
+# Small boxes give short limbs, where rounding of the squared limb length shows
+@pytest.mark.parametrize("low, high", [(10, 30), (20, 23), (-3, 67)])
+@pytest.mark.parametrize("with_kp, with_limb", [(True, False), (False, True), (True, True)])
+@pytest.mark.parametrize("seed", range(40))
+def test_numpy_backend_bit_identical_on_random_poses(seed, with_kp, with_limb, low, high):
+    results = random_poses(seed, low, high)
+    kwargs = dict(with_kp=with_kp, with_limb=with_limb)
+    expected = GeneratePoseTarget(backend="loop", **kwargs).gen_an_aug(dict(results))
+    actual = GeneratePoseTarget(backend="numpy", **kwargs).gen_an_aug(dict(results))
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_limb_heatmaps_float64_scores():
+    results = make_results(score_dtype=np.float64)
+    kwargs = dict(with_kp=False, with_limb=True)
+    expected = GeneratePoseTarget(backend="loop", **kwargs).gen_an_aug(dict(results))
+    np.testing.assert_array_equal(
+        GeneratePoseTarget(backend="numpy", **kwargs).gen_an_aug(dict(results)), expected)
@@ -0,0 +1,81 @@
+"""
+Tests for the query-embedding cache (LRU, TTL, persistence, keys).
+Run with: pytest backend/test_query_cache.py
+"""
+import numpy as np
+
+from search.query_cache import QueryEmbeddingCache, array_key, text_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_text_key_normalizes():
+    assert text_key("A  person\n") == text_key("a person")
+    assert text_key("a person") != text_key("a dancer")
+    assert text_key("a person", namespace="x") != text_key("a person")
+
+
+def test_array_key_depends_on_pixels_and_shape():
+    image = np.zeros((4, 6, 3), dtype=np.uint8)
+    assert array_key(image) == array_key(image.copy())
+    assert array_key(image) != array_key(image.reshape(6, 4, 3))
+    changed = image.copy()
+    changed[0, 0, 0] = 1
+    assert array_key(image) != array_key(changed)
+
+
+def test_hit_miss_counters_and_lru_eviction():
+    cache = QueryEmbeddingCache(max_entries=2)
+    assert cache.get("a") is None
+    cache.put("a", np.ones(3))
+    cache.put("b", np.zeros(3))
+    np.testing.assert_array_equal(cache.get("a"), np.ones(3))
+    # "b" is now least recently used
+    cache.put("c", np.full(3, 2.0))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 2)
+
+
+def test_ttl_expires_entries():
+    clock = FakeClock()
+    cache = QueryEmbeddingCache(ttl=10.0, clock=clock)
+    cache.put("a", np.ones(3))
+    clock.now += 5
+    assert cache.get("a") is not None
+    clock.now += 6
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_persisted_entries_are_shared(tmp_path):
+    writer = QueryEmbeddingCache(persist_dir=tmp_path)
+    writer.put("a", np.arange(4))
+
+    reader = QueryEmbeddingCache(persist_dir=tmp_path)
+    value = reader.get("a")
+    np.testing.assert_array_equal(value, np.arange(4, dtype=np.float32))
+    assert reader.stats()["disk_hits"] == 1
+    # Served from memory after the first disk hit
+    reader.get("a")
+    assert reader.stats()["disk_hits"] == 1
+
+
+def test_get_or_compute_calls_once():
+    cache = QueryEmbeddingCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return np.ones(2)
+
+    cache.get_or_compute("a", compute)
+    cache.get_or_compute("a", compute)
+    assert len(calls) == 1
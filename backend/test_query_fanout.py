@@ -0,0 +1,82 @@
+"""
+Offline tests for the concurrent pose / CLIP query-embedding fan-out, using the
+CPU stand-ins for the remote model classes.
+Run with: pytest backend/test_query_fanout.py
+"""
+import time
+
+import numpy as np
+import pytest
+
+from search.local_models import LocalClip, LocalPoseEmbedding, LocalSAM3DBody
+from search.query import QueryEmbeddingError, extract_query_embeddings
+from search.query_cache import QueryEmbeddingCache, array_key, text_key
+
+LATENCY = 0.2
+
+
+@pytest.fixture
+def sketch():
+    image = np.random.default_rng(0).integers(0, 255, (64, 48, 3), dtype=np.uint8)
+    return image, image.shape[:2]
+
+
+def test_clip_runs_concurrently_with_pose_chain(sketch):
+    image, shape = sketch
+    models = LocalSAM3DBody(LATENCY), LocalPoseEmbedding(LATENCY), LocalClip(2 * LATENCY)
+
+    start_time = time.perf_counter()
+    extract_query_embeddings(image, shape, "a person", *models)
+    elapsed = time.perf_counter() - start_time
+
+    # max(pose chain, CLIP) = 2 * LATENCY, the sequential sum would be 4 * LATENCY
+    assert elapsed < 3 * LATENCY
+
+
+def test_matches_sequential_calls(sketch):
+    image, shape = sketch
+    pose_model, pose_embedder, clip_model = LocalSAM3DBody(), LocalPoseEmbedding(), LocalClip()
+    P_A, C_A = extract_query_embeddings(image, shape, "a person", pose_model, pose_embedder, clip_model)
+
+    pose_dict = pose_model.predict_2d_pose.remote(image=image, use_bbox_detector=True)
+    expected_pose = pose_embedder.extract_embedding.remote(pose_dict=pose_dict, img_shape=shape)
+    expected_clip = clip_model.encode_text.remote(texts="a person", normalize=False)[0]
+    np.testing.assert_array_equal(P_A, expected_pose)
+    np.testing.assert_array_equal(C_A, expected_clip)
+
+
+def test_no_person_detected(sketch):
+    image, shape = sketch
+    with pytest.raises(QueryEmbeddingError, match="No person detected"):
+        extract_query_embeddings(image, shape, "a person", LocalSAM3DBody(detect_person=False),
+                                 LocalPoseEmbedding(), LocalClip())
+
+
+def test_cache_skips_model_calls(sketch):
+    image, shape = sketch
+    cache = QueryEmbeddingCache()
+    pose_model, pose_embedder, clip_model = LocalSAM3DBody(), LocalPoseEmbedding(), LocalClip()
+
+    first = extract_query_embeddings(image, shape, "a person", pose_model, pose_embedder,
+                                     clip_model, cache=cache)
+    second = extract_query_embeddings(image, shape, "  A person ", pose_model, pose_embedder,
+                                      clip_model, cache=cache)
+
+    assert (pose_model.calls, pose_embedder.calls, clip_model.calls) == (1, 1, 1)
+    np.testing.assert_array_equal(first[0], second[0])
+    np.testing.assert_array_equal(first[1], second[1])
+
+
+def test_cache_ignores_entries_from_older_pipelines(sketch):
+    image, shape = sketch
+    cache = QueryEmbeddingCache()
+    # Entries written under the unversioned namespaces of an earlier pipeline
+    cache.put(array_key(image, namespace="pose_sketch_bbox"), np.zeros(512, np.float32))
+    cache.put(text_key("a person", namespace="clip_text"), np.zeros(512, np.float32))
+    pose_model, pose_embedder, clip_model = LocalSAM3DBody(), LocalPoseEmbedding(), LocalClip()
+
+    P_A, C_A = extract_query_embeddings(image, shape, "a person", pose_model, pose_embedder,
+                                        clip_model, cache=cache)
+
+    assert (pose_model.calls, pose_embedder.calls, clip_model.calls) == (1, 1, 1)
+    assert P_A.any() and C_A.any()
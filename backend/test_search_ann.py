@@ -0,0 +1,145 @@
+"""
+Tests for the IVF approximate nearest neighbour search (search.ann) against
+brute-force HybridScorer search.
+Run with: pytest backend/test_search_ann.py
+"""
+import numpy as np
+import pytest
+
+from search.ann import (
+    HybridANNSearcher,
+    IVFFlatIndex,
+    build_ann_indexes,
+    load_ann_indexes,
+    save_ann_indexes,
+)
+from search.scoring import HybridScorer
+from search.store import EmbeddingStore, file_content_hash
+
+N_LISTS = 16
+
+
+def clustered(rng, n, dim, n_clusters=20, spread=0.3):
+    """Rows around random centers, like real embeddings (IVF relies on clusters)."""
+    centers = rng.normal(size=(n_clusters, dim))
+    return (centers[rng.integers(0, n_clusters, n)]
+            + spread * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(0)
+    scorer = HybridScorer(clustered(rng, 2000, 32), clustered(rng, 2000, 48))
+    indexes = build_ann_indexes(scorer, "numpy", n_lists=N_LISTS)
+    # Queries near corpus rows, as real sketches and texts land in the clusters
+    rows = rng.choice(len(scorer), 20, replace=False)
+    queries = [(scorer.pose[row] + 0.1 * rng.normal(size=32).astype(np.float32),
+                scorer.clip[row] + 0.1 * rng.normal(size=48).astype(np.float32))
+               for row in rows]
+    return scorer, indexes, queries
+
+
+def test_ivf_lists_partition_the_rows(corpus):
+    scorer, indexes, _ = corpus
+    for modality in ("pose", "clip"):
+        index = indexes[modality]
+        assert index.n_lists == N_LISTS
+        assert index.offsets[-1] == len(scorer)
+        np.testing.assert_array_equal(np.sort(index.list_ids), np.arange(len(scorer)))
+
+
+def test_ivf_scanning_every_list_is_exact(corpus):
+    scorer, indexes, _ = corpus
+    query = scorer.pose[0]
+    ids, scores = indexes["pose"].search(scorer.pose, query, 10, nprobe=N_LISTS)
+    expected = np.argsort(-(scorer.pose @ query), kind="stable")[:10]
+    np.testing.assert_array_equal(np.sort(ids), np.sort(expected))
+    np.testing.assert_allclose(scores, scorer.pose[ids] @ query, rtol=1e-6)
+
+
+@pytest.mark.parametrize("lambda_param", [0.0, 0.5, 1.0])
+def test_recall_against_brute_force(corpus, lambda_param):
+    scorer, indexes, queries = corpus
+    # One list per modality: candidates are approximate, recall stays high
+    searcher = HybridANNSearcher(scorer, indexes, nprobe=1, candidates=100)
+    k = 10
+    hits = 0
+    for pose_query, clip_query in queries:
+        ids, _ = searcher.search(pose_query, clip_query, lambda_param, k)
+        exact_ids, _ = scorer.search(pose_query, clip_query, lambda_param, k)
+        hits += len(np.intersect1d(ids, exact_ids))
+    assert hits / (k * len(queries)) >= 0.95
+
+
+def test_all_lists_match_brute_force(corpus):
+    scorer, indexes, queries = corpus
+    searcher = HybridANNSearcher(scorer, indexes, nprobe=N_LISTS, candidates=100)
+    for pose_query, clip_query in queries:
+        ids, scores = searcher.search(pose_query, clip_query, 0.5, 10)
+        exact_ids, exact_scores = scorer.search(pose_query, clip_query, 0.5, 10)
+        np.testing.assert_array_equal(ids, exact_ids)
+        np.testing.assert_allclose(scores, exact_scores, rtol=1e-5, atol=1e-6)
+
+
+def test_reranked_scores_are_exact(corpus):
+    scorer, indexes, queries = corpus
+    searcher = HybridANNSearcher(scorer, indexes, nprobe=2, candidates=50)
+    for pose_query, clip_query in queries:
+        ids, scores = searcher.search(pose_query, clip_query, 0.3, 10)
+        exact = scorer.score(pose_query, clip_query, 0.3)[ids]
+        np.testing.assert_allclose(scores, exact, rtol=1e-5, atol=1e-6)
+        assert np.all(np.diff(scores) <= 0)
+
+
+def test_mask_is_respected(corpus):
+    scorer, indexes, queries = corpus
+    searcher = HybridANNSearcher(scorer, indexes, nprobe=4, candidates=100)
+    mask = np.zeros(len(scorer), dtype=bool)
+    mask[::2] = True
+    for pose_query, clip_query in queries:
+        ids, _ = searcher.search(pose_query, clip_query, 0.5, 10, mask=mask)
+        assert len(ids) == 10
+        assert mask[ids].all()
+
+
+def test_sparse_mask_falls_back_to_brute_force(corpus, monkeypatch):
+    scorer, indexes, queries = corpus
+    searcher = HybridANNSearcher(scorer, indexes, nprobe=1, candidates=10)
+    # Too few allowed rows for the probed lists to hold k of them
+    mask = np.zeros(len(scorer), dtype=bool)
+    mask[np.random.default_rng(1).choice(len(scorer), 12, replace=False)] = True
+    pose_query, clip_query = queries[0]
+    exact_ids, exact_scores = scorer.search(pose_query, clip_query, 0.5, 10, mask=mask)
+
+    brute_force_calls = []
+    search = scorer.search
+    monkeypatch.setattr(scorer, "search",
+                        lambda *args, **kwargs: brute_force_calls.append(1) or search(*args, **kwargs))
+    ids, scores = searcher.search(pose_query, clip_query, 0.5, 10, mask=mask)
+
+    assert brute_force_calls == [1]
+    np.testing.assert_array_equal(ids, exact_ids)
+    np.testing.assert_allclose(scores, exact_scores, rtol=1e-6)
+
+
+def test_save_and_load_round_trip(corpus, tmp_path):
+    scorer, indexes, _ = corpus
+    EmbeddingStore([f"{idx}.jpg" for idx in range(len(scorer))],
+                   scorer.pose, scorer.clip).save(tmp_path)
+    save_ann_indexes(tmp_path, indexes, {"n_lists": N_LISTS})
+
+    loaded = load_ann_indexes(tmp_path, store_hash=file_content_hash(tmp_path / "manifest.json"))
+    assert isinstance(loaded["pose"], IVFFlatIndex)
+    for modality in ("pose", "clip"):
+        np.testing.assert_array_equal(loaded[modality].list_ids, indexes[modality].list_ids)
+        np.testing.assert_array_equal(loaded[modality].centroids, indexes[modality].centroids)
+
+
+def test_stale_store_hash_is_ignored(corpus, tmp_path):
+    scorer, indexes, _ = corpus
+    EmbeddingStore([f"{idx}.jpg" for idx in range(len(scorer))],
+                   scorer.pose, scorer.clip).save(tmp_path)
+    save_ann_indexes(tmp_path, indexes, {"n_lists": N_LISTS})
+
+    assert load_ann_indexes(tmp_path, store_hash="0" * 64) is None
+    assert load_ann_indexes(tmp_path / "missing") is None
@@ -0,0 +1,72 @@
+"""
+Tests for the container-resident search index.
+Run with: pytest backend/test_search_index.py
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import search.index
+from search.ann import build_ann_indexes, save_ann_indexes
+from search.index import STORE_DIR_NAME, SearchIndex, SearchIndexCache
+from search.scoring import HybridScorer
+from search.store import POSE_PIPELINE, EmbeddingStore
+
+
+def make_store(num_images=50, dim=16):
+    rng = np.random.default_rng(0)
+    paths = [f"pins/{idx}.jpg" for idx in range(num_images)]
+    return EmbeddingStore(paths,
+                          rng.normal(size=(num_images, dim)).astype(np.float32),
+                          rng.normal(size=(num_images, dim)).astype(np.float32),
+                          metadata={"pose_pipeline": POSE_PIPELINE})
+
+
+def test_lazy_scorer_is_built_once_under_concurrency(monkeypatch):
+    index = SearchIndex(make_store(), Path("manifest.json"), "hash")
+    expected = index.search(np.ones(16, np.float32), np.ones(16, np.float32), 0.5, k=5)
+    # As with compressed codes: no full-precision scorer until an exact search
+    index.scorer = None
+
+    from_store = HybridScorer.from_store
+    builds = []
+    lock = threading.Lock()
+
+    def slow_from_store(store):
+        with lock:
+            builds.append(store)
+        time.sleep(0.05)
+        return from_store(store)
+
+    monkeypatch.setattr(search.index.HybridScorer, "from_store", slow_from_store)
+
+    def exact_search(_):
+        return index.search(np.ones(16, np.float32), np.ones(16, np.float32), 0.5, k=5,
+                            exact=True)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(exact_search, range(8)))
+
+    assert len(builds) == 1
+    for indices, scores in results:
+        np.testing.assert_array_equal(indices, expected[0])
+        np.testing.assert_array_equal(scores, expected[1])
+
+
+def test_cache_picks_up_ann_indexes_built_later(tmp_path):
+    store_dir = tmp_path / STORE_DIR_NAME
+    make_store().save(store_dir)
+    cache = SearchIndexCache(tmp_path)
+    assert cache.get().mode == "exact"
+
+    # Built next to the store; the store manifest itself is untouched
+    scorer = HybridScorer.from_store(cache.get().store)
+    save_ann_indexes(store_dir, build_ann_indexes(scorer, "numpy", n_lists=4), {"n_lists": 4})
+    cache.invalidate()
+
+    index = cache.get()
+    assert index.mode == "ann"
+    assert cache.builds == 2
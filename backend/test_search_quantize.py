@@ -0,0 +1,143 @@
+"""
+Tests for compressed first-pass scoring (search.quantize): codec round-trip
+error, exact rerank and the persisted codes.
+Run with: pytest backend/test_search_quantize.py
+"""
+import numpy as np
+import pytest
+
+from search.quantize import (
+    CompressedSearcher,
+    Int8Codec,
+    PCAProjection,
+    PQCodec,
+    build_compressed,
+    load_compressed,
+    save_compressed,
+)
+from search.scoring import HybridScorer, normalize_rows
+from search.store import MANIFEST_NAME, EmbeddingStore, file_content_hash
+
+
+@pytest.fixture(scope="module")
+def store():
+    rng = np.random.default_rng(0)
+    n = 600
+    return EmbeddingStore([f"{idx}.jpg" for idx in range(n)],
+                          rng.normal(size=(n, 32)).astype(np.float32) * rng.uniform(0.5, 2, (n, 1)),
+                          rng.normal(size=(n, 48)).astype(np.float32))
+
+
+@pytest.fixture(scope="module")
+def queries():
+    rng = np.random.default_rng(1)
+    return [(rng.normal(size=32).astype(np.float32), rng.normal(size=48).astype(np.float32))
+            for _ in range(10)]
+
+
+def test_int8_round_trip_within_half_a_step():
+    vectors = normalize_rows(np.random.default_rng(0).normal(size=(500, 24)))
+    codec = Int8Codec.fit(vectors)
+
+    assert codec.codes.dtype == np.int8
+    error = np.abs(codec.decode() - vectors)
+    assert np.all(error <= codec.scales / 2 + 1e-7)
+    # Scores on the codes are the inner products of the decoded vectors
+    query = vectors[0]
+    np.testing.assert_allclose(codec.score(query), codec.decode() @ query, rtol=1e-5, atol=1e-6)
+
+
+def test_pq_codes_are_the_nearest_centroids():
+    vectors = normalize_rows(np.random.default_rng(0).normal(size=(1000, 24)))
+    codec = PQCodec.fit(vectors, n_subspaces=4, n_iter=5)
+
+    assert codec.codes.shape == (1000, 4) and codec.codes.dtype == np.uint8
+    decoded = codec.decode()
+    for m in range(codec.n_subspaces):
+        columns = slice(6 * m, 6 * (m + 1))
+        # Error per sub-vector is the distance to its nearest codeword
+        distances = ((vectors[:, None, columns] - codec.codebooks[m][None]) ** 2).sum(axis=2)
+        error = ((decoded[:, columns] - vectors[:, columns]) ** 2).sum(axis=1)
+        np.testing.assert_allclose(error, distances.min(axis=1), rtol=1e-4, atol=1e-6)
+    # Well below the error of quantizing everything to zero
+    assert ((decoded - vectors) ** 2).sum() < 0.5 * (vectors ** 2).sum()
+    query = vectors[0]
+    np.testing.assert_allclose(codec.score(query), decoded @ query, rtol=1e-4, atol=1e-5)
+
+
+def test_pq_with_a_codeword_per_row_is_lossless():
+    vectors = normalize_rows(np.random.default_rng(0).normal(size=(200, 16)))
+    codec = PQCodec.fit(vectors, n_subspaces=4)
+    np.testing.assert_allclose(codec.decode(), vectors, atol=1e-6)
+
+
+def test_pq_rejects_indivisible_dimension():
+    with pytest.raises(ValueError, match="not divisible"):
+        PQCodec.fit(np.zeros((10, 10), np.float32), n_subspaces=4)
+
+
+def test_pca_without_reduction_keeps_inner_products():
+    vectors = np.random.default_rng(0).normal(size=(100, 12)).astype(np.float32)
+    pca = PCAProjection.fit(vectors, 12)
+
+    np.testing.assert_allclose(pca.components @ pca.components.T, np.eye(12), atol=1e-5)
+    assert pca.explained == pytest.approx(1.0)
+    projected = pca.transform(vectors)
+    np.testing.assert_allclose(projected @ projected[0], vectors @ vectors[0], rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize("codec, pca_dims", [("int8", None), ("int8", 16), ("pq", None)])
+def test_reranked_scores_are_exact(store, queries, codec, pca_dims):
+    searcher = CompressedSearcher(store, *build_compressed(store, codec, pca_dims, n_subspaces=8),
+                                  rerank=50)
+    scorer = HybridScorer.from_store(store)
+    for pose_query, clip_query in queries:
+        ids, scores = searcher.search(pose_query, clip_query, 0.4, 10)
+        assert len(ids) == 10
+        np.testing.assert_allclose(scores, scorer.score(pose_query, clip_query, 0.4)[ids],
+                                   rtol=1e-5, atol=1e-6)
+        assert np.all(np.diff(scores) <= 0)
+
+
+@pytest.mark.parametrize("codec", ["int8", "pq"])
+@pytest.mark.parametrize("lambda_param", [0.0, 0.5, 1.0])
+def test_rerank_of_every_row_matches_exact_top_k(store, queries, codec, lambda_param):
+    searcher = CompressedSearcher(store, *build_compressed(store, codec, n_subspaces=8))
+    scorer = HybridScorer.from_store(store)
+    for pose_query, clip_query in queries:
+        ids, scores = searcher.search(pose_query, clip_query, lambda_param, 10,
+                                      rerank=len(store))
+        exact_ids, exact_scores = scorer.search(pose_query, clip_query, lambda_param, 10)
+        np.testing.assert_array_equal(ids, exact_ids)
+        np.testing.assert_allclose(scores, exact_scores, rtol=1e-5, atol=1e-6)
+
+
+def test_mask_is_respected(store, queries):
+    searcher = CompressedSearcher(store, *build_compressed(store, "int8"), rerank=30)
+    mask = np.zeros(len(store), dtype=bool)
+    mask[1::3] = True
+    for pose_query, clip_query in queries:
+        ids, _ = searcher.search(pose_query, clip_query, 0.5, 10, mask=mask)
+        assert len(ids) == 10 and mask[ids].all()
+
+
+@pytest.mark.parametrize("codec, pca_dims", [("int8", 16), ("pq", None)])
+def test_save_and_load_round_trip(store, queries, tmp_path, codec, pca_dims):
+    store.save(tmp_path)
+    pose, clip = build_compressed(store, codec, pca_dims, n_subspaces=8)
+    save_compressed(tmp_path, pose, clip, {"codec": codec})
+
+    loaded = load_compressed(tmp_path, store_hash=file_content_hash(tmp_path / MANIFEST_NAME))
+    assert loaded is not None
+    pose_query, clip_query = queries[0]
+    original = CompressedSearcher(store, pose, clip).approximate_scores(pose_query, clip_query, 0.5)
+    reloaded = CompressedSearcher(store, *loaded).approximate_scores(pose_query, clip_query, 0.5)
+    np.testing.assert_array_equal(reloaded, original)
+
+
+def test_stale_store_hash_is_rejected(store, tmp_path):
+    store.save(tmp_path)
+    save_compressed(tmp_path, *build_compressed(store, "int8"), {"codec": "int8"})
+
+    assert load_compressed(tmp_path, store_hash="0" * 64) is None
+    assert load_compressed(tmp_path / "missing") is None
@@ -0,0 +1,119 @@
+"""
+Tests for the vectorized hybrid scorer against the per-image Python loop it replaced.
+Run with: pytest backend/test_search_scoring.py
+"""
+import numpy as np
+import pytest
+
+from search.scoring import HybridScorer, top_k
+
+
+def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Scalar cosine similarity, as in modal_api.cosine_similarity."""
+    a = np.asarray(a, dtype=np.float32).flatten()
+    b = np.asarray(b, dtype=np.float32).flatten()
+    norm_a = np.linalg.norm(a)
+    norm_b = np.linalg.norm(b)
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return float(np.dot(a, b) / (norm_a * norm_b))
+
+
+def reference_search(pose, clip, P_A, C_A, lambda_param, k, mask=None):
+    """The original run_search_pipeline scoring loop + full sort."""
+    scores = []
+    for i in range(pose.shape[0]):
+        if mask is not None and not mask[i]:
+            continue
+        pose_sim = cosine_similarity(P_A, pose[i])
+        clip_sim = cosine_similarity(C_A, clip[i])
+        scores.append((i, lambda_param * pose_sim + (1 - lambda_param) * clip_sim))
+    scores.sort(key=lambda x: x[1], reverse=True)
+    return scores[:k]
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(0)
+    pose = rng.normal(size=(500, 512)).astype(np.float32) * rng.uniform(0.1, 10, (500, 1))
+    clip = rng.normal(size=(500, 512)).astype(np.float32)
+    # A zero row must score 0 for that modality, like cosine_similarity()
+    pose[7] = 0.0
+    P_A = rng.normal(size=512).astype(np.float32)
+    C_A = rng.normal(size=512).astype(np.float32) * 3
+    return pose, clip, P_A, C_A
+
+
+@pytest.mark.parametrize("lambda_param", [0.0, 0.3, 0.5, 0.95, 1.0])
+def test_scores_match_loop(corpus, lambda_param):
+    pose, clip, P_A, C_A = corpus
+    scorer = HybridScorer(pose, clip)
+
+    expected = reference_search(pose, clip, P_A, C_A, lambda_param, len(pose))
+    expected_scores = np.zeros(len(pose), dtype=np.float64)
+    for i, score in expected:
+        expected_scores[i] = score
+
+    np.testing.assert_allclose(scorer.score(P_A, C_A, lambda_param), expected_scores,
+                               rtol=0, atol=1e-5)
+
+
+@pytest.mark.parametrize("k", [1, 10, 499, 500, 1000])
+def test_top_k_matches_loop(corpus, k):
+    pose, clip, P_A, C_A = corpus
+    scorer = HybridScorer(pose, clip)
+
+    expected = reference_search(pose, clip, P_A, C_A, 0.5, k)
+    indices, scores = scorer.search(P_A, C_A, 0.5, k)
+
+    assert indices.tolist() == [i for i, _ in expected]
+    np.testing.assert_allclose(scores, [s for _, s in expected], rtol=0, atol=1e-5)
+
+
+def test_top_k_respects_mask(corpus):
+    pose, clip, P_A, C_A = corpus
+    mask = np.random.default_rng(1).random(len(pose)) > 0.5
+    scorer = HybridScorer(pose, clip)
+
+    expected = reference_search(pose, clip, P_A, C_A, 0.7, 20, mask=mask)
+    indices, _ = scorer.search(P_A, C_A, 0.7, 20, mask=mask)
+
+    assert indices.tolist() == [i for i, _ in expected]
+    assert mask[indices].all()
+
+
+def test_top_k_ties_keep_corpus_order():
+    scores = np.array([0.5, 0.9, 0.5, 0.9, 0.1], dtype=np.float32)
+    indices, _ = top_k(scores, 3)
+    assert indices.tolist() == [1, 3, 0]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_top_k_ties_at_the_boundary_keep_corpus_order(seed):
+    rng = np.random.default_rng(seed)
+    # Few distinct values: many ties, also across the k-th place
+    scores = rng.integers(0, 4, 200).astype(np.float32)
+    mask = rng.random(200) < 0.7
+    for k in (1, 5, 37, 150):
+        indices, top_scores = top_k(scores, k)
+        expected = sorted(range(200), key=lambda i: -scores[i])[:k]
+        assert indices.tolist() == expected
+        np.testing.assert_array_equal(top_scores, scores[expected])
+
+        indices, _ = top_k(scores, k, mask)
+        expected = sorted(np.flatnonzero(mask).tolist(), key=lambda i: -scores[i])[:k]
+        assert indices.tolist() == expected
+
+
+def test_zero_query_scores_zero(corpus):
+    pose, clip, _, C_A = corpus
+    scorer = HybridScorer(pose, clip)
+    scores = scorer.score(np.zeros(512, np.float32), C_A, 1.0)
+    assert np.all(scores == 0)
+
+
+def test_dimension_mismatch_raises(corpus):
+    pose, clip, P_A, C_A = corpus
+    scorer = HybridScorer(pose, clip)
+    with pytest.raises(ValueError):
+        scorer.score(P_A[:100], C_A, 0.5)
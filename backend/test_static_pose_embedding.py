@@ -0,0 +1,72 @@
+"""
+Test that the still-pose fast path of PoseEmbedding matches the full PoseC3D
+test pipeline (10 clips x 48 frames, flipped) within tolerance, and time both.
+
+Requires the deployed Modal app: modal deploy backend/modal_api.py
+"""
+from pathlib import Path
+import time
+
+import modal
+import numpy as np
+from PIL import Image
+
+TEST_IMAGES = [
+    Path(__file__).parent / "data" / "test" / name
+    for name in ("image.png", "draw.png", "real.png", "img.png")
+]
+# Inputs to the backbone are identical, so only float noise is allowed
+MAX_ABS_DIFF = 1e-3
+MIN_COSINE = 0.9999
+
+
+def load_image_array(image_path: Path) -> np.ndarray:
+    """Load an image file and convert to numpy array."""
+    pil_image = Image.open(image_path)
+    if pil_image.mode != "RGB":
+        pil_image = pil_image.convert("RGB")
+    return np.array(pil_image)
+
+
+def main():
+    print("Connecting to Modal classes...")
+    pose_model = modal.Cls.from_name("backend", "SAM3DBodyInference")()
+    pose_embedder = modal.Cls.from_name("backend", "PoseEmbedding")()
+
+    pose_dicts, img_shapes = [], []
+    for image_path in TEST_IMAGES:
+        if not image_path.exists():
+            print(f"  Skipping missing image: {image_path.name}")
+            continue
+        image = load_image_array(image_path)
+        pose_dict = pose_model.predict_2d_pose.remote(image=image, use_bbox_detector=True)
+        if pose_dict:
+            pose_dicts.append(pose_dict)
+            img_shapes.append(image.shape[:2])
+            print(f"  ✓ Pose for {image_path.name}")
+        else:
+            print(f"  ✗ No person detected in {image_path.name}")
+
+    if not pose_dicts:
+        print("No poses to compare.")
+        return
+
+    passed = True
+    for flip in (False, True):
+        result = pose_embedder.compare_static_embedding.remote(pose_dicts, img_shapes, flip=flip)
+        ok = result["max_abs_diff"] <= MAX_ABS_DIFF and result["min_cosine"] >= MIN_COSINE
+        passed &= ok
+        print(f"\nflip={flip}: max |diff| = {result['max_abs_diff']:.2e}, "
+              f"min cosine = {result['min_cosine']:.6f} {'✓' if ok else '✗'}")
+
+    for static in (False, True):
+        start_time = time.perf_counter()
+        pose_embedder.extract_embeddings_batch.remote(pose_dicts, img_shapes, static=static)
+        elapsed = time.perf_counter() - start_time
+        print(f"{'static' if static else 'full pipeline':>14}: {elapsed:.2f} s for {len(pose_dicts)} poses")
+
+    print("\nPASSED" if passed else "\nFAILED")
+
+
+if __name__ == "__main__":
+    main()
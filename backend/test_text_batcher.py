@@ -0,0 +1,106 @@
+"""
+Tests for the CLIP text micro-batching layer (clip.text_batcher).
+Run with: pytest backend/test_text_batcher.py
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from clip.text_batcher import TextBatcher
+
+
+class FakeTextModel:
+    """Word-count tokenizer and an encoder that records its batches."""
+
+    def __init__(self):
+        self.tokenized = []
+        self.batches = []
+
+    def tokenize(self, text):
+        self.tokenized.append(text)
+        return [len(word) for word in text.split()]
+
+    def encode(self, token_ids):
+        self.batches.append(list(token_ids))
+        return np.array([[len(ids), sum(ids)] for ids in token_ids], dtype=np.float32)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_concurrent_requests_share_a_batch():
+    model = FakeTextModel()
+    batcher = TextBatcher(model.tokenize, model.encode, max_wait=0.05)
+    texts = ["a person", "full body pose", "dancing", "a person jumping"]
+
+    features = run(batcher.encode_many(texts))
+
+    np.testing.assert_array_equal(features, [[2, 7], [3, 12], [1, 7], [3, 14]])
+    assert len(model.batches) == 1
+    assert batcher.stats()["batch_size_histogram"] == {4: 1}
+
+
+def test_batches_group_by_token_length():
+    model = FakeTextModel()
+    batcher = TextBatcher(model.tokenize, model.encode, max_wait=0.05, bucket_size=4)
+    short = ["a b", "c d e"]
+    long = ["w " * 9, "x " * 10]
+
+    features = run(batcher.encode_many([short[0], long[0], short[1], long[1]]))
+
+    assert features[:, 0].tolist() == [2, 9, 3, 10]
+    assert sorted(len(batch) for batch in model.batches) == [2, 2]
+    for batch in model.batches:
+        lengths = [len(ids) for ids in batch]
+        assert max(lengths) - min(lengths) < 4
+    stats = batcher.stats()
+    assert stats["padding_overhead"] == pytest.approx((1 + 1) / (2 + 3 + 9 + 10))
+
+
+def test_full_bucket_does_not_wait_for_window():
+    model = FakeTextModel()
+    batcher = TextBatcher(model.tokenize, model.encode, max_batch_size=3, max_wait=10.0)
+
+    async def main():
+        return await asyncio.wait_for(batcher.encode_many(["a"] * 6), timeout=5)
+
+    assert len(run(main())) == 6
+    assert [len(batch) for batch in model.batches] == [3, 3]
+
+
+def test_tokenizer_outputs_are_cached():
+    model = FakeTextModel()
+    batcher = TextBatcher(model.tokenize, model.encode, max_wait=0.0)
+
+    async def main():
+        for _ in range(3):
+            await batcher.encode("a person")
+        await batcher.encode("full body")
+
+    run(main())
+    assert model.tokenized == ["a person", "full body"]
+    assert batcher.stats()["tokenizer_cache_hit_rate"] == pytest.approx(2 / 4)
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    calls = []
+
+    def failing(token_ids):
+        calls.append(token_ids)
+        if len(calls) == 1:
+            raise ValueError("encoder failed")
+        return np.ones((len(token_ids), 2), dtype=np.float32)
+
+    batcher = TextBatcher(FakeTextModel().tokenize, failing, max_wait=0.05)
+
+    async def main():
+        results = await asyncio.gather(batcher.encode("a"), batcher.encode("b"),
+                                       return_exceptions=True)
+        # The worker keeps serving later batches
+        return results, await batcher.encode("c")
+
+    results, later = run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    np.testing.assert_array_equal(later, [1, 1])
@@ -0,0 +1,81 @@
+"""
+Tests for the image-serving helpers in search.thumbnails.
+Run with: pytest backend/test_thumbnails.py
+"""
+import pytest
+
+from search.thumbnails import (
+    ORIGINAL,
+    content_hash,
+    etag_matches,
+    resolve_image_path,
+    resolve_served_image,
+)
+
+ETAG = '"abc123"'
+
+
+@pytest.mark.parametrize("header", [
+    '"abc123"',
+    'W/"abc123"',
+    '"other", "abc123"',
+    '"other",W/"abc123" , "more"',
+    "*",
+])
+def test_matching_if_none_match(header):
+    assert etag_matches(header, ETAG)
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    '"other"',
+    # Substrings of the tag or of a longer tag are not matches
+    '"abc"',
+    '"abc1234"',
+    '"xabc123"',
+    '"abc123-gzip"',
+])
+def test_non_matching_if_none_match(header):
+    assert not etag_matches(header, ETAG)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    original = resolve_image_path(tmp_path, "pins/a.jpg")
+    original.parent.mkdir(parents=True)
+    original.write_bytes(b"original bytes")
+    return tmp_path
+
+
+def test_versioned_original_is_immutable(data_dir):
+    version = content_hash(resolve_image_path(data_dir, "pins/a.jpg"))
+
+    path, immutable = resolve_served_image(data_dir, "pins/a.jpg", ORIGINAL, version)
+    assert path == resolve_image_path(data_dir, "pins/a.jpg") and immutable
+    assert not resolve_served_image(data_dir, "pins/a.jpg", ORIGINAL, "stale")[1]
+    assert not resolve_served_image(data_dir, "pins/a.jpg", ORIGINAL, "")[1]
+
+
+def test_fallback_original_is_not_immutable_until_thumbnail_exists(data_dir):
+    version = content_hash(resolve_image_path(data_dir, "pins/a.jpg"))
+
+    # Tier not built yet: the original is served, but must stay revalidatable
+    path, immutable = resolve_served_image(data_dir, "pins/a.jpg", "small", version)
+    assert path == resolve_image_path(data_dir, "pins/a.jpg")
+    assert not immutable
+
+    thumbnail = resolve_image_path(data_dir, "pins/a.jpg", "small")
+    thumbnail.parent.mkdir(parents=True)
+    thumbnail.write_bytes(b"thumbnail bytes")
+    path, immutable = resolve_served_image(data_dir, "pins/a.jpg", "small", version)
+    assert path == thumbnail and immutable
+
+
+def test_missing_image_and_bad_requests(data_dir):
+    with pytest.raises(FileNotFoundError):
+        resolve_served_image(data_dir, "pins/missing.jpg", "small")
+    with pytest.raises(ValueError):
+        resolve_served_image(data_dir, "pins/a.jpg", "huge")
+    with pytest.raises(ValueError):
+        resolve_served_image(data_dir, "../../etc/passwd")
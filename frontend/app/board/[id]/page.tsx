@@ -12,7 +12,7 @@ import { CanvasItem } from "@/components/board/canvasItem";
 import { LayerPanel } from "@/components/board/layerPanel";
 import { Toolbar } from "@/components/board/toolbar";
 import { LibrarySidebar } from "@/components/board/librarySidebar";
-import { searchSimilarImages } from "@/lib/api";
+import { imageUrl, searchSimilarImages } from "@/lib/api";
 
 export default function BoardPage() {
   const params = useParams();
@@ -78,13 +78,13 @@ export default function BoardPage() {
           text: item.desc || "similar pose",
           k: 4,
           lambda: 0.95,
+          lazy: true,
         });
 
         if (response.success) {
           response.results.forEach((res, index) => {
-            const dataUrl = `data:image/jpeg;base64,${res.image}`;
             handleAddImage(
-              dataUrl,
+              imageUrl(res),
               `Result ${index + 1}`,
               item.x + (index + 1) * 270,
               item.y,
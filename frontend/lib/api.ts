@@ -1,7 +1,11 @@
 export interface SearchResult {
   path: string;
-  image: string;
   score: number;
+  // Inline payload (default mode)
+  image?: string;
+  mime_type?: string;
+  // Lazy mode: content hash of the original, load bytes via imageUrl()
+  hash?: string;
 }
 
 export interface SearchResponse {
@@ -15,10 +19,29 @@ export interface SearchParams {
   text?: string;
   k?: number;
   lambda?: number;
+  imageSize?: ImageSize;
+  lazy?: boolean;
 }
 
+export type ImageSize = "small" | "medium" | "large" | "original";
+
 const MODAL_ENDPOINT =
   "https://cmellor--backend-search-similar-images.modal.run";
+const IMAGE_ENDPOINT = "https://cmellor--backend-serve-image.modal.run";
+
+// URL of a search result's image. With the content hash pinned in the URL the
+// response is immutable, so repeat results come from the browser/CDN cache.
+export function imageUrl(
+  result: SearchResult,
+  size: ImageSize = "medium",
+): string {
+  if (result.image) {
+    return `data:${result.mime_type ?? "image/jpeg"};base64,${result.image}`;
+  }
+  const query = new URLSearchParams({ path: result.path, size });
+  if (result.hash) query.set("v", result.hash);
+  return `${IMAGE_ENDPOINT}?${query}`;
+}
 
 export async function searchSimilarImages(
   params: SearchParams,
@@ -33,6 +56,8 @@ export async function searchSimilarImages(
         k: params.k ?? 5,
         lambda: params.lambda ?? 0.95,
         filter_portraits: false,
+        image_size: params.imageSize ?? "medium",
+        lazy: params.lazy ?? false,
       }),
     });
 